@@ -0,0 +1,225 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+
+MB = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    """回應 body 超過 BodyOptions.max_bytes；重試也不會變小，fetcher 直接放棄"""
+
+
+class SpooledBody:
+    """寫在磁碟上的 body（keep_files=True 且沒有 parser 時回傳），用完由呼叫端刪除"""
+
+    def __init__(self, path: str, size: int, encoding: str):
+        self.path = path
+        self.size = size
+        self.encoding = encoding
+
+    def read_text(self) -> str:
+        with open(self.path, encoding=self.encoding, errors="replace") as f:
+            return f.read()
+
+    def __repr__(self) -> str:
+        return f"SpooledBody({self.path!r}, {self.size} bytes)"
+
+
+class BodyOptions:
+    """
+    回應 body 的串流讀取設定：
+
+      - 分段讀取，超過 max_bytes 立刻中止（有 Content-Length 時連讀都不讀）
+      - 超過 spool_threshold 的部分寫到暫存檔，記憶體裡只留一小段緩衝；寫檔在 thread 做
+      - 超過 offload_threshold 的解碼，以及 parser（JSON / HTML 解析），都丟到 executor，不佔 event loop；
+        executor 是 ProcessPoolExecutor 時，落地的 body 只傳檔案路徑過去，不用 pickle 整份內容
+    """
+
+    def __init__(self,
+                 max_bytes: int = 20 * MB,
+                 spool_threshold: int = 1 * MB,
+                 spool_dir: Optional[str] = None,
+                 keep_files: bool = False,
+                 offload_threshold: int = 256 * 1024,
+                 parser: Optional[Callable[[str], Any]] = None,
+                 executor: Optional[Executor] = None,
+                 chunk_size: int = 64 * 1024):
+        """
+        :param keep_files: 落地的 body 不解碼，直接回傳 SpooledBody（大檔下載用）；有 parser 時不適用，
+                           回傳的是解析結果，暫存檔解析完就刪掉
+        :param parser: 解析函式，例如 json.loads；用 ProcessPoolExecutor 時必須是模組層級函式
+        :param executor: 解碼與解析用的 executor，None 表示 event loop 預設的 thread pool
+        """
+        self.max_bytes = max_bytes
+        self.spool_threshold = spool_threshold
+        self.spool_dir = spool_dir
+        self.keep_files = keep_files
+        self.offload_threshold = offload_threshold
+        self.parser = parser
+        self.executor = executor
+        self.chunk_size = chunk_size
+
+
+def _decode_and_parse(data: Union[bytes, str], encoding: str, parser: Optional[Callable[[str], Any]],
+                      is_path: bool = False, remove: bool = False) -> Any:
+    """在 executor 裡執行；data 是 bytes 或暫存檔路徑"""
+    if is_path:
+        try:
+            with open(data, "rb") as f:
+                raw = f.read()
+        finally:
+            if remove:
+                os.remove(data)
+    else:
+        raw = data
+    text = raw.decode(encoding, errors="replace")
+    return parser(text) if parser is not None else text
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _check_length(content_length: Optional[Union[int, str]], options: BodyOptions) -> None:
+    if content_length is not None and int(content_length) > options.max_bytes:
+        raise BodyTooLarge(f"Content-Length {content_length} 超過上限 {options.max_bytes}")
+
+
+async def consume_body(chunks: AsyncIterator[bytes],
+                       encoding: Optional[str],
+                       content_length: Optional[Union[int, str]],
+                       options: BodyOptions) -> Any:
+    """
+    從 async chunk iterator 讀完 body，依 options 回傳 str / parser 的結果 / SpooledBody。
+    中途失敗或被取消（例如 hedge 輸了）時暫存檔會刪掉。
+    """
+    _check_length(content_length, options)
+    encoding = encoding or "utf-8"
+    loop = asyncio.get_running_loop()
+    buffer = bytearray()
+    spool = None
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > options.max_bytes:
+                raise BodyTooLarge(f"body 超過上限 {options.max_bytes} bytes")
+            buffer += chunk
+            if spool is None and size > options.spool_threshold:
+                spool = await asyncio.to_thread(tempfile.NamedTemporaryFile, "wb", delete=False,
+                                                dir=options.spool_dir, suffix=".body")
+            if spool is not None and len(buffer) >= options.spool_threshold:
+                data, buffer = bytes(buffer), bytearray()
+                await asyncio.to_thread(spool.write, data)
+        if spool is not None:
+            data, buffer = bytes(buffer), bytearray()
+            await asyncio.to_thread(spool.write, data)
+            await asyncio.to_thread(spool.close)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+
+    if spool is not None:
+        if options.keep_files and options.parser is None:
+            return SpooledBody(spool.name, size, encoding)
+        try:
+            return await loop.run_in_executor(options.executor, _decode_and_parse, spool.name, encoding,
+                                              options.parser, True, True)
+        except BaseException:
+            _remove_quietly(spool.name)  # 還沒輪到 executor 執行就被取消時，檔案不會被刪
+            raise
+
+    data = bytes(buffer)
+    if options.parser is not None or size >= options.offload_threshold:
+        return await loop.run_in_executor(options.executor, _decode_and_parse, data, encoding, options.parser)
+    return data.decode(encoding, errors="replace")
+
+
+def consume_body_sync(chunks: Iterator[bytes],
+                      encoding: Optional[str],
+                      content_length: Optional[Union[int, str]],
+                      options: BodyOptions) -> Any:
+    """同步版，給已經在 thread 裡跑的 requests transport；大小上限與落地規則相同"""
+    _check_length(content_length, options)
+    encoding = encoding or "utf-8"
+    buffer = bytearray()
+    spool = None
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if size > options.max_bytes:
+                raise BodyTooLarge(f"body 超過上限 {options.max_bytes} bytes")
+            buffer += chunk
+            if spool is None and size > options.spool_threshold:
+                spool = tempfile.NamedTemporaryFile("wb", delete=False, dir=options.spool_dir, suffix=".body")
+            if spool is not None and len(buffer) >= options.spool_threshold:
+                spool.write(buffer)
+                buffer = bytearray()
+        if spool is not None:
+            spool.write(buffer)
+            spool.close()
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+
+    if spool is not None:
+        if options.keep_files and options.parser is None:
+            return SpooledBody(spool.name, size, encoding)
+        args = (spool.name, encoding, options.parser, True, True)
+    else:
+        args = (bytes(buffer), encoding, options.parser)
+    try:
+        if options.executor is not None:
+            return options.executor.submit(_decode_and_parse, *args).result()
+        return _decode_and_parse(*args)
+    finally:
+        if spool is not None:
+            _remove_quietly(spool.name)
+
+
+if __name__ == "__main__":
+    import json
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+
+    async def fake_chunks(total: int, chunk: int = 64 * 1024):
+        payload = json.dumps({"items": ["x" * 100] * (total // 110)}).encode()
+        for i in range(0, len(payload), chunk):
+            yield payload[i:i + chunk]
+            await asyncio.sleep(0)
+
+    async def ticker(stop: asyncio.Event, gaps: list):
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    async def demo():
+        with ProcessPoolExecutor(2) as pool:
+            options = BodyOptions(parser=json.loads, executor=pool)
+            stop, gaps = asyncio.Event(), []
+            tick = asyncio.create_task(ticker(stop, gaps))
+            start = time.perf_counter()
+            parsed = await consume_body(fake_chunks(15 * MB), "utf-8", None, options)
+            stop.set()
+            await tick
+            print(f"✅ 解析 {len(parsed['items'])} 筆，耗時 {time.perf_counter() - start:.2f}s，"
+                  f"event loop 最長停頓 {max(gaps) * 1000:.1f} ms")
+        try:
+            await consume_body(fake_chunks(3 * MB), "utf-8", None, BodyOptions(max_bytes=1 * MB))
+        except BodyTooLarge as e:
+            print(f"🛑 {e}")
+
+    asyncio.run(demo())
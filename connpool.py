@@ -0,0 +1,274 @@
+import asyncio
+import importlib.util
+import ipaddress
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 選用套件：沒裝就不能建對應的 client
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# HTTP/2 需要 h2；沒裝時自動退回 HTTP/1.1
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.http2_requests = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            "http2_ratio": self.http2_requests / self.requests if self.requests else 0.0,
+            "dns_hits": self.dns_hits,
+            "dns_misses": self.dns_misses,
+        }
+
+
+class ConnectionStats:
+    """每個 host 的請求數、新建連線數（重用率 = 1 - 新建 / 請求）、HTTP/2 比例與 DNS 命中"""
+
+    def __init__(self):
+        self.hosts: Dict[str, HostStats] = {}
+
+    def host(self, host: str) -> HostStats:
+        stats = self.hosts.get(host)
+        if stats is None:
+            stats = self.hosts[host] = HostStats()
+        return stats
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {host: stats.snapshot() for host, stats in self.hosts.items()}
+
+    def report(self) -> str:
+        lines = []
+        for host, s in sorted(self.snapshot().items()):
+            lines.append(f"🔌 {host}: {s['requests']} 請求 / {s['new_connections']} 新連線，"
+                         f"重用率 {s['reuse_ratio']:.1%}，HTTP/2 {s['http2_ratio']:.0%}，"
+                         f"DNS 命中 {s['dns_hits']}/{s['dns_hits'] + s['dns_misses']}")
+        return "\n".join(lines) if lines else "（沒有連線紀錄）"
+
+
+class DNSCache:
+    """loop.getaddrinfo 的 TTL 快取；同一個 host 同時多筆查詢只會真的查一次"""
+
+    def __init__(self, ttl: float = 300.0, stats: Optional[ConnectionStats] = None):
+        self.ttl = ttl
+        self.stats = stats or ConnectionStats()
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        key = (host, port)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.stats.host(host).dns_hits += 1
+            return cached[1]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.stats.host(host).dns_hits += 1
+            return await asyncio.shield(pending)
+
+        self.stats.host(host).dns_misses += 1
+        future = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            self._cache[key] = (time.monotonic() + self.ttl, addresses)
+            future.set_result(addresses)
+            return addresses
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 沒人等的時候不要噴 "exception was never retrieved"
+            raise
+        finally:
+            del self._pending[key]
+
+    def invalidate(self, host: Optional[str] = None) -> None:
+        if host is None:
+            self._cache.clear()
+        else:
+            for key in [k for k in self._cache if k[0] == host]:
+                del self._cache[key]
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class HostPoolManager:
+    """
+    per-host 的 keep-alive 連線池設定與統計，給 fetchengine 的 transport 使用：
+
+      - httpx：每個 host 一個 AsyncHTTPTransport，各自的 max_connections（host_sizes 覆寫），
+        支援時走 HTTP/2 多工（一條連線同時跑多個請求），DNS 經過 DNSCache 後以 IP 連線、保留 SNI / Host
+      - aiohttp：只有 HTTP/1.1，limit_per_host 用 default_size，DNS 用 connector 內建 TTL 快取
+      - requests：每個 host mount 一個 pool_maxsize 對應的 HTTPAdapter
+
+    stats.report() / stats.snapshot() 看各 host 的連線重用率。
+    """
+
+    def __init__(self,
+                 default_size: int = 10,
+                 host_sizes: Optional[Dict[str, int]] = None,
+                 http2: bool = True,
+                 keepalive_expiry: float = 30.0,
+                 dns_ttl: float = 300.0):
+        """
+        :param default_size: 每個 host 的連線上限
+        :param host_sizes: 個別 host 的連線上限，例如 {"api.twitter.com": 4}
+        :param http2: 有裝 h2 時是否嘗試 HTTP/2（ALPN 協商，伺服器不支援就是 HTTP/1.1）
+        :param keepalive_expiry: 閒置連線保留秒數
+        """
+        self.default_size = default_size
+        self.host_sizes = host_sizes or {}
+        self.http2 = http2 and HAS_H2
+        self.keepalive_expiry = keepalive_expiry
+        self.dns_ttl = dns_ttl
+        self.stats = ConnectionStats()
+        self.dns = DNSCache(dns_ttl, self.stats)
+        if http2 and not HAS_H2:
+            print("⚠️ 沒有安裝 h2，HTTP/2 停用，改用 HTTP/1.1")
+
+    def size_for(self, host: str) -> int:
+        return self.host_sizes.get(host, self.default_size)
+
+    def httpx_client(self, **client_kwargs) -> "httpx.AsyncClient":
+        if httpx is None:
+            raise ImportError("HostPoolManager.httpx_client 需要安裝 httpx")
+        return httpx.AsyncClient(transport=_HostRoutingTransport(self), **client_kwargs)
+
+    def aiohttp_session(self, **session_kwargs) -> "aiohttp.ClientSession":
+        if aiohttp is None:
+            raise ImportError("HostPoolManager.aiohttp_session 需要安裝 aiohttp")
+        connector = aiohttp.TCPConnector(limit=0,
+                                         limit_per_host=self.default_size,
+                                         ttl_dns_cache=int(self.dns_ttl),
+                                         keepalive_timeout=self.keepalive_expiry,
+                                         ssl=False)
+        return aiohttp.ClientSession(connector=connector, trace_configs=[self._aiohttp_trace()], **session_kwargs)
+
+    def _aiohttp_trace(self) -> "aiohttp.TraceConfig":
+        stats = self.stats
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.host = params.url.host
+
+        async def on_request_end(session, ctx, params):
+            stats.host(ctx.host).requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            stats.host(ctx.host).new_connections += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            stats.host(params.host).dns_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            stats.host(params.host).dns_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def mount_requests(self, session: Any, hosts: Optional[List[str]] = None) -> None:
+        """requests.Session：預設 adapter 用 default_size，host_sizes 裡的 host 各自 mount"""
+        from requests.adapters import HTTPAdapter
+
+        adapter = HTTPAdapter(pool_connections=self.default_size, pool_maxsize=self.default_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        for host in hosts or list(self.host_sizes):
+            size = self.size_for(host)
+            host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=0)
+            session.mount(f"http://{host}/", host_adapter)
+            session.mount(f"https://{host}/", host_adapter)
+
+
+if httpx is not None:
+    class _HostRoutingTransport(httpx.AsyncBaseTransport):
+        """依 host 分派到各自的連線池，並在請求上掛 trace 統計新建連線與 HTTP 版本"""
+
+        def __init__(self, manager: HostPoolManager):
+            self.manager = manager
+            self.pools: Dict[str, httpx.AsyncHTTPTransport] = {}
+
+        def _pool(self, host: str) -> httpx.AsyncHTTPTransport:
+            pool = self.pools.get(host)
+            if pool is None:
+                size = self.manager.size_for(host)
+                limits = httpx.Limits(max_connections=size,
+                                      max_keepalive_connections=size,
+                                      keepalive_expiry=self.manager.keepalive_expiry)
+                pool = self.pools[host] = httpx.AsyncHTTPTransport(http2=self.manager.http2, limits=limits)
+            return pool
+
+        async def handle_async_request(self, request: "httpx.Request") -> "httpx.Response":
+            host = request.url.host
+            stats = self.manager.stats.host(host)
+
+            if not _is_ip(host):
+                port = request.url.port or (443 if request.url.scheme == "https" else 80)
+                try:
+                    addresses = await self.manager.dns.resolve(host, port)
+                except OSError:
+                    addresses = []
+                if addresses:
+                    # 以 IP 連線；Host header 已在建立 request 時設好，TLS 用 SNI 保留原本的 host 名稱
+                    request.url = request.url.copy_with(host=addresses[0])
+                    request.extensions = {**request.extensions, "sni_hostname": host}
+
+            original_trace = request.extensions.get("trace")
+
+            async def trace(event: str, info: Dict[str, Any]) -> None:
+                if event == "connection.connect_tcp.complete":
+                    stats.new_connections += 1
+                if original_trace is not None:
+                    await original_trace(event, info)
+
+            request.extensions = {**request.extensions, "trace": trace}
+            response = await self._pool(host).handle_async_request(request)
+            stats.requests += 1  # 只算拿到回應的請求，連線失敗不影響重用率
+            if response.extensions.get("http_version") == b"HTTP/2":
+                stats.http2_requests += 1
+            return response
+
+        async def aclose(self) -> None:
+            for pool in self.pools.values():
+                await pool.aclose()
+            self.pools.clear()
+
+
+if __name__ == "__main__":
+    async def demo():
+        manager = HostPoolManager(default_size=4, host_sizes={"www.google.com": 2})
+        async with manager.httpx_client(timeout=10.0) as client:
+            urls = ["https://www.google.com/", "https://httpbin.org/get"] * 5
+            responses = await asyncio.gather(*(client.get(u) for u in urls), return_exceptions=True)
+            print(f"✅ 完成 {sum(1 for r in responses if not isinstance(r, Exception))}/{len(urls)} 個請求")
+        print(manager.stats.report())
+
+    asyncio.run(demo())
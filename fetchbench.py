@@ -0,0 +1,324 @@
+"""
+本機假 upstream 壓測：起一個 aiohttp 假伺服器（可設定延遲分佈、429 + Retry-After 爆量、5xx 比例、慢速 body），
+分別用 httptest / httpasynctest / httpxtest / persistentRetryQueue 去抓，比較吞吐量、延遲、重試次數與記憶體。
+
+用法：
+  python fetchbench.py --ids 500 --latency lognormal:0.05:0.6 --error-rate 0.05 --burst 10:1:1
+  python fetchbench.py --only httpxtest httpasynctest --json bench.json
+
+延遲以伺服器端量測：同一個 ID 第一次請求進來到成功回應送完，重試與 429 等待都算在內。
+每個實作都在獨立的 process 跑，peak RSS 不會互相影響。
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+IMPLEMENTATIONS = ["httptest", "httpasynctest", "httpxtest", "persistentRetryQueue"]
+
+
+class UpstreamProfile:
+    """假 upstream 的行為設定（要能 pickle 給伺服器 process）"""
+
+    def __init__(self,
+                 latency: str = "lognormal:0.05:0.5",
+                 error_rate: float = 0.0,
+                 body_size: int = 2048,
+                 slow_body_rate: float = 0.0,
+                 slow_body_seconds: float = 1.0,
+                 burst_every: float = 0.0,
+                 burst_duration: float = 0.0,
+                 retry_after: int = 1,
+                 max_latency: float = 10.0,
+                 seed: int = 0):
+        """
+        :param latency: 延遲分佈 "fixed:秒" / "uniform:最小:最大" / "lognormal:中位數:sigma" / "pareto:最小:alpha"
+        :param error_rate: 回 503 的機率
+        :param slow_body_rate: body 分段慢慢送的機率，整個 body 花 slow_body_seconds 送完
+        :param burst_every: 每隔幾秒進入一次 429 爆量期，0 表示不爆量
+        :param burst_duration: 爆量期長度（秒），期間所有請求回 429 + Retry-After
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.body_size = body_size
+        self.slow_body_rate = slow_body_rate
+        self.slow_body_seconds = slow_body_seconds
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.retry_after = retry_after
+        self.max_latency = max_latency
+        self.seed = seed
+        self.sample_latency(random.Random(0))  # 先檢查格式
+
+    def sample_latency(self, rng: random.Random) -> float:
+        kind, *params = self.latency.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed":
+            value = values[0]
+        elif kind == "uniform":
+            value = rng.uniform(values[0], values[1])
+        elif kind == "lognormal":
+            value = rng.lognormvariate(math.log(values[0]), values[1])
+        elif kind == "pareto":
+            value = values[0] * rng.paretovariate(values[1])
+        else:
+            raise ValueError(f"不支援的延遲分佈: {self.latency}")
+        return min(value, self.max_latency)
+
+    def in_burst(self, elapsed: float) -> bool:
+        return self.burst_every > 0 and elapsed % self.burst_every < self.burst_duration
+
+
+class _ServerState:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.monotonic()
+        self.generation = getattr(self, "generation", 0) + 1
+        self.requests = 0
+        self.statuses: Dict[int, int] = {}
+        self.first_seen: Dict[str, float] = {}
+        self.completed: Dict[str, float] = {}
+
+    def count(self, status: int) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "unique_ids": len(self.first_seen),
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "latencies": list(self.completed.values()),
+        }
+
+
+def _server_main(profile: UpstreamProfile, ready: "mp.Queue") -> None:
+    from aiohttp import web
+
+    rng = random.Random(profile.seed)
+    state = _ServerState()
+    body = ("x" * profile.body_size).encode()
+
+    async def handle(request: "web.Request") -> "web.StreamResponse":
+        id_ = request.match_info["id"]
+        now = time.monotonic()
+        state.requests += 1
+        first = state.first_seen.setdefault(id_, now)
+        generation = state.generation  # reset 之後才完成的舊請求不列入統計
+
+        if profile.in_burst(now - state.started):
+            state.count(429)
+            return web.Response(status=429, headers={"Retry-After": str(profile.retry_after)})
+
+        await asyncio.sleep(profile.sample_latency(rng))
+        if rng.random() < profile.error_rate:
+            state.count(503)
+            return web.Response(status=503)
+
+        if rng.random() < profile.slow_body_rate:
+            resp = web.StreamResponse(headers={"Content-Type": "text/html"})
+            resp.content_length = len(body)
+            await resp.prepare(request)
+            chunks = 10
+            step = math.ceil(len(body) / chunks)
+            for i in range(0, len(body), step):
+                await resp.write(body[i:i + step])
+                await asyncio.sleep(profile.slow_body_seconds / chunks)
+            await resp.write_eof()
+        else:
+            resp = web.Response(body=body, content_type="text/html")
+            await resp.prepare(request)
+            await resp.write_eof()
+
+        if generation == state.generation:
+            state.count(200)
+            state.completed.setdefault(id_, time.monotonic() - first)
+        return resp
+
+    async def stats(request: "web.Request") -> "web.Response":
+        return web.json_response(state.snapshot())
+
+    async def reset(request: "web.Request") -> "web.Response":
+        state.reset()
+        return web.json_response({"ok": True})
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/get/{id}", handle)
+        app.router.add_get("/__stats", stats)
+        app.router.add_post("/__reset", reset)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        ready.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def _control(port: int, path: str, method: str = "GET") -> Dict[str, Any]:
+    import urllib.request
+
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", method=method)
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())
+
+
+def _drive(impl: str, ids: List[int], base_url: str) -> int:
+    """在子 process 裡呼叫實作本身的進入點，回傳成功筆數"""
+    if impl == "httptest":
+        import httptest
+        results, _ = httptest.fetch_twitter_data(ids, base_url)
+    elif impl == "httpasynctest":
+        import httpasynctest
+        results, _ = asyncio.run(httpasynctest.fetch_all(ids, base_url))
+    elif impl == "httpxtest":
+        import httpxtest
+        results, _ = asyncio.run(httpxtest.fetch_all(ids, base_url))
+    elif impl == "persistentRetryQueue":
+        import persistentRetryQueue
+        queue = persistentRetryQueue.PersistentRetryQueue(ids, state_dir=None)
+        results = asyncio.run(persistentRetryQueue.run_retry_queue(queue, base_url))
+    else:
+        raise ValueError(f"未知的實作: {impl}")
+    return len(results)
+
+
+def _client_main(impl: str, ids: List[int], base_url: str, out: "mp.Queue", quiet: bool) -> None:
+    # 在暫存目錄跑，persistentRetryQueue 的 failed_ids.json 之類不會寫進工作目錄
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(tempfile.mkdtemp(prefix=f"bench-{impl}-"))
+    try:
+        importlib.import_module(impl)  # 先 import，baseline RSS 才會包含套件本身
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, \
+                (contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()):
+            succeeded = _drive(impl, ids, base_url)
+        elapsed = time.perf_counter() - start
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out.put({"succeeded": succeeded, "elapsed": elapsed, "peak_rss_mb": peak_kb / 1024,
+                 "rss_growth_mb": (peak_kb - baseline_kb) / 1024})
+    except BaseException as e:
+        out.put({"error": repr(e)})
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    # nearest-rank：100 筆的 p99 是第 99 筆，不是最大值
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))]
+
+
+def run_benchmark(profile: UpstreamProfile,
+                  n_ids: int = 200,
+                  implementations: Optional[List[str]] = None,
+                  quiet: bool = True,
+                  timeout: float = 600.0) -> Dict[str, Dict[str, Any]]:
+    ctx = mp.get_context("spawn")
+    ready = ctx.Queue()
+    server = ctx.Process(target=_server_main, args=(profile, ready), daemon=True)
+    server.start()
+    port = ready.get(timeout=30)
+    base_url = f"http://127.0.0.1:{port}/get/"
+    ids = list(range(1, n_ids + 1))
+
+    reports: Dict[str, Dict[str, Any]] = {}
+    try:
+        for impl in implementations or IMPLEMENTATIONS:
+            print(f"🏃 {impl} ...", flush=True)
+            _control(port, "/__reset", "POST")
+            out = ctx.Queue()
+            client = ctx.Process(target=_client_main, args=(impl, ids, base_url, out, quiet))
+            client.start()
+            try:
+                result = out.get(timeout=timeout)
+            except Exception:
+                client.terminate()
+                result = {"error": f"超過 {timeout}s 未完成"}
+            client.join()
+
+            server_stats = _control(port, "/__stats")
+            latencies = server_stats.pop("latencies")
+            result.update({
+                "server": server_stats,
+                "retries": server_stats["requests"] - server_stats["unique_ids"],
+                "p50": _percentile(latencies, 0.50),
+                "p99": _percentile(latencies, 0.99),
+            })
+            if "elapsed" in result:
+                result["req_per_sec"] = result["succeeded"] / result["elapsed"] if result["elapsed"] else 0.0
+            reports[impl] = result
+    finally:
+        server.terminate()
+        server.join()
+    return reports
+
+
+def format_report(reports: Dict[str, Dict[str, Any]], n_ids: int) -> str:
+    def fmt(value: Optional[float], spec: str) -> str:
+        if value is None:
+            return "-".rjust(int(spec.split(".")[0]))  # 沒有數值時維持欄寬
+        return format(value, spec)
+
+    lines = [f"{'實作':<22}{'req/s':>9}{'成功':>7}{'p50(s)':>9}{'p99(s)':>9}{'重試':>7}{'peak RSS(MB)':>14}"]
+    for impl, r in reports.items():
+        if "error" in r:
+            lines.append(f"{impl:<22}❌ {r['error']}")
+            continue
+        lines.append(f"{impl:<22}{fmt(r['req_per_sec'], '9.1f')}{r['succeeded']:>5}/{n_ids:<3}"
+                     f"{fmt(r['p50'], '7.3f')}{fmt(r['p99'], '9.3f')}{r['retries']:>7}"
+                     f"{fmt(r['peak_rss_mb'], '12.1f')}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本機假 upstream 壓測 HTTP fetchers")
+    parser.add_argument("--ids", type=int, default=200, help="每個實作要抓的 ID 數")
+    parser.add_argument("--only", nargs="+", choices=IMPLEMENTATIONS, help="只跑指定的實作")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help="fixed:秒 / uniform:a:b / lognormal:中位數:sigma / pareto:最小:alpha")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 機率")
+    parser.add_argument("--body-size", type=int, default=2048)
+    parser.add_argument("--slow-body-rate", type=float, default=0.0)
+    parser.add_argument("--slow-body-seconds", type=float, default=1.0)
+    parser.add_argument("--burst", default=None, help="429 爆量：每幾秒:持續秒數:Retry-After，例如 10:1:1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600.0, help="單一實作的時間上限（秒）")
+    parser.add_argument("--json", dest="json_path", default=None, help="另外輸出 JSON 報告")
+    parser.add_argument("--verbose", action="store_true", help="顯示 fetcher 自己的輸出")
+    args = parser.parse_args(argv)
+
+    burst_every = burst_duration = 0.0
+    retry_after = 1
+    if args.burst:
+        burst_every, burst_duration, retry_after = (float(x) for x in args.burst.split(":"))
+    profile = UpstreamProfile(latency=args.latency, error_rate=args.error_rate, body_size=args.body_size,
+                              slow_body_rate=args.slow_body_rate, slow_body_seconds=args.slow_body_seconds,
+                              burst_every=burst_every, burst_duration=burst_duration,
+                              retry_after=int(retry_after), seed=args.seed)
+
+    reports = run_benchmark(profile, args.ids, args.only, quiet=not args.verbose, timeout=args.timeout)
+    print(format_report(reports, args.ids))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"profile": vars(profile), "ids": args.ids, "results": reports}, f, ensure_ascii=False, indent=2)
+        print(f"📝 報告寫入 {args.json_path}")
+    return 1 if any("error" in r for r in reports.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,677 @@
+import asyncio
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, TYPE_CHECKING
+
+from bodystream import BodyOptions, BodyTooLarge, consume_body, consume_body_sync
+from httpcache import HTTPCache
+from resultsink import MemorySink, ResultSink, stream_fetch
+
+# 選用套件：各 transport 只在被選用時才需要對應的 HTTP client
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+if TYPE_CHECKING:
+    from connpool import HostPoolManager
+    from hostlimiter import AdaptiveHostLimiter
+    from ratelimit import AsyncRedisTokenBucket
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; MyBot/1.0)"}
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc or url
+
+OK = "ok"
+RATE_LIMITED = "rate_limited"
+RETRY = "retry"
+FAIL = "fail"
+
+
+class FetchPolicy:
+    """
+    所有 fetcher 共用的重試與 timeout 規則：
+
+      - 2xx 成功；429 依 Retry-After 等待（上限 max_retry_wait），另外計次，不佔一般重試次數
+      - 連線錯誤、逾時與 retry_statuses 重試，間隔為指數退避（equal jitter）
+      - 其他 4xx（404 之類）重試也不會好，直接失敗
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 attempt_timeout: float = 10.0,
+                 total_timeout: Optional[float] = 120.0,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 retry_statuses: Iterable[int] = (408, 500, 502, 503, 504),
+                 max_rate_limited: int = 5,
+                 default_retry_after: float = 5.0,
+                 max_retry_wait: float = 300.0,
+                 hedge: bool = False,
+                 hedge_quantile: float = 0.95,
+                 hedge_max_ratio: float = 0.05,
+                 hedge_min_samples: int = 20):
+        """
+        :param max_attempts: 一般錯誤的最多嘗試次數（含第一次）
+        :param attempt_timeout: 單次請求的 timeout 上限，實際為 min(attempt_timeout, 剩餘預算)
+        :param total_timeout: 單一 URL 含所有重試與等待的預算，每次重試都從剩下的預算扣；None 表示不限
+        :param max_rate_limited: 連續 429 的最多等待次數，超過就直接放棄、不再等
+        :param hedge: 請求超過該 host 觀察到的 hedge_quantile 延遲仍未回應時，再送一個相同請求，先回來的勝出；
+                      從請求拿到 token 與 slot、真的送出後才開始計時，transport 不能取消（requests）時不做
+        :param hedge_max_ratio: hedge 請求數占總請求數的上限，避免 upstream 變慢時流量翻倍
+        :param hedge_min_samples: 累積這麼多筆延遲樣本後才開始 hedge
+        """
+        self.max_attempts = max_attempts
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses: FrozenSet[int] = frozenset(retry_statuses)
+        self.max_rate_limited = max_rate_limited
+        self.default_retry_after = default_retry_after
+        self.max_retry_wait = max_retry_wait
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_max_ratio = hedge_max_ratio
+        self.hedge_min_samples = hedge_min_samples
+
+    def classify(self, status: int) -> str:
+        if 200 <= status < 300:
+            return OK
+        if status == 429:
+            return RATE_LIMITED
+        if status in self.retry_statuses:
+            return RETRY
+        return FAIL
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def retry_after(self, headers: Mapping[str, str]) -> float:
+        value = headers.get("Retry-After")
+        wait = float(value) if value and value.isdigit() else self.default_retry_after
+        return min(wait, self.max_retry_wait)
+
+
+class FetchResponse:
+    """text 通常是 str；transport 設了 BodyOptions 時，2xx 的 text 可能是 parser 的結果或 SpooledBody"""
+
+    def __init__(self, status: int, headers: Mapping[str, str], text: Any):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+
+class Transport:
+    """
+    HTTP 後端介面：engine 只透過 get() 發請求，重試與限速都在 engine 那層。
+    body 為 None 時整份讀進記憶體、在 event loop 上解碼；給了 BodyOptions 則 2xx 的 body 分段讀取，
+    有大小上限，大的落地到暫存檔，解碼與解析丟到 executor（見 bodystream）。
+    """
+
+    name = "base"
+    body: Optional[BodyOptions] = None
+    # 取消 get() 時底層請求會不會跟著停；False 的 transport engine 不做 hedge，輸掉的請求不會留在背景
+    cancellable: bool = True
+
+    async def open(self) -> None:
+        pass
+
+    async def get(self, url: str, headers: Mapping[str, str], timeout: float) -> FetchResponse:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class AiohttpTransport(Transport):
+    name = "aiohttp"
+
+    def __init__(self, proxy: Optional[str] = None, limit: int = 0, pools: Optional["HostPoolManager"] = None,
+                 body: Optional[BodyOptions] = None):
+        """
+        :param limit: connector 連線上限，0 表示不限（併發交給 engine 控制）
+        :param pools: 給了就用 per-host 連線池（limit_per_host、DNS TTL 快取、重用率統計）
+        :param body: 串流讀取 body 的大小上限、落地與解析設定
+        """
+        if aiohttp is None:
+            raise ImportError("AiohttpTransport 需要安裝 aiohttp")
+        self.proxy = proxy
+        self.limit = limit
+        self.pools = pools
+        self.body = body
+        self.session: Optional["aiohttp.ClientSession"] = None
+
+    async def open(self) -> None:
+        if self.session is None:
+            if self.pools is not None:
+                self.session = self.pools.aiohttp_session()
+            else:
+                conn = aiohttp.TCPConnector(limit=self.limit, ssl=False)
+                self.session = aiohttp.ClientSession(connector=conn)
+
+    async def get(self, url: str, headers: Mapping[str, str], timeout: float) -> FetchResponse:
+        await self.open()
+        async with self.session.get(url, headers=headers, proxy=self.proxy,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            if self.body is not None and 200 <= resp.status < 300:
+                text = await consume_body(resp.content.iter_chunked(self.body.chunk_size),
+                                          resp.charset, resp.content_length, self.body)
+            else:
+                text = await resp.text()
+            return FetchResponse(resp.status, resp.headers, text)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class HttpxTransport(Transport):
+    name = "httpx"
+
+    def __init__(self, proxy: Optional[str] = None, http2: bool = False, pools: Optional["HostPoolManager"] = None,
+                 body: Optional[BodyOptions] = None):
+        """
+        :param pools: 給了就用 per-host 連線池（HTTP/2 多工、DNS 快取、重用率統計）；走 proxy 時不適用
+        :param body: 串流讀取 body 的大小上限、落地與解析設定
+        """
+        if httpx is None:
+            raise ImportError("HttpxTransport 需要安裝 httpx")
+        if pools is not None and proxy:
+            print("⚠️ 使用 proxy 時 DNS 由 proxy 解析，per-host 連線池停用")
+            pools = None
+        self.proxy = proxy
+        self.http2 = http2
+        self.pools = pools
+        self.body = body
+        self.client: Optional["httpx.AsyncClient"] = None
+
+    async def open(self) -> None:
+        if self.client is None:
+            if self.pools is not None:
+                self.client = self.pools.httpx_client()
+            else:
+                proxy_options = {"proxies": self.proxy} if self.proxy else {}
+                self.client = httpx.AsyncClient(http2=self.http2, **proxy_options)
+
+    async def get(self, url: str, headers: Mapping[str, str], timeout: float) -> FetchResponse:
+        await self.open()
+        if self.body is None:
+            resp = await self.client.get(url, headers=headers, timeout=timeout)
+            return FetchResponse(resp.status_code, resp.headers, resp.text)
+        async with self.client.stream("GET", url, headers=headers, timeout=timeout) as resp:
+            if 200 <= resp.status_code < 300:
+                text = await consume_body(resp.aiter_bytes(self.body.chunk_size), resp.charset_encoding,
+                                          resp.headers.get("Content-Length"), self.body)
+            else:
+                await resp.aread()
+                text = resp.text
+            return FetchResponse(resp.status_code, resp.headers, text)
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+class RequestsTransport(Transport):
+    """
+    requests 是同步的：請求丟到 thread 執行，pool 大小要跟 engine 的併發數對齊。
+
+    取消 get()（total_timeout 到了、整批被取消）只會放棄等待，thread 裡的請求會繼續跑到
+    requests 自己的 timeout（連線 / 每次讀取各 attempt_timeout 秒），期間仍佔著 thread 與連線；
+    所以這個 transport 不做 hedge，避免輸掉的備援請求在背景累積。
+    """
+
+    name = "requests"
+    cancellable = False
+
+    def __init__(self, proxy: Optional[str] = None, pool_size: int = 10, pools: Optional["HostPoolManager"] = None,
+                 body: Optional[BodyOptions] = None):
+        """
+        :param body: 串流讀取 body 的大小上限與落地設定；本來就在 thread 裡讀，解析只有指定 executor 時才轉交
+        """
+        if requests is None:
+            raise ImportError("RequestsTransport 需要安裝 requests")
+        self.body = body
+        self.session = requests.Session()
+        if pools is not None:
+            pools.mount_requests(self.session)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        if proxy:
+            self.session.proxies = {"http": proxy, "https": proxy}
+
+    def _get_streamed(self, url: str, headers: Mapping[str, str], timeout: float) -> FetchResponse:
+        with self.session.get(url, headers=headers, timeout=timeout, stream=True) as res:
+            if 200 <= res.status_code < 300:
+                text = consume_body_sync(res.iter_content(self.body.chunk_size), res.encoding,
+                                         res.headers.get("Content-Length"), self.body)
+            else:
+                text = res.text
+            return FetchResponse(res.status_code, res.headers, text)
+
+    async def get(self, url: str, headers: Mapping[str, str], timeout: float) -> FetchResponse:
+        if self.body is not None:
+            return await asyncio.to_thread(self._get_streamed, url, headers, timeout)
+        res = await asyncio.to_thread(self.session.get, url, headers=headers, timeout=timeout)
+        return FetchResponse(res.status_code, res.headers, res.text)
+
+    async def close(self) -> None:
+        self.session.close()
+
+
+TRANSPORTS: Dict[str, Callable[..., Transport]] = {
+    "aiohttp": AiohttpTransport,
+    "httpx": HttpxTransport,
+    "requests": RequestsTransport,
+}
+
+
+def make_transport(name: str, proxy: Optional[str] = None, **kwargs) -> Transport:
+    if name not in TRANSPORTS:
+        raise ValueError(f"不支援的 transport: {name}（可用：{', '.join(TRANSPORTS)}）")
+    return TRANSPORTS[name](proxy=proxy, **kwargs)
+
+
+class LatencyTracker:
+    """每個 host 最近 window 筆成功請求的延遲，quantile 每累積 refresh 筆重算一次"""
+
+    def __init__(self, quantile: float = 0.95, window: int = 500, refresh: int = 20):
+        self.quantile = quantile
+        self.window = window
+        self.refresh = refresh
+        self._samples: Dict[str, Deque[float]] = {}
+        self._cached: Dict[str, Tuple[int, float]] = {}  # host -> (計算時的樣本序號, 延遲)
+        self._seen: Dict[str, int] = {}
+
+    def observe(self, host: str, latency: float) -> None:
+        samples = self._samples.get(host)
+        if samples is None:
+            samples = self._samples[host] = deque(maxlen=self.window)
+        samples.append(latency)
+        self._seen[host] = self._seen.get(host, 0) + 1
+
+    def value(self, host: str, min_samples: int) -> Optional[float]:
+        samples = self._samples.get(host)
+        if samples is None or len(samples) < min_samples:
+            return None
+        seen = self._seen[host]
+        cached = self._cached.get(host)
+        if cached is None or seen - cached[0] >= self.refresh:
+            ordered = sorted(samples)
+            cached = self._cached[host] = (seen, ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))])
+        return cached[1]
+
+
+class FetchEngine:
+    """
+    可替換後端的抓取引擎：重試、429、timeout、per-host 限速與併發控制都只在這裡實作一次，
+    httpasynctest / httpxtest / persistentRetryQueue 只差在用哪個 transport。
+
+        async with FetchEngine(make_transport("httpx")) as engine:
+            results, failed = await engine.fetch_many(ids, lambda id_: f"{base_url}{id_}")
+    """
+
+    def __init__(self,
+                 transport: Transport,
+                 policy: Optional[FetchPolicy] = None,
+                 concurrency: int = 10,
+                 headers: Optional[Mapping[str, str]] = None,
+                 limiter: Optional["AsyncRedisTokenBucket"] = None,
+                 host_limiter: Optional["AdaptiveHostLimiter"] = None,
+                 cache: Optional[HTTPCache] = None):
+        """
+        :param concurrency: 同時進行的請求數；有 host_limiter 時改由各 host 的 AIMD 控制，這裡只是 worker 數
+        :param limiter: 跨 process 共用的 per-host token bucket
+        :param cache: 條件式請求快取；內容沒變時伺服器回 304，直接回傳快取的內容
+        """
+        self.transport = transport
+        self.policy = policy or FetchPolicy()
+        self.concurrency = concurrency
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.limiter = limiter
+        self.host_limiter = host_limiter
+        self.cache = cache
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.latency = LatencyTracker(self.policy.hedge_quantile)
+        self.requests_sent = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+
+    async def __aenter__(self):
+        await self.transport.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.transport.close()
+
+    def _slot(self, url: str):
+        if self.host_limiter is not None:
+            return self.host_limiter.slot(url)
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return _SemaphoreSlot(self._sem)
+
+    async def _send(self,
+                    url: str,
+                    headers: Mapping[str, str],
+                    deadline: Optional[float],
+                    sent: Optional[asyncio.Event] = None) -> FetchResponse:
+        """
+        送出一次請求：token bucket → slot → transport；timeout 取 attempt_timeout 與剩餘預算較小者
+
+        :param sent: 拿到 token 與 slot、真的交給 transport 時 set（hedge 從這時才開始計時）
+        """
+        policy = self.policy
+        loop = asyncio.get_running_loop()
+        if self.limiter is not None:
+            await self.limiter.acquire_for_url(url)
+        async with self._slot(url) as slot:
+            timeout = policy.attempt_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+                if timeout <= 0:
+                    raise asyncio.TimeoutError("預算用盡")
+            self.requests_sent += 1
+            if sent is not None:
+                sent.set()
+            start = loop.time()
+            resp = await self.transport.get(url, headers, timeout)
+            outcome = policy.classify(resp.status)
+            if outcome == RATE_LIMITED:
+                if slot is not None:
+                    slot.rate_limited(policy.retry_after(resp.headers))  # 整個 host 暫停，等待時不佔 slot
+            elif outcome == RETRY:
+                if slot is not None:
+                    slot.failed()
+            else:
+                self.latency.observe(host_of(url), loop.time() - start)
+            return resp
+
+    def _hedge_delay(self, url: str) -> Optional[float]:
+        policy = self.policy
+        if not policy.hedge or not self.transport.cancellable:
+            return None
+        if self.hedges_sent >= policy.hedge_max_ratio * self.requests_sent:
+            return None
+        return self.latency.value(host_of(url), policy.hedge_min_samples)
+
+    async def _send_hedged(self, url: str, headers: Mapping[str, str], deadline: Optional[float], label: str) -> FetchResponse:
+        delay = self._hedge_delay(url)
+        if delay is None:
+            return await self._send(url, headers, deadline)
+
+        sent = asyncio.Event()
+        primary = asyncio.ensure_future(self._send(url, headers, deadline, sent))
+        tasks = {primary}
+        try:
+            # 還在等 token / slot 的時間不算：排隊中的請求送備援只會多排一個，primary 真的送出後才開始計時
+            waiter = asyncio.ensure_future(sent.wait())
+            try:
+                await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # 超過 p95 還沒回來、而且 hedge 比例還在上限內，才送備援請求
+            if not done and self.hedges_sent < self.policy.hedge_max_ratio * self.requests_sent:
+                self.hedges_sent += 1
+                print(f"[Hedge] {label} 超過 {delay:.3f}s 未回應，送出備援請求")
+                tasks.add(asyncio.ensure_future(self._send(url, headers, deadline)))
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None or not tasks:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                # 先完成的那個失敗了，等另一個
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fetch(self, url: str, label: Optional[str] = None) -> Optional[Any]:
+        """
+        抓單一 URL，回傳內容（transport 有 parser 時是解析結果）；用盡重試、預算、遇到不可重試的狀態碼
+        或 body 超過上限時回傳 None。
+        total_timeout 是整個 URL 的預算：每次嘗試的 timeout、退避與 429 等待都從剩下的預算扣，不夠就放棄。
+        """
+        policy = self.policy
+        label = label or url
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.total_timeout if policy.total_timeout is not None else None
+        attempt = 0
+        rate_limited = 0
+
+        headers = self.headers
+        cached = await self.cache.lookup(url) if self.cache is not None else None
+        if cached is not None and cached.body is not None:
+            headers = {**headers, **HTTPCache.headers_for(cached)}
+        else:
+            cached = None
+
+        while True:
+            wait = None
+            try:
+                resp = await self._send_hedged(url, headers, deadline, label)
+                if resp.status == 304 and cached is not None:
+                    self.cache.record_not_modified()
+                    return cached.body
+                outcome = policy.classify(resp.status)
+                if outcome == OK:
+                    if self.cache is not None and isinstance(resp.text, str):
+                        await self.cache.store(url, resp.headers, resp.text)
+                    return resp.text
+                if outcome == RATE_LIMITED:
+                    rate_limited += 1
+                    wait = policy.retry_after(resp.headers)
+                    print(f"[RateLimit] {label} 第 {rate_limited} 次遭限流，等待 {wait:.0f}s")
+                    if self.host_limiter is not None:
+                        wait = None  # host 已在 slot 裡暫停，下一次 acquire 會等
+                elif outcome == RETRY:
+                    raise RuntimeError(f"HTTP {resp.status}")
+                else:
+                    print(f"[Fail] {label} HTTP {resp.status}，不重試")
+                    return None
+            except BodyTooLarge as e:
+                print(f"[TooLarge] {label} {e}，不重試")
+                return None
+            except Exception as e:
+                attempt += 1
+                print(f"[Error] {label} 嘗試 {attempt}/{policy.max_attempts} 失敗：{e!r}")
+                if attempt >= policy.max_attempts:
+                    return None
+                wait = policy.backoff(attempt)
+
+            if rate_limited > policy.max_rate_limited:
+                # 反正要放棄，不用先把 Retry-After 睡完；等待交給呼叫端的 scheduler 或 host limiter
+                print(f"[RateLimit] {label} 超過 {policy.max_rate_limited} 次限流，放棄")
+                return None
+            if wait:
+                if deadline is not None and loop.time() + wait >= deadline:
+                    print(f"[Deadline] {label} 剩餘預算不足以等待 {wait:.1f}s，放棄")
+                    return None
+                await asyncio.sleep(wait)
+
+    def hedge_stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests_sent,
+            "hedges": self.hedges_sent,
+            "hedge_wins": self.hedge_wins,
+            "hedge_ratio": self.hedges_sent / self.requests_sent if self.requests_sent else 0.0,
+        }
+
+    async def fetch_many(
+        self,
+        ids: Iterable[int],
+        url_for: Callable[[int], str],
+        sink: Optional[ResultSink] = None
+    ) -> Tuple[Dict[int, str], List[int]]:
+        """
+        :param sink: 結果寫到 sink（有背壓）；不給時收進 dict 回傳
+        :return: (results, failed)；有給 sink 時 results 是空 dict
+        """
+        memory = MemorySink() if sink is None else None
+
+        async def fetch(id_: int) -> Tuple[int, Optional[str]]:
+            return id_, await self.fetch(url_for(id_), label=f"ID {id_}")
+
+        failed = await stream_fetch(ids, fetch, sink if sink is not None else memory,
+                                    workers=self.concurrency, timeout=self.policy.total_timeout)
+        return (memory.results if memory is not None else {}), failed
+
+
+async def fetch_ids(
+    ids: Iterable[int],
+    base_url: str,
+    transport: str,
+    proxy: Optional[str] = None,
+    limiter: Optional["AsyncRedisTokenBucket"] = None,
+    host_limiter: Optional["AdaptiveHostLimiter"] = None,
+    sink: Optional[ResultSink] = None,
+    concurrency: int = 10,
+    policy: Optional[FetchPolicy] = None,
+    pools: Optional["HostPoolManager"] = None,
+    cache: Optional[HTTPCache] = None,
+    body: Optional[BodyOptions] = None,
+    max_attempts: int = 3
+) -> Tuple[Dict[int, str], List[int]]:
+    """
+    抓 {base_url}{id}；httpasynctest / httpxtest 的 fetch_all 只是換個預設 transport 呼叫這裡。
+
+    :param ids: 可以是 generator，只會邊抓邊取
+    :param transport: HTTP 後端（aiohttp / httpx / requests），重試規則都一樣
+    :param sink: 結果寫到 sink（背壓：sink 滿了就不再抓新的 ID）；不給時沿用舊行為收進 dict 回傳
+    :param concurrency: 同時進行的 fetch 數
+    :param pools: per-host 連線池設定（HTTP/2、DNS 快取、重用率統計）
+    :param cache: 條件式請求快取（ETag / Last-Modified），沒變的頁面只花一次 304
+    :param body: 大回應的串流讀取設定（大小上限、落地暫存檔、在 executor 解碼 / 解析）
+    :param max_attempts: 沒給 policy 時的最多嘗試次數
+    :return: (results, failed)；有給 sink 時 results 是空 dict
+    """
+    transport_options = {"pools": pools} if pools is not None else {}
+    if body is not None:
+        transport_options["body"] = body
+    engine = FetchEngine(make_transport(transport, proxy=proxy, **transport_options),
+                         policy or FetchPolicy(max_attempts=max_attempts),
+                         concurrency=concurrency,
+                         limiter=limiter,
+                         host_limiter=host_limiter,
+                         cache=cache)
+    async with engine:
+        return await engine.fetch_many(ids, lambda id_: f"{base_url}{id_}", sink)
+
+
+async def fetch_with_client(
+    sem: asyncio.Semaphore,
+    client: Any,
+    id_: int,
+    base_url: str,
+    max_retry_wait: float = 300,
+    max_attempts: int = 3
+) -> Tuple[int, Optional[str]]:
+    """
+    舊版 fetch_one 的介面：用呼叫端已經開好的 aiohttp.ClientSession 或 httpx.AsyncClient 抓一個 ID，
+    重試規則跟 FetchEngine 一樣；client 由呼叫端負責關閉。
+    """
+    if aiohttp is not None and isinstance(client, aiohttp.ClientSession):
+        transport: Transport = AiohttpTransport()
+        transport.session = client
+    else:
+        transport = HttpxTransport()
+        transport.client = client
+    engine = FetchEngine(transport, FetchPolicy(max_attempts=max_attempts, max_retry_wait=max_retry_wait))
+    async with sem:
+        return id_, await engine.fetch(f"{base_url}{id_}", label=f"ID {id_}")
+
+
+class _SemaphoreSlot:
+    """沒有 host_limiter 時用固定 semaphore 限制同時進行的請求，介面對齊 hostlimiter 的 slot"""
+
+    def __init__(self, sem: asyncio.Semaphore):
+        self.sem = sem
+
+    async def __aenter__(self):
+        await self.sem.acquire()
+        return None
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.sem.release()
+
+
+def fetch_blocking(
+    session: "requests.Session",
+    url: str,
+    policy: Optional[FetchPolicy] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> str:
+    """
+    同步版，給 httptest 這類直接用 requests 的程式，套用同一套 FetchPolicy。
+    失敗時拋出最後一次的例外（或 HTTPError）。
+    """
+    policy = policy or FetchPolicy()
+    deadline = None if policy.total_timeout is None else time.monotonic() + policy.total_timeout
+    attempt = 0
+    rate_limited = 0
+    while True:
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"{url} 超過 {policy.total_timeout}s")
+        try:
+            res = session.get(url, headers=headers, timeout=policy.attempt_timeout)
+        except requests.exceptions.RequestException:
+            attempt += 1
+            if attempt >= policy.max_attempts:
+                raise
+            time.sleep(policy.backoff(attempt))
+            continue
+
+        outcome = policy.classify(res.status_code)
+        if outcome == OK:
+            return res.text
+        if outcome == RATE_LIMITED and rate_limited < policy.max_rate_limited:
+            rate_limited += 1
+            wait = policy.retry_after(res.headers)
+            print(f"[Rate Limit] 等待 {wait:.0f} 秒後重試...")
+            time.sleep(wait)
+            continue
+        if outcome == RETRY:
+            attempt += 1
+            if attempt < policy.max_attempts:
+                time.sleep(policy.backoff(attempt))
+                continue
+        res.raise_for_status()
+        raise requests.exceptions.HTTPError(f"HTTP {res.status_code}", response=res)
+
+
+if __name__ == "__main__":
+    import sys
+
+    backend = sys.argv[1] if len(sys.argv) > 1 else "httpx"
+
+    async def demo():
+        async with FetchEngine(make_transport(backend), concurrency=5) as engine:
+            start = time.perf_counter()
+            results, failed = await engine.fetch_many(range(1, 6), lambda id_: f"https://httpbin.org/status/{200 if id_ % 2 else 404}")
+            print(f"✅ [{backend}] 成功 {len(results)}，失敗 {failed}，耗時 {time.perf_counter() - start:.2f}s")
+
+    asyncio.run(demo())
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, AsyncIterator
+
+from fetchengine import host_of
+
+
+class HostConcurrencyController:
+    """
+    單一 host 的 AIMD 併發控制：
+
+      - 每累積 window 筆結果評估一次：錯誤率超過 error_threshold、或這個 window 的延遲中位數超過
+        latency_tolerance × 基準延遲（或固定的 latency_target），limit 乘上 decrease；否則 limit 加 increase。
+      - 基準延遲是各 window 中位數的 EWMA（每個 window 權重 baseline_decay），會跟著 host 最近的狀況慢慢移動：
+        不會因為歷史上某一次特別快的回應就把之後正常的長尾延遲都當成過載，host 整體變慢後也會重新適應。
+      - 收到 429 時整個 host 暫停 Retry-After 秒並立刻減半，暫停期間等待中的請求不佔 slot。
+    """
+
+    def __init__(self,
+                 host: str,
+                 initial_limit: int = 10,
+                 min_limit: int = 1,
+                 max_limit: int = 100,
+                 increase: float = 1.0,
+                 decrease: float = 0.5,
+                 window: int = 20,
+                 error_threshold: float = 0.1,
+                 latency_target: Optional[float] = None,
+                 latency_tolerance: float = 2.0,
+                 baseline_decay: float = 0.1):
+        self.host = host
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.error_threshold = error_threshold
+        self.latency_target = latency_target
+        self.latency_tolerance = latency_tolerance
+        self.baseline_decay = baseline_decay
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.baseline_latency: Optional[float] = None
+        self._samples: Deque[tuple] = deque()
+        self._cond = asyncio.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            while True:
+                wait = self.paused_until - loop.time()
+                if wait <= 0 and self.in_flight < self.current_limit:
+                    self.in_flight += 1
+                    return
+                try:
+                    await asyncio.wait_for(self._cond.wait(), wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, latency: float, ok: bool, record: bool = True) -> None:
+        """
+        :param record: False 表示不列入 AIMD 樣本（例如 hedge 輸掉被取消的請求）
+        """
+        async with self._cond:
+            self.in_flight -= 1
+            if record:
+                self._samples.append((latency, ok))
+                if len(self._samples) >= self.window:
+                    self._adjust()
+            self._cond.notify_all()
+
+    def _adjust(self) -> None:
+        samples = list(self._samples)
+        self._samples.clear()
+        errors = sum(1 for _, ok in samples if not ok)
+        ok_latencies = sorted(lat for lat, ok in samples if ok)
+        # 用中位數而不是平均：少數長尾樣本不會讓整個 window 被判成過載
+        latency = ok_latencies[len(ok_latencies) // 2] if ok_latencies else None
+
+        target = self.latency_target
+        if target is None and self.baseline_latency is not None:
+            target = self.baseline_latency * self.latency_tolerance
+        if latency is not None:
+            if self.baseline_latency is None:
+                self.baseline_latency = latency
+            else:
+                self.baseline_latency += self.baseline_decay * (latency - self.baseline_latency)
+
+        overloaded = errors / len(samples) > self.error_threshold
+        if latency is not None and target is not None and latency > target:
+            overloaded = True
+
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+        else:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+
+    async def pause(self, seconds: float) -> None:
+        """429：整個 host 暫停，並立即乘法減少"""
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            self.paused_until = max(self.paused_until, loop.time() + seconds)
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+            self._samples.clear()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "paused_for": max(0.0, self.paused_until - time.monotonic()),
+            "baseline_latency": self.baseline_latency or 0.0,
+        }
+
+
+class _Slot:
+    def __init__(self, controller: HostConcurrencyController):
+        self.controller = controller
+        self.ok = True
+        self.retry_after: Optional[float] = None
+
+    def rate_limited(self, retry_after: float) -> None:
+        """在 slot 裡遇到 429 時呼叫，離開 slot 後整個 host 暫停 retry_after 秒"""
+        self.ok = False
+        self.retry_after = retry_after
+
+    def failed(self) -> None:
+        self.ok = False
+
+
+class AdaptiveHostLimiter:
+    """依 host 分別管理 HostConcurrencyController，給 fetchengine.FetchEngine 包住每次請求"""
+
+    def __init__(self, **controller_kwargs):
+        self.controller_kwargs = controller_kwargs
+        self.hosts: Dict[str, HostConcurrencyController] = {}
+
+    def for_host(self, host: str) -> HostConcurrencyController:
+        controller = self.hosts.get(host)
+        if controller is None:
+            controller = self.hosts[host] = HostConcurrencyController(host, **self.controller_kwargs)
+        return controller
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[_Slot]:
+        controller = self.for_host(host_of(url))
+        await controller.acquire()
+        slot = _Slot(controller)
+        start = time.perf_counter()
+        cancelled = False
+        try:
+            yield slot
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except BaseException:
+            slot.ok = False
+            raise
+        finally:
+            # 先暫停再釋放，避免等待者在暫停生效前搶到 slot；被取消的請求不算樣本
+            if slot.retry_after is not None:
+                await controller.pause(slot.retry_after)
+            await asyncio.shield(controller.release(time.perf_counter() - start, slot.ok, record=not cancelled))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: c.stats() for host, c in self.hosts.items()}
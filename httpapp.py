@@ -1,10 +1,16 @@
 import asyncio
 import aiohttp
+import json
 import logging
 import time
 from typing import Optional, Dict, Any, List
 
-from profiler2 import async_profile_time_to_file
+from bodystream import MB, BodyOptions, consume_body
+from httpcache import HTTPCache, MemoryCacheStore
+from outbox import Outbox
+from pollscheduler import CHANGED, ERROR, UNCHANGED, PollInterval, PollScheduler
+from profiler2 import async_profile_time_to_file, profile_selected_methods_mixed
+from tracing import Tracer
 
 # 初始化 logger
 logger = logging.getLogger("data_monitor")
@@ -17,19 +23,45 @@ logger.propagate = False
 
 # 儲存 profile log
 prof_logs = []
+# 父子 span：可看出 monitor_loop 的時間花在哪個 source 的 fetch / forward
+tracer = Tracer()
 
+FORWARD_URL = "https://example.com/api/receive"
+
+# fetch_data 伺服器回 304 時的回傳值：內容沒變，不用解析也不用比對 ID
+NOT_MODIFIED = object()
+
+# monitor 會一直執行：只留最近 1000 筆呼叫紀錄，長期的耗時分布看 tracer / log 檔
+@profile_selected_methods_mixed(name_patterns=["fetch_data", "forward_data", "monitor"], log_file="data_monitor_profile.log", tracer=tracer,
+                                max_logs=1000)
 class BaseSource:
     url: str
     last_seen_id: Optional[str] = None
-
-    def __init__(self, session: aiohttp.ClientSession):
+    # body 分段讀取、超過上限就放棄；JSON 解析在 thread pool 做，大回應不會卡住其他 source
+    body = BodyOptions(max_bytes=5 * MB, parser=json.loads)
+
+    def __init__(self, session: aiohttp.ClientSession, cache: Optional[HTTPCache] = None, outbox: Optional[Outbox] = None):
+        """
+        :param cache: 條件式請求快取；來源沒變時只有一次 304 來回，不下載也不解析
+        :param outbox: 給了就把資料放進 outbox 批次轉發（落地、失敗重試）；不給時每筆直接 POST
+        """
         self.session = session
+        self.cache = cache
+        self.outbox = outbox
 
-    async def fetch_data(self) -> Optional[Dict[str, Any]]:
+    async def fetch_data(self) -> Any:
         try:
-            async with self.session.get(self.url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            headers = await self.cache.conditional_headers(self.url) if self.cache is not None else {}
+            async with self.session.get(self.url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                if resp.status == 304 and self.cache is not None:
+                    self.cache.record_not_modified()
+                    return NOT_MODIFIED
                 resp.raise_for_status()
-                return await resp.json()
+                data = await consume_body(resp.content.iter_chunked(self.body.chunk_size),
+                                          resp.charset, resp.content_length, self.body)
+                if self.cache is not None:
+                    await self.cache.store(self.url, resp.headers, None)
+                return data
         except Exception as e:
             logger.error(f"❌ fetch_data 錯誤 ({self.url}): {e}")
             return None
@@ -41,24 +73,37 @@ class BaseSource:
         return data
 
     async def forward_data(self, data: Dict[str, Any]) -> None:
+        if self.outbox is not None:
+            await self.outbox.put(data)
+            logger.info(f"📮 ID {data.get('id')} 已放進 outbox")
+            return
         try:
-            async with self.session.post("https://example.com/api/receive", json=data, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            async with self.session.post(FORWARD_URL, json=data, timeout=aiohttp.ClientTimeout(total=10)) as resp:
                 resp.raise_for_status()
                 logger.info(f"✅ 成功轉發 ID {data.get('id')}")
         except Exception as e:
             logger.error(f"❌ forward_data 發生錯誤: {e}")
 
-    async def monitor(self):
+    def poll_interval(self) -> PollInterval:
+        """這個來源的輪詢間隔設定；更新頻率特別高或特別低的來源可以覆寫"""
+        return PollInterval(base=10, min_interval=2, max_interval=120)
+
+    async def monitor(self) -> str:
+        """回傳 CHANGED / UNCHANGED / ERROR，PollScheduler 依此調整下次輪詢的間隔"""
         data = await self.fetch_data()
-        if data:
+        if data is NOT_MODIFIED:
+            logger.info(f"🟢 [{self.__class__.__name__}] 304 未變更，略過")
+            return UNCHANGED
+        elif data:
             current_id = self.extract_id(data)
             if current_id and current_id != self.last_seen_id:
                 await self.forward_data(self.prepare_forward_data(data))
                 self.last_seen_id = current_id
-            else:
-                logger.info(f"🟡 [{self.__class__.__name__}] ID 相同（{current_id}），略過")
-        else:
-            logger.warning(f"⚠️ [{self.__class__.__name__}] 回傳資料為空或格式錯誤")
+                return CHANGED
+            logger.info(f"🟡 [{self.__class__.__name__}] ID 相同（{current_id}），略過")
+            return UNCHANGED
+        logger.warning(f"⚠️ [{self.__class__.__name__}] 回傳資料為空或格式錯誤")
+        return ERROR
 
 class SourceA(BaseSource):
     url = "https://example.com/source_a/data"
@@ -72,17 +117,38 @@ class SourceB(BaseSource):
     def prepare_forward_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return {"source": "source_b", **data}
 
-@async_profile_time_to_file(prof_logs, logger)
+def make_batch_sender(session: aiohttp.ClientSession):
+    """outbox 的 send_batch：一批資料以 JSON array 一次 POST，非 2xx 拋例外讓 outbox 重試"""
+
+    async def send_batch(items: List[Dict[str, Any]]) -> None:
+        async with session.post(FORWARD_URL, json=items, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            resp.raise_for_status()
+        logger.info(f"✅ 成功轉發 {len(items)} 筆（ID {items[0].get('id')} ~ {items[-1].get('id')}）")
+
+    return send_batch
+
+@async_profile_time_to_file(prof_logs, logger, tracer=tracer)
 async def monitor_loop():
     timeout = aiohttp.ClientTimeout(total=15)
     connector = aiohttp.TCPConnector(limit=10, ssl=False)
     async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-        sources: List[BaseSource] = [SourceA(session), SourceB(session)]
-
-        while True:
-            tasks = [source.monitor() for source in sources]
-            await asyncio.gather(*tasks)
-            await asyncio.sleep(10)
+        # 只需要判斷來源有沒有變，不存內容
+        cache = HTTPCache(MemoryCacheStore(), store_body=False)
+        # 轉發先落地到 outbox，滿 50 筆或最舊的一筆等了 2 秒就整批送；重啟後會接著送沒送完的
+        outbox = Outbox(make_batch_sender(session), state_dir="data_monitor_outbox", max_batch=50, flush_interval=2.0)
+        await outbox.start()
+        sources: List[BaseSource] = [SourceA(session, cache, outbox), SourceB(session, cache, outbox)]
+
+        # 每個來源各自排程：沒變就拉長間隔、有變就縮短；同時進行的輪詢數不超過 connector 上限
+        scheduler = PollScheduler(max_concurrency=10)
+        for source in sources:
+            scheduler.add(source.__class__.__name__, source.monitor, source.poll_interval())
+        try:
+            await scheduler.run()
+        finally:
+            logger.info(f"📊 輪詢統計: {scheduler.stats()}")
+            await outbox.close()
+            logger.info(f"📮 outbox 統計: {outbox.stats()}")
 
 if __name__ == "__main__":
     try:
@@ -91,3 +157,6 @@ if __name__ == "__main__":
         logger.info("🛑 中止程式")
     except Exception as e:
         logger.exception(f"‼️ 主迴圈例外: {e}")
+    finally:
+        tracer.write_collapsed("data_monitor.folded")
+        tracer.write_chrome_trace("data_monitor_trace.json")
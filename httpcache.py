@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import redis.asyncio as aioredis
+
+
+class CacheEntry:
+    def __init__(self,
+                 etag: Optional[str] = None,
+                 last_modified: Optional[str] = None,
+                 body: Optional[str] = None,
+                 stored_at: Optional[float] = None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"etag": self.etag, "last_modified": self.last_modified, "body": self.body, "stored_at": self.stored_at}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CacheEntry":
+        return cls(data.get("etag"), data.get("last_modified"), data.get("body"), data.get("stored_at"))
+
+
+class CacheStore:
+    """驗證碼與內容的儲存位置；全部是 async，fetcher 在 event loop 裡直接 await"""
+
+    async def get(self, url: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    async def set(self, url: str, entry: CacheEntry) -> None:
+        raise NotImplementedError
+
+    async def delete(self, url: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheStore(CacheStore):
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    async def get(self, url: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    async def set(self, url: str, entry: CacheEntry) -> None:
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, url: str) -> None:
+        self._entries.pop(url, None)
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+class DiskCacheStore(CacheStore):
+    """每個 URL 一個 JSON 檔（檔名為 URL 的 sha1），讀寫丟到 thread，不卡 event loop"""
+
+    def __init__(self, directory: str = "http_cache"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, url: str) -> str:
+        key = _url_key(url)
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _read(self, url: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(url), encoding="utf-8") as f:
+                return CacheEntry.from_dict(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, url: str, entry: CacheEntry) -> None:
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _remove(self, url: str) -> None:
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
+
+    async def get(self, url: str) -> Optional[CacheEntry]:
+        return await asyncio.to_thread(self._read, url)
+
+    async def set(self, url: str, entry: CacheEntry) -> None:
+        await asyncio.to_thread(self._write, url, entry)
+
+    async def delete(self, url: str) -> None:
+        await asyncio.to_thread(self._remove, url)
+
+
+class RedisCacheStore(CacheStore):
+    """多個 crawler process 共用的快取，傳入 redis.asyncio 的 client；ttl 秒後自動淘汰"""
+
+    def __init__(self, client: "aioredis.Redis", prefix: str = "httpcache", ttl: Optional[int] = 7 * 24 * 3600):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, url: str) -> str:
+        return f"{self.prefix}:{_url_key(url)}"
+
+    async def get(self, url: str) -> Optional[CacheEntry]:
+        raw = await self.client.get(self._key(url))
+        if raw is None:
+            return None
+        return CacheEntry.from_dict(json.loads(raw))
+
+    async def set(self, url: str, entry: CacheEntry) -> None:
+        await self.client.set(self._key(url), json.dumps(entry.to_dict(), ensure_ascii=False), ex=self.ttl)
+
+    async def delete(self, url: str) -> None:
+        await self.client.delete(self._key(url))
+
+
+class HTTPCache:
+    """
+    條件式請求快取：存下回應的 ETag / Last-Modified（與內容），下次請求帶
+    If-None-Match / If-Modified-Since；伺服器回 304 時直接用快取，不必重新下載與解析。
+
+        cache = HTTPCache(DiskCacheStore("http_cache"))
+        headers = {**base_headers, **await cache.conditional_headers(url)}
+        ...
+        if status == 304: body = (await cache.lookup(url)).body
+        else: await cache.store(url, resp_headers, body)
+    """
+
+    def __init__(self, store: Optional[CacheStore] = None, store_body: bool = True):
+        """
+        :param store_body: 只要判斷「有沒有變」時（例如 BaseSource 輪詢）設 False，只存驗證碼
+        """
+        self.backend = store or MemoryCacheStore()
+        self.store_body = store_body
+        self.not_modified = 0
+        self.misses = 0
+        self.stored = 0
+
+    async def lookup(self, url: str) -> Optional[CacheEntry]:
+        return await self.backend.get(url)
+
+    @staticmethod
+    def headers_for(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    async def conditional_headers(self, url: str) -> Dict[str, str]:
+        return self.headers_for(await self.lookup(url))
+
+    async def store(self, url: str, headers: Mapping[str, str], body: Optional[str]) -> bool:
+        """200 回應後呼叫；沒有驗證碼或 Cache-Control: no-store 時不存，回傳是否有存"""
+        self.misses += 1
+        cache_control = (headers.get("Cache-Control") or "").lower()
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if "no-store" in cache_control or not (etag or last_modified):
+            await self.backend.delete(url)
+            return False
+        await self.backend.set(url, CacheEntry(etag, last_modified, body if self.store_body else None))
+        self.stored += 1
+        return True
+
+    def record_not_modified(self) -> None:
+        self.not_modified += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.not_modified + self.misses
+        return {
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "stored": self.stored,
+            "hit_ratio": self.not_modified / total if total else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    class FakeServer:
+        """ETag 為內容 hash，模擬內容每 3 次輪詢才變一次"""
+
+        def __init__(self):
+            self.polls = 0
+
+        def get(self, headers: Mapping[str, str]):
+            version = self.polls // 3
+            self.polls += 1
+            body = json.dumps({"id": version, "payload": "x" * 1000})
+            etag = f'"{hashlib.md5(body.encode()).hexdigest()}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, ""
+            return 200, {"ETag": etag}, body
+
+    async def demo():
+        cache = HTTPCache(MemoryCacheStore())
+        server = FakeServer()
+        url = "https://example.com/source_a/data"
+        downloaded = 0
+        for _ in range(9):
+            status, headers, body = server.get(await cache.conditional_headers(url))
+            if status == 304:
+                cache.record_not_modified()
+                continue
+            downloaded += len(body)
+            await cache.store(url, headers, body)
+        print(f"✅ 9 次輪詢下載 {downloaded} bytes，快取統計: {cache.stats()}")
+
+    asyncio.run(demo())
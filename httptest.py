@@ -1,16 +1,24 @@
 import time
 import random
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Tuple
 from requests import Session
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from fetchengine import FetchPolicy, fetch_blocking, host_of
+
 def create_session_with_retries(
     proxy_url: Optional[str] = None,
     total_retries: int = 3,
     backoff_factor: float = 0.5,
+    pool_size: int = 10,
 ) -> Session:
+    """
+    :param pool_size: 每個 host 保留的連線數；多執行緒共用 session 時要 >= 執行緒數，否則連線會被丟掉重建
+    """
     session = requests.Session()
 
     retries = Retry(
@@ -20,7 +28,10 @@ def create_session_with_retries(
         allowed_methods=["GET"]
     )
 
-    adapter = HTTPAdapter(max_retries=retries)
+    # total_retries=0：重試交給 fetchengine.FetchPolicy，避免 urllib3 先把 429 吃掉
+    adapter = HTTPAdapter(max_retries=retries if total_retries > 0 else 0,
+                          pool_connections=pool_size,
+                          pool_maxsize=pool_size)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
 
@@ -38,30 +49,63 @@ def fetch_with_rate_limit_handling(
     headers: Optional[Dict[str, str]] = None,
     max_retry_wait: int = 300
 ) -> str:
-    """自動處理 Rate Limit 與 Retry-After header"""
-    while True:
-        try:
-            res = session.get(url, headers=headers, timeout=10)
-            if res.status_code == 429:
-                retry_after = res.headers.get("Retry-After")
-                wait_time = int(retry_after) if retry_after and retry_after.isdigit() else 5
-                wait_time = min(wait_time, max_retry_wait)
-                print(f"[Rate Limit] 等待 {wait_time} 秒後重試...")
-                time.sleep(wait_time)
-                continue
-
-            res.raise_for_status()
-            return res.text  # 或 response.json() 視實際需求
+    """自動處理 Rate Limit 與 Retry-After header（規則與 async fetcher 共用 fetchengine.FetchPolicy）"""
+    return fetch_blocking(session, url, FetchPolicy(max_retry_wait=max_retry_wait), headers)
+
+class HostPoliteness:
+    """
+    per-host 的請求間隔：同一個 host 兩次請求的開始時間至少相隔 min_delay ~ max_delay（隨機），
+    不同 host 互不影響。多執行緒同時呼叫 wait() 時各自預約下一個時段，不會一起擠進來。
+
+    所以單一 host 的吞吐量上限是 max_rate = 1 / 平均間隔，跟執行緒數無關（0.2 ~ 0.5 秒約 2.9 req/s）。
+    多執行緒的好處是請求送出後不用等回應就能開始下一個時段，以及不同 host 可以同時抓，
+    不會把同一個 upstream 打得更兇。
+    """
+
+    def __init__(self, min_delay: float = 0.2, max_delay: float = 0.5):
+        """
+        :param min_delay: 同一個 host 兩次請求開始時間的最短間隔（秒）
+        :param max_delay: 最長間隔；每次在 min_delay ~ max_delay 之間隨機
+        """
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_rate(self) -> float:
+        """同一個 host 每秒最多幾個請求（以平均間隔計算）"""
+        mean_gap = (self.min_delay + self.max_delay) / 2
+        return 1 / mean_gap if mean_gap > 0 else float("inf")
+
+    def wait(self, url: str) -> None:
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + random.uniform(self.min_delay, self.max_delay)
+        if slot > now:
+            time.sleep(slot - now)
 
-        except requests.exceptions.RequestException as e:
-            raise e
 
 def fetch_twitter_data(
     ids: List[int],
     base_url: str = "https://twitter.com/get/",
-    proxy: Optional[str] = None
+    proxy: Optional[str] = None,
+    workers: int = 1,
+    min_delay: float = 0.2,
+    max_delay: float = 0.5,
+    politeness: Optional[HostPoliteness] = None
 ) -> Tuple[Dict[int, str], List[int]]:
-    session = create_session_with_retries(proxy_url=proxy)
+    """
+    :param workers: 執行緒數；1 為原本的逐筆模式，>1 時共用同一個 Session 並行抓取
+    :param min_delay: 同一個 host 兩次請求開始時間的最短間隔（秒），跟 workers 無關
+    :param max_delay: 最長間隔；單一 host 上限約 1 / ((min_delay + max_delay) / 2) req/s
+    :param politeness: 直接給 HostPoliteness（例如多次呼叫共用同一份 per-host 時段）；給了就忽略 min_delay / max_delay
+    :return: (results, failed_ids)，兩者都依 ids 的順序排列
+    """
+    session = create_session_with_retries(proxy_url=proxy, total_retries=0, pool_size=max(workers, 1))
+    politeness = politeness or HostPoliteness(min_delay, max_delay)
 
     headers: Dict[str, str] = {
         "User-Agent": "Mozilla/5.0 (compatible; MyBot /1.0)",
@@ -71,18 +115,32 @@ def fetch_twitter_data(
     results: Dict[int, str] = {}
     failed_ids: List[int] = []
 
-    for id_ in ids:
+    def fetch_one(id_: int) -> Tuple[int, Optional[str], Optional[Exception]]:
         url = f"{base_url}{id_}"
+        politeness.wait(url)  # 隨機 delay 模擬人類行為，只限制同一個 host
         try:
-            print(f"[Fetch] ID={id_}")
-            data = fetch_with_rate_limit_handling(session, url, headers=headers)
-            results[id_] = data
+            return id_, fetch_with_rate_limit_handling(session, url, headers=headers), None
         except Exception as e:
-            print(f"[Error] ID {id_} failed: {e}")
+            return id_, None, e
+
+    def report(id_: int, data: Optional[str], error: Optional[Exception]) -> None:
+        print(f"[Fetch] ID={id_}")
+        if error is None:
+            results[id_] = data
+        else:
+            print(f"[Error] ID {id_} failed: {error}")
             failed_ids.append(id_)
 
-        time.sleep(random.uniform(0.2, 0.5))  # 隨機 delay 模擬人類行為
+    if workers <= 1:
+        for id_ in ids:
+            report(*fetch_one(id_))
+    else:
+        # map 依輸入順序回傳：輸出與結果順序和逐筆模式相同，慢的 ID 不會擋住其他執行緒繼續抓
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+            for outcome in executor.map(fetch_one, ids):
+                report(*outcome)
 
+    session.close()
     return results, failed_ids
 
 # ✅ 使用範例
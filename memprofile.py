@@ -0,0 +1,125 @@
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+class _CallState:
+    __slots__ = ("before", "peak", "snapshot")
+
+    def __init__(self, before: int, snapshot: Optional[tracemalloc.Snapshot]):
+        self.before = before
+        self.peak = before
+        self.snapshot = snapshot
+
+
+class MethodAllocStats:
+    __slots__ = ("calls", "net_total", "peak_max", "peak_total")
+
+    def __init__(self):
+        self.calls = 0
+        self.net_total = 0
+        self.peak_max = 0
+        self.peak_total = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "net_total": self.net_total,
+            "net_avg": self.net_total / self.calls if self.calls else 0,
+            "peak_max": self.peak_max,
+            "peak_avg": self.peak_total / self.calls if self.calls else 0,
+        }
+
+
+class AllocationProfiler:
+    """
+    以 tracemalloc 量測被裝飾方法每次呼叫的淨配置量與峰值。
+
+    tracemalloc 只在至少有一個被裝飾的呼叫進行中時才開啟，最後一個呼叫結束就關閉，
+    其他程式碼不必承擔追蹤成本。peak 是整個行程在該呼叫期間的峰值，
+    async 並行時會包含同時段其他 task 的配置。
+    """
+
+    def __init__(self, trace_sites: bool = False, top_sites: int = 10, frames: int = 1):
+        """
+        :param trace_sites: 每次呼叫前後各取一次 tracemalloc snapshot 比對，找出配置最多的程式行；
+                            成本與追蹤中的配置數成正比，預設關閉，只看淨配置與峰值時不需要
+        """
+        self.trace_sites = trace_sites
+        self.top_sites = top_sites
+        self.frames = frames
+        self.stats: Dict[str, MethodAllocStats] = defaultdict(MethodAllocStats)
+        self.sites: Dict[str, Counter] = defaultdict(Counter)
+        self._active: List[_CallState] = []
+        self._started_tracing = False
+        self._lock = threading.Lock()
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+
+    def _fold_peak(self) -> None:
+        # reset_peak 會影響所有進行中的呼叫，重設前先把目前峰值記到每個呼叫上
+        _, peak = tracemalloc.get_traced_memory()
+        for state in self._active:
+            if peak > state.peak:
+                state.peak = peak
+        tracemalloc.reset_peak()
+
+    def start_call(self) -> _CallState:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_tracing = True
+            self._fold_peak()
+            snapshot = tracemalloc.take_snapshot().filter_traces(self._filters) if self.trace_sites else None
+            current, _ = tracemalloc.get_traced_memory()
+            state = _CallState(current, snapshot)
+            self._active.append(state)
+            return state
+
+    def finish_call(self, method: str, state: _CallState) -> None:
+        with self._lock:
+            self._fold_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            self._active.remove(state)
+
+            stats = self.stats[method]
+            stats.calls += 1
+            stats.net_total += current - state.before
+            peak = state.peak - state.before
+            stats.peak_total += peak
+            stats.peak_max = max(stats.peak_max, peak)
+
+            if state.snapshot is not None:
+                after = tracemalloc.take_snapshot().filter_traces(self._filters)
+                for diff in after.compare_to(state.snapshot, "lineno"):
+                    if diff.size_diff > 0:
+                        frame = diff.traceback[0]
+                        self.sites[method][f"{frame.filename}:{frame.lineno}"] += diff.size_diff
+
+            if not self._active and self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def top_allocation_sites(self, method: str, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        return self.sites[method].most_common(limit or self.top_sites)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {
+                method: {**stats.as_dict(), "top_sites": self.top_allocation_sites(method)}
+                for method, stats in self.stats.items()
+            }
+
+    def report(self) -> str:
+        lines = []
+        for method, info in sorted(self.snapshot().items(), key=lambda kv: -kv[1]["peak_max"]):
+            lines.append(
+                f"[{method}] 呼叫 {info['calls']} 次，淨配置 {info['net_total']:,} B"
+                f"（平均 {info['net_avg']:,.0f} B），峰值 {info['peak_max']:,} B（平均 {info['peak_avg']:,.0f} B）"
+            )
+            for site, size in info["top_sites"]:
+                lines.append(f"    {size:>12,} B  {site}")
+        return "\n".join(lines)
@@ -0,0 +1,317 @@
+import bisect
+import json
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Any
+
+# 預設 bucket（秒），涵蓋 1ms ~ 60s 的呼叫
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+DEFAULT_QUANTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 1024  # 每個 series 保留最近 N 筆樣本計算分位數
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _quantile(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return float("nan")
+    # 線性內插，與 numpy 預設的 percentile 行為一致
+    pos = (len(sorted_samples) - 1) * q
+    lo = math.floor(pos)
+    hi = math.ceil(pos)
+    if lo == hi:
+        return sorted_samples[lo]
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (pos - lo)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Optional[Dict[str, str]] = None, amount: float = 1.0) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self, openmetrics: bool) -> List[str]:
+        # OpenMetrics 的 family 名稱不含 _total，Prometheus 0.0.4 則含
+        family = self.name if openmetrics else f"{self.name}_total"
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} counter"]
+        for key, value in sorted(self._values.copy().items()):
+            lines.append(f"{self.name}_total{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(key), "value": value} for key, value in sorted(self._values.copy().items())]
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, labels: Optional[Dict[str, str]] = None, amount: float = 1.0) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, labels: Optional[Dict[str, str]] = None, amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    def get(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self, openmetrics: bool) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self._values.copy().items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(key), "value": value} for key, value in sorted(self._values.copy().items())]
+
+
+class _HistogramSeries:
+    def __init__(self, n_buckets: int):
+        self.bucket_counts = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque = deque(maxlen=RESERVOIR_SIZE)
+
+
+class Histogram:
+    """
+    累積型 bucket 直方圖，另外保留最近的樣本以便直接輸出 p50/p95/p99。
+
+    分位數以 `<name>_quantile{quantile="0.99"}` gauge 的形式輸出，
+    避免與 histogram family 的名稱衝突。
+    """
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 quantiles: Tuple[float, ...] = DEFAULT_QUANTILES):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.quantiles = quantiles
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            if idx < len(self.buckets):
+                series.bucket_counts[idx] += 1
+            series.count += 1
+            series.sum += value
+            series.samples.append(value)
+
+    def percentiles(self, labels: Optional[Dict[str, str]] = None) -> Dict[float, float]:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            samples = sorted(series.samples) if series else []
+        return {q: _quantile(samples, q) for q in self.quantiles}
+
+    def render(self, openmetrics: bool) -> List[str]:
+        with self._lock:
+            return self._render_locked()
+
+    def _render_locked(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.bucket_counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series.count}")
+
+        q_name = f"{self.name}_quantile"
+        lines.append(f"# HELP {q_name} {self.documentation} (recent {RESERVOIR_SIZE} samples)")
+        lines.append(f"# TYPE {q_name} gauge")
+        for key, series in sorted(self._series.items()):
+            samples = sorted(series.samples)
+            for q in self.quantiles:
+                value = _quantile(samples, q)
+                lines.append(f"{q_name}{_format_labels(key, ('quantile', str(q)))} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        result = []
+        with self._lock:
+            items = [(key, series.count, series.sum, list(series.bucket_counts), list(series.samples))
+                     for key, series in sorted(self._series.items())]
+        for key, count, total, bucket_counts, raw_samples in items:
+            samples = sorted(raw_samples)
+            result.append({
+                "labels": dict(key),
+                "count": count,
+                "sum": total,
+                "buckets": dict(zip(self.buckets, bucket_counts)),
+                "quantiles": {str(q): _quantile(samples, q) for q in self.quantiles},
+                "samples": raw_samples,
+            })
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self, namespace: str = "profiled", call_metrics: bool = True):
+        """
+        :param call_metrics: 註冊 profiler 裝飾器用的 calls / exceptions / call_duration；
+                             給其他元件自己定義指標的 registry（例如 RedisStats）設 False，輸出才不會多出空的指標
+        """
+        self.namespace = namespace
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+        self.calls: Optional[Counter] = None
+        self.exceptions: Optional[Counter] = None
+        self.duration: Optional[Histogram] = None
+        if call_metrics:
+            self.calls = self.counter("calls", "Number of profiled method calls")
+            self.exceptions = self.counter("exceptions", "Number of profiled calls that raised")
+            self.duration = self.histogram("call_duration_seconds", "Profiled method call duration in seconds")
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"metric {metric.name} 已以不同型別註冊")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(self._full_name(name), documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(self._full_name(name), documentation))
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self._full_name(name), documentation, buckets))
+
+    def observe_call(self, method: str, duration: float, exception: Optional[BaseException] = None) -> None:
+        """給 profiler2 的裝飾器呼叫：依 __qualname__ 累計次數、耗時與例外"""
+        if self.calls is None:
+            raise RuntimeError("這個 registry 建立時 call_metrics=False，不能給 profiler 使用")
+        labels = {"method": method}
+        self.calls.inc(labels)
+        self.duration.observe(duration, labels)
+        if exception is not None:
+            self.exceptions.inc({"method": method, "exception": type(exception).__name__})
+
+    def render(self, openmetrics: bool = False) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {
+            "started_at": self.started_at,
+            "dumped_at": time.time(),
+            "metrics": {name: {"type": type(m).__name__.lower(), "series": m.snapshot()}
+                        for name, m in metrics.items()},
+        }
+
+    def dump_to_file(self, path: str, fmt: str = "prom") -> None:
+        """fmt: prom（Prometheus 文字）、openmetrics 或 json（含原始樣本，可給 profile_compare 使用）"""
+        if fmt == "json":
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        elif fmt in ("prom", "openmetrics"):
+            content = self.render(openmetrics=(fmt == "openmetrics"))
+        else:
+            raise ValueError(f"不支援的格式: {fmt}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9109) -> ThreadingHTTPServer:
+        """在背景 thread 啟動 /metrics endpoint，回傳 server 方便呼叫 shutdown()"""
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = registry.render(openmetrics=openmetrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 不要讓 scrape 洗版
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+        return server
@@ -0,0 +1,328 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+Item = Dict[str, Any]
+
+
+class OutboxJournal:
+    """
+    Outbox 的落地紀錄（append-only JSONL）：
+
+      {"seq": 12, "item": {...}}   放進 outbox
+      {"ack": [10, 11, 12]}         已成功送出（或已移到 dead-letter 檔）
+
+    重啟時重播，沒有 ack 的 item 依 seq 順序回到待送清單；ack 累積 compact_every 筆後
+    把待送的 item 重寫成新檔（tmp + rename），檔案不會無限長大。
+    一直送不出去的 item 寫到 outbox.dead.jsonl（{"seq", "item", "error"}），由人工檢查後再處理。
+    """
+
+    def __init__(self, state_dir: str = "outbox", fsync: bool = True, compact_every: int = 10_000):
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, "outbox.jsonl")
+        self.dead_letter_path = os.path.join(state_dir, "outbox.dead.jsonl")
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self._acked_since_compact = 0
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def load(self) -> List[Tuple[int, Item]]:
+        pending: Dict[int, Item] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # 當機時寫到一半的最後一行
+                    if "ack" in rec:
+                        self._acked_since_compact += len(rec["ack"])
+                        for seq in rec["ack"]:
+                            pending.pop(seq, None)
+                    else:
+                        pending[rec["seq"]] = rec["item"]
+        return sorted(pending.items())
+
+    def _write(self, lines: List[str]) -> None:
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write("\n".join(lines) + "\n")
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+
+    def append(self, records: List[Tuple[int, Item]]) -> None:
+        self._write([json.dumps({"seq": seq, "item": item}, ensure_ascii=False) for seq, item in records])
+
+    def ack(self, seqs: List[int]) -> None:
+        self._write([json.dumps({"ack": seqs})])
+        self._acked_since_compact += len(seqs)
+
+    def dead_letter(self, records: List[Tuple[int, Item]], error: str) -> None:
+        """先把 item 寫進 dead-letter 檔並 fsync，再在 journal 記成 ack"""
+        with self._lock:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for seq, item in records:
+                    f.write(json.dumps({"seq": seq, "item": item, "error": error}, ensure_ascii=False) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        self.ack([seq for seq, _ in records])
+
+    def should_compact(self) -> bool:
+        return self._acked_since_compact >= self.compact_every
+
+    def compact(self, pending: List[Tuple[int, Item]]) -> None:
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for seq, item in pending:
+                    f.write(json.dumps({"seq": seq, "item": item}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            os.replace(tmp_path, self.path)
+            self._acked_since_compact = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+class Outbox:
+    """
+    批次、可重啟的轉發佇列：put() 先落地再回傳，背景 task 累積到 max_batch 筆
+    或最舊的一筆等了 flush_interval 秒就整批交給 send_batch 送出（一次請求）。
+    送出失敗整批保留、依指數退避重試；同一批連續失敗 max_attempts 次（接收端一直拒收）就移到
+    dead-letter 檔，不再擋住後面的資料。重啟後從 journal 接著送。
+    保證的是 at-least-once：送出後、ack 落地前當機的那一批，下次會再送一次，接收端要能依 item 的 ID 去重。
+
+        async with Outbox(send_batch, state_dir="outbox") as outbox:
+            await outbox.put({"id": 1, ...})
+    """
+
+    def __init__(self,
+                 send_batch: Callable[[List[Item]], Awaitable[None]],
+                 state_dir: str = "outbox",
+                 max_batch: int = 100,
+                 flush_interval: float = 1.0,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0,
+                 fsync: bool = True,
+                 max_attempts: Optional[int] = 20):
+        """
+        :param send_batch: 送出一批 item 的 async 函式，失敗時拋例外
+        :param flush_interval: 最舊的待送 item 最多等這麼久就送，不足 max_batch 也送
+        :param max_attempts: 同一批最多嘗試幾次，之後移到 dead-letter 檔；預設退避上限 60 秒時約 15 分鐘。
+                             None 表示一直重試（接收端拒收的資料會永遠擋住後面的）
+        """
+        self.send_batch = send_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.journal = OutboxJournal(state_dir, fsync=fsync)
+        self._pending: List[Tuple[int, Item, float]] = []  # (seq, item, 放進來的時間)
+        self._next_seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._attempt = 0  # 目前第一批已連續失敗的次數
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        now = time.monotonic()
+        self._pending = [(seq, item, now) for seq, item in await asyncio.to_thread(self.journal.load)]
+        self._next_seq = self._pending[-1][0] + 1 if self._pending else 0
+        if self._pending:
+            print(f"📮 outbox 從 journal 恢復 {len(self._pending)} 筆待送資料")
+        self._wakeup = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, item: Item) -> None:
+        """item 寫進 journal（fsync）後才回傳；之後就算當機也會在重啟後送出"""
+        if self._task is None:
+            raise RuntimeError("Outbox 尚未 start()")
+        seq, self._next_seq = self._next_seq, self._next_seq + 1
+        # 先放進待送清單再寫 journal：寫入期間若剛好 compaction，新檔也會包含這筆（重播時 seq 重複會合併）
+        self._pending.append((seq, item, time.monotonic()))
+        await asyncio.to_thread(self.journal.append, [(seq, item)])
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _wait_for_batch(self) -> None:
+        while not self._closing:
+            if len(self._pending) >= self.max_batch:
+                return
+            if self._pending:
+                remaining = self._pending[0][2] + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    return
+            else:
+                remaining = None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sleep_unless_closing(self, seconds: float) -> bool:
+        """等 seconds 秒；途中開始 close 就提早回傳 True"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _send_pending(self, give_up_at: Optional[float] = None) -> bool:
+        """
+        依序送出目前所有待送的批次，全部成功回傳 True。
+        give_up_at 之後不再重試；背景 task（give_up_at 為 None）遇到 close 時送完手上這批就回傳，剩下的交給 close
+        """
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            items = [item for _, item, _ in batch]
+            try:
+                if give_up_at is None:
+                    await self.send_batch(items)
+                else:
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    try:
+                        await asyncio.wait_for(self.send_batch(items), remaining)
+                    except asyncio.TimeoutError:
+                        return False  # drain 的時間用完，這批留在 journal
+            except Exception as e:
+                self._attempt += 1
+                self.failures += 1
+                if self.max_attempts is not None and self._attempt >= self.max_attempts:
+                    print(f"☠️ outbox 送出 {len(batch)} 筆連續失敗 {self._attempt} 次：{e!r}，"
+                          f"移到 {self.journal.dead_letter_path}")
+                    await asyncio.to_thread(self.journal.dead_letter, [(seq, item) for seq, item, _ in batch], repr(e))
+                    await self._remove_sent(batch)
+                    self.dead_lettered += len(batch)
+                    continue
+                wait = self._backoff(self._attempt)
+                print(f"❌ outbox 送出 {len(batch)} 筆失敗（第 {self._attempt} 次）：{e!r}，{wait:.1f}s 後重試")
+                if give_up_at is not None:
+                    if time.monotonic() + wait >= give_up_at:
+                        return False
+                    await asyncio.sleep(wait)
+                elif await self._sleep_unless_closing(wait):
+                    return False
+                continue
+            await asyncio.to_thread(self.journal.ack, [seq for seq, _, _ in batch])
+            await self._remove_sent(batch)
+            self.sent += len(batch)
+            self.batches += 1
+            if give_up_at is None and (self._closing or len(self._pending) < self.max_batch):
+                return True  # 不足一批的留給下一輪，等滿或等到 flush_interval
+        return True
+
+    async def _remove_sent(self, batch: List[Tuple[int, Item, float]]) -> None:
+        del self._pending[:len(batch)]
+        self._attempt = 0
+        if self.journal.should_compact():
+            await asyncio.to_thread(self.journal.compact, [(seq, item) for seq, item, _ in self._pending])
+
+    async def _run(self) -> None:
+        while not self._closing:
+            await self._wait_for_batch()
+            if self._closing:
+                return
+            await self._send_pending()
+
+    async def close(self, drain_timeout: float = 10.0) -> None:
+        """
+        不再開始新的批次，等正在送的那一批送完（不在送出途中取消，避免接收端收到後又重送），
+        再盡量在 drain_timeout 秒內把剩下的送完；沒送完的留在 journal，下次啟動再送。
+        只有送出本身卡住超過 drain_timeout 才會取消，那一批下次啟動會再送一次。
+        """
+        if self._task is None:
+            return
+        give_up_at = time.monotonic() + drain_timeout
+        self._closing = True
+        self._stop.set()
+        self._wakeup.set()
+        done, _ = await asyncio.wait({self._task}, timeout=drain_timeout)
+        if not done:
+            print(f"⚠️ outbox 送出超過 {drain_timeout}s 仍未完成，取消這一批（下次啟動會再送）")
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._pending and not await self._send_pending(give_up_at=give_up_at):
+            print(f"⚠️ outbox 還有 {len(self._pending)} 筆未送出，已保存在 {self.journal.path}")
+        await asyncio.to_thread(self.journal.close)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), "sent": self.sent, "batches": self.batches, "failures": self.failures,
+                "dead_lettered": self.dead_lettered}
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    async def demo():
+        state_dir = tempfile.mkdtemp()
+        received: List[Item] = []
+        calls = 0
+
+        async def flaky_send(batch: List[Item]) -> None:
+            nonlocal calls
+            calls += 1
+            if calls % 3 == 0:
+                raise ConnectionError("模擬接收端暫時失敗")
+            received.extend(batch)
+
+        # 第一輪：接收端一直掛掉，close 時送不完 → 留在 journal
+        async def always_fail(batch: List[Item]) -> None:
+            raise ConnectionError("接收端離線")
+
+        outbox = Outbox(always_fail, state_dir, max_batch=10, flush_interval=0.2, backoff_base=0.05)
+        await outbox.start()
+        for i in range(25):
+            await outbox.put({"id": i})
+        await outbox.close(drain_timeout=0.5)
+        print(f"第一輪: {outbox.stats()}")
+
+        # 第二輪：重啟後從 journal 接著送，再加新資料
+        async with Outbox(flaky_send, state_dir, max_batch=10, flush_interval=0.2, backoff_base=0.05) as outbox:
+            for i in range(25, 40):
+                await outbox.put({"id": i})
+            await asyncio.sleep(1)
+        ids = [item["id"] for item in received]
+        print(f"✅ 收到 {len(ids)} 筆，順序正確: {ids == list(range(40))}，統計: {outbox.stats()}")
+        shutil.rmtree(state_dir)
+
+    asyncio.run(demo())
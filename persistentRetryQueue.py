@@ -1,18 +1,221 @@
 import asyncio
-import httpx
+import heapq
 import json
 import os
-from typing import List, Dict, Optional, Tuple
+import random
+import time
+from collections import deque
+from typing import List, Dict, Deque, Optional, Set, Tuple, TYPE_CHECKING
+
+from fetchengine import FetchEngine, FetchPolicy, make_transport
+from resultsink import MemorySink, ResultSink
+
+if TYPE_CHECKING:
+    from bodystream import BodyOptions
+    from connpool import HostPoolManager
+    from hostlimiter import AdaptiveHostLimiter
+    from httpcache import HTTPCache
+    from ratelimit import AsyncRedisTokenBucket
 
 MAX_CONCURRENCY = 10
 MAX_RETRY = 3
 FAILURE_FILE = "failed_ids.json"
 
+class QueueWAL:
+    """
+    PersistentRetryQueue 的 write-ahead log。
+
+    每筆紀錄寫的是 ID 的「最新狀態」（retry 次數 / done / failed），重播時直接覆蓋，
+    所以 compaction 途中當機、snapshot 與 WAL 重疊也不會重複計算。
+    寫入先進 buffer，累積 flush_batch 筆或超過 flush_interval 秒才 write + fsync 一次；
+    在 event loop 上跑時由 PersistentRetryQueue.flush_periodically() 定時在 thread 裡落地。
+    """
+
+    def __init__(self,
+                 state_dir: str,
+                 flush_batch: int = 500,
+                 flush_interval: float = 1.0,
+                 compact_every: int = 50_000,
+                 fsync: bool = True):
+        os.makedirs(state_dir, exist_ok=True)
+        self.snapshot_path = os.path.join(state_dir, "snapshot.json")
+        self.wal_path = os.path.join(state_dir, "wal.jsonl")
+        self.results_path = os.path.join(state_dir, "results.jsonl")
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.fsync = fsync
+        # True：append() 達到門檻就直接在呼叫端 flush（同步用法）；背景 flush 時關掉，fsync 不會卡住 event loop
+        self.auto_flush = True
+        self._buffer: List[str] = []
+        self._result_buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._records_since_compact = 0
+        self._wal = None
+        self._results = None
+
+    def load(self) -> Tuple[Dict[int, int], Set[int], List[int]]:
+        """回傳 (queue, done, failed)，沒有舊狀態時都是空的"""
+        queue: Dict[int, int] = {}
+        done: Set[int] = set()
+        failed: List[int] = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snap = json.load(f)
+            queue = {int(k): v for k, v in snap["queue"].items()}
+            done = set(snap["done"])
+            failed = list(snap["failed"])
+
+        failed_set = set(failed)
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path) as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # 當機時寫到一半的最後一行
+                    id_, state = rec["id"], rec["s"]
+                    self._records_since_compact += 1
+                    if state == "retry":
+                        queue[id_] = rec["n"]
+                    elif state == "done":
+                        queue.pop(id_, None)
+                        done.add(id_)
+                    elif state == "failed":
+                        queue.pop(id_, None)
+                        if id_ not in failed_set:
+                            failed_set.add(id_)
+                            failed.append(id_)
+        return queue, done, failed
+
+    def load_results(self) -> Dict[int, str]:
+        """上次沒跑完時已存下的結果；只有不給 sink（結果收在記憶體）時才會寫 results.jsonl"""
+        results: Dict[int, str] = {}
+        if os.path.exists(self.results_path):
+            with open(self.results_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    results[rec["id"]] = rec["data"]
+        return results
+
+    def _open(self) -> None:
+        if self._wal is None:
+            self._wal = open(self.wal_path, "a")
+            self._results = open(self.results_path, "a", encoding="utf-8")
+
+    def append(self, id_: int, state: str, retries: Optional[int] = None, data: Optional[str] = None) -> None:
+        rec = {"id": id_, "s": state}
+        if retries is not None:
+            rec["n"] = retries
+        self._buffer.append(json.dumps(rec))
+        if data is not None:
+            self._result_buffer.append(json.dumps({"id": id_, "data": data}, ensure_ascii=False))
+        if self.auto_flush and (len(self._buffer) >= self.flush_batch
+                                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def take_batch(self) -> Tuple[List[str], List[str]]:
+        """取走目前的 buffer（狀態, 結果），之後 append 的進新的 buffer"""
+        batch = (self._buffer, self._result_buffer)
+        self._buffer, self._result_buffer = [], []
+        return batch
+
+    def write_batch(self, lines: List[str], result_lines: List[str]) -> None:
+        """寫入並 fsync 一批，可以丟到 thread 執行（同一時間只能有一個寫入者）"""
+        self._last_flush = time.monotonic()
+        if not lines and not result_lines:
+            return
+        self._open()
+        # 結果先落地再寫狀態：狀態是 done 的 ID，結果一定已經在 results.jsonl
+        for fh, buf in ((self._results, result_lines), (self._wal, lines)):
+            if buf:
+                fh.write("\n".join(buf) + "\n")
+                fh.flush()
+                if self.fsync:
+                    os.fsync(fh.fileno())
+        self._records_since_compact += len(lines)
+
+    def flush(self) -> None:
+        self.write_batch(*self.take_batch())
+
+    def should_compact(self) -> bool:
+        return self._records_since_compact >= self.compact_every
+
+    def compact(self,
+                queue: Dict[int, int],
+                done: Set[int],
+                failed: List[int],
+                batch: Optional[Tuple[List[str], List[str]]] = None) -> None:
+        """
+        把目前狀態寫成 snapshot（tmp + rename），再清空 WAL。
+
+        :param batch: 在 thread 裡 compaction 時，跟 queue / done / failed 的複本同一時間 take_batch() 取走的 buffer；
+                      其中的狀態已經包含在複本裡，只剩結果要寫進 results.jsonl。不給時取走目前的 buffer
+        """
+        _, result_lines = self.take_batch() if batch is None else batch
+        self.write_batch([], result_lines)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"queue": queue, "done": sorted(done), "failed": failed}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        if self._wal is not None:
+            self._wal.close()
+        self._wal = open(self.wal_path, "w")
+        self._records_since_compact = 0
+
+    def close(self) -> None:
+        self.flush()
+        for fh in (self._wal, self._results):
+            if fh is not None:
+                fh.close()
+        self._wal = self._results = None
+
+    def clear(self) -> None:
+        """丟掉 buffer 並刪除所有狀態檔（重新開始 / 整批跑完時）"""
+        self.take_batch()
+        for fh in (self._wal, self._results):
+            if fh is not None:
+                fh.close()
+        self._wal = self._results = None
+        for path in (self.snapshot_path, self.wal_path, self.results_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._records_since_compact = 0
+
+
 class PersistentRetryQueue:
-    def __init__(self, ids: List[int], retry_limit: int = MAX_RETRY):
+    def __init__(self,
+                 ids: List[int],
+                 retry_limit: int = MAX_RETRY,
+                 state_dir: Optional[str] = None,
+                 resume: bool = False):
+        """
+        :param state_dir: 指定時狀態寫入 WAL，當機或中斷後可以用 resume=True 接續
+        :param resume: 從 state_dir 上次沒跑完的進度接續（已成功 / 已放棄的 ID 不會重抓）；
+                       False 時清掉舊狀態重新開始。整批跑完後 close() 會自動清掉狀態，下次一律重新開始
+        """
         self.retry_limit = retry_limit
-        self.queue: Dict[int, int] = {id_: 0 for id_ in ids}  # id_: retry count
+        self.queue: Dict[int, int] = {}  # id_: retry count
         self.failed: List[int] = []
+        self.done: Set[int] = set()
+        self.wal = QueueWAL(state_dir) if state_dir else None
+
+        if self.wal is not None:
+            if resume:
+                self.queue, self.done, self.failed = self.wal.load()
+                if self.queue or self.done or self.failed:
+                    print(f"[Resume] 待處理 {len(self.queue)}，已完成 {len(self.done)}，已失敗 {len(self.failed)}")
+            else:
+                self.wal.clear()
+        known = self.done | set(self.failed)
+        for id_ in ids:
+            if id_ not in known and id_ not in self.queue:
+                self.queue[id_] = 0
 
     def get_pending_ids(self) -> List[int]:
         return list(self.queue.keys())
@@ -25,39 +228,78 @@ class PersistentRetryQueue:
         if not self.should_retry(id_):
             self.failed.append(id_)
             del self.queue[id_]
+            self._log(id_, "failed")
+        else:
+            self._log(id_, "retry", retries=self.queue[id_])
 
-    def mark_success(self, id_: int):
+    def mark_success(self, id_: int, data: Optional[str] = None):
         self.queue.pop(id_, None)
+        self.done.add(id_)
+        self._log(id_, "done", data=data)
+
+    def mark_durable(self, ids: List[int]) -> None:
+        """sink 確認結果已經保存後才記成 done；在那之前當機，接續時會重抓（at-least-once）"""
+        for id_ in ids:
+            self.mark_success(id_)
+
+    def _log(self, id_: int, state: str, retries: Optional[int] = None, data: Optional[str] = None):
+        if self.wal is None:
+            return
+        self.wal.append(id_, state, retries, data)
+        if self.wal.auto_flush and self.wal.should_compact():
+            self.wal.compact(self.queue, self.done, self.failed)
+
+    def previous_results(self) -> Dict[int, str]:
+        """上一次（當機前）已成功抓到的結果"""
+        return self.wal.load_results() if self.wal is not None else {}
+
+    def checkpoint(self):
+        if self.wal is not None:
+            self.wal.flush()
+
+    async def checkpoint_async(self) -> None:
+        """在 thread 裡落地（需要時順便 compaction），不卡 event loop；同一時間只能有一個在跑"""
+        if self.wal is None:
+            return
+        if self.wal.should_compact():
+            # 複本跟 buffer 在 event loop 上同一時間取走，compaction 期間新的狀態會留到下一批
+            state = (dict(self.queue), set(self.done), list(self.failed))
+            await asyncio.to_thread(self.wal.compact, *state, self.wal.take_batch())
+        else:
+            await asyncio.to_thread(self.wal.write_batch, *self.wal.take_batch())
+
+    async def flush_periodically(self, stop: asyncio.Event) -> None:
+        """每 flush_interval 秒在 thread 裡落地一次，不管有沒有新的 append；stop 被 set 後再落地最後一次就結束"""
+        if self.wal is None:
+            return
+        self.wal.auto_flush = False
+        try:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), self.wal.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.checkpoint_async()
+        finally:
+            self.wal.auto_flush = True
+
+    def close(self):
+        if self.wal is None:
+            return
+        if self.queue:
+            self.wal.compact(self.queue, self.done, self.failed)
+            self.wal.close()
+        else:
+            self.wal.clear()  # 整批跑完，沒有要接續的進度
 
     def save_failures(self, path: str = FAILURE_FILE):
         with open(path, "w") as f:
             json.dump(self.failed, f, indent=2)
         print(f"[Write] 寫入失敗 ID 至 {path}")
 
-async def fetch_one(
-    sem: asyncio.Semaphore,
-    client: httpx.AsyncClient,
-    id_: int,
-    base_url: str,
-    timeout: float = 10.0
-) -> Tuple[int, Optional[str]]:
-    url = f"{base_url}{id_}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-
-    async with sem:
-        try:
-            resp = await client.get(url, headers=headers, timeout=timeout)
-            if resp.status_code == 429:
-                retry_after = int(resp.headers.get("Retry-After", 5))
-                await asyncio.sleep(min(retry_after, 60))
-                raise TimeoutError(f"Rate limited: ID {id_}")
-            resp.raise_for_status()
-            return id_, resp.text
-        except Exception as e:
-            print(f"[Error] ID {id_} failed: {e}")
-            return id_, None
-        
 def on_task_done(task: asyncio.Task):
+    if task.cancelled():
+        return
     try:
         result = task.result()  # 若有 exception，這裡會 raise
         # 可選：額外 log 或 debug 用
@@ -65,42 +307,153 @@ def on_task_done(task: asyncio.Task):
     except Exception as e:
         print(f"[on_done] Task exception caught: {e}")
         
+class RetryScheduler:
+    """
+    不分輪次的排程：worker 從 ready queue 取 ID，失敗的 ID 依重試次數做指數退避（equal jitter）
+    放進 delay heap，時間到才回到可執行狀態。慢的 ID 不會拖住其他 ID，失敗的也不會立刻被重打。
+    """
+
+    def __init__(self, ids: List[int], base_delay: float = 0.5, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.ready: Deque[int] = deque(ids)
+        self.delayed: List[Tuple[float, int]] = []  # (可執行時間, id_)
+        self.outstanding = len(ids)  # 尚未成功也尚未放棄的 ID 數
+        self._cond = asyncio.Condition()
+
+    def backoff(self, retries: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (retries - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def retry_later(self, id_: int, retries: int) -> None:
+        ready_at = asyncio.get_running_loop().time() + self.backoff(retries)
+        async with self._cond:
+            heapq.heappush(self.delayed, (ready_at, id_))
+            self._cond.notify()
+
+    async def complete(self) -> None:
+        async with self._cond:
+            self.outstanding -= 1
+            if self.outstanding <= 0:
+                self._cond.notify_all()
+
+    async def next_id(self) -> Optional[int]:
+        """取下一個可執行的 ID；全部處理完時回傳 None"""
+        loop = asyncio.get_running_loop()
+        async with self._cond:
+            while True:
+                if self.outstanding <= 0:
+                    return None
+                if self.ready:
+                    return self.ready.popleft()
+                now = loop.time()
+                if self.delayed and self.delayed[0][0] <= now:
+                    return heapq.heappop(self.delayed)[1]
+                timeout = self.delayed[0][0] - now if self.delayed else None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+
 async def run_retry_queue(
     queue: PersistentRetryQueue,
     base_url: str,
-    proxy: Optional[str] = None
+    proxy: Optional[str] = None,
+    limiter: Optional["AsyncRedisTokenBucket"] = None,
+    concurrency: int = MAX_CONCURRENCY,
+    host_limiter: Optional["AdaptiveHostLimiter"] = None,
+    sink: Optional[ResultSink] = None,
+    transport: str = "httpx",
+    pools: Optional["HostPoolManager"] = None,
+    cache: Optional["HTTPCache"] = None,
+    body: Optional["BodyOptions"] = None
 ) -> Dict[int, str]:
-    results: Dict[int, str] = {}
-    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    """
+    :param concurrency: worker 數；搭配 host_limiter 時是併發的上限，實際併發由各 host 的 AIMD 決定
+    :param sink: 結果寫到 sink 並由 sink 負責保存，WAL 只記狀態、回傳空 dict；
+                 不給時沿用舊行為，連同上次已抓到的結果收進 dict 回傳。
+                 sink 是 deferred_ack（例如 JsonlShardSink）時，等 sink fsync 後才在 WAL 記成 done。
+                 sink 寫入失敗時停掉所有 worker 並把例外往外拋，進度留在 WAL 可以 resume
+    :param transport: HTTP 後端（httpx / aiohttp / requests）
+    :param pools: per-host 連線池設定（HTTP/2、DNS 快取、重用率統計）
+    :param cache: 條件式請求快取（ETag / Last-Modified）
+    :param body: 大回應的串流讀取設定（大小上限、落地暫存檔、在 executor 解碼 / 解析）
+    """
+    memory = MemorySink(queue.previous_results()) if sink is None else None
+    out = sink if sink is not None else memory
+    deferred = sink is not None and sink.deferred_ack
+    if deferred:
+        sink.on_durable = queue.mark_durable
+    scheduler = RetryScheduler(queue.get_pending_ids())
+    # 重試交給 queue + RetryScheduler，engine 每次只試一次；429 直接交回 scheduler 退避（有 host_limiter 時 host 也會暫停）
+    policy = FetchPolicy(max_attempts=1, max_rate_limited=0, total_timeout=None)
+    transport_options = {"pools": pools} if pools is not None else {}
+    if body is not None:
+        transport_options["body"] = body
+    engine = FetchEngine(make_transport(transport, proxy=proxy, **transport_options), policy,
+                         concurrency=concurrency, headers={"User-Agent": "Mozilla/5.0"},
+                         limiter=limiter, host_limiter=host_limiter, cache=cache)
 
-    async with httpx.AsyncClient(proxies=proxy, timeout=15.0) as client:
-        while queue.get_pending_ids():
-            pending_ids = queue.get_pending_ids()
+    async def worker():
+        while True:
+            id_ = await scheduler.next_id()
+            if id_ is None:
+                return
+            try:
+                data = await engine.fetch(f"{base_url}{id_}", label=f"ID {id_}")
+            except Exception as e:
+                print(f"[main] Task failed: {e}")
+                data = None
 
-            tasks = []
-            for id_ in pending_ids:
-                coro = fetch_one(sem, client, id_, base_url)
-                task = asyncio.create_task(coro)
-                task.add_done_callback(on_task_done)  # ✅ 加上 callback
-                tasks.append(task)
+            if data is not None:
+                await out.write(id_, data)  # sink 處理不及時在這裡等，worker 不會再取新的 ID
+                if not deferred:
+                    queue.mark_success(id_, data if memory is not None else None)
+                await scheduler.complete()
+            else:
+                queue.mark_failure(id_)
+                if id_ in queue.queue:
+                    await scheduler.retry_later(id_, queue.queue[id_])
+                else:
+                    await scheduler.complete()  # 超過重試上限，放棄
 
-            for future in asyncio.as_completed(tasks):
-                try:
-                    id_, data = await future
-                    if data is not None:
-                        results[id_] = data
-                        queue.mark_success(id_)
-                    else:
-                        queue.mark_failure(id_)
-                except Exception as e:
-                    # ✅ 還是建議這裡再加一次 try/except
-                    print(f"[main] Task failed: {e}")
+    async with engine:
+        stop = asyncio.Event()
+        flusher = asyncio.create_task(queue.flush_periodically(stop))
+        workers = []
+        for _ in range(concurrency):
+            task = asyncio.create_task(worker())
+            task.add_done_callback(on_task_done)  # ✅ 加上 callback
+            workers.append(task)
+        try:
+            await asyncio.gather(*workers)
+            await out.flush()  # 最後一批確認保存、記成 done 之後才收尾
+        except BaseException:
+            # 例如 sink 寫入失敗：其他 worker 會一直等在 next_id，全部取消後把例外往外拋
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            if deferred:
+                sink.on_durable = None
+            stop.set()
+            await flusher
+            await asyncio.to_thread(queue.close)
 
     queue.save_failures()
-    return results
+    return memory.results if memory is not None else {}
 
-def run(ids: List[int], base_url: str = "https://twitter.com/get/", proxy: Optional[str] = None):
-    queue = PersistentRetryQueue(ids)
+def run(ids: List[int],
+        base_url: str = "https://twitter.com/get/",
+        proxy: Optional[str] = None,
+        state_dir: Optional[str] = "retry_state",
+        resume: bool = False):
+    """
+    :param resume: 接續 state_dir 裡上次中斷的進度；預設重新開始
+    """
+    queue = PersistentRetryQueue(ids, state_dir=state_dir, resume=resume)
     results = asyncio.run(run_retry_queue(queue, base_url, proxy))
     print(f"成功數量: {len(results)}")
     print(f"寫入失敗檔案: {FAILURE_FILE}")
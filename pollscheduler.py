@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# poll 函式的回傳值：內容有變 / 沒變（含 304）/ 失敗
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+ERROR = "error"
+
+
+class PollInterval:
+    """
+    單一來源的輪詢間隔：沒變就乘上 backoff 慢慢拉長，有變就乘上 speedup 縮短，
+    失敗時乘上 error_backoff；都限制在 [min_interval, max_interval] 之間。
+    """
+
+    def __init__(self,
+                 base: float = 10.0,
+                 min_interval: float = 2.0,
+                 max_interval: float = 300.0,
+                 backoff: float = 1.5,
+                 speedup: float = 0.5,
+                 error_backoff: float = 2.0,
+                 jitter: float = 0.1):
+        """
+        :param base: 初始間隔（秒）
+        :param jitter: 每次實際等待在 current * (1 ± jitter) 之間隨機，避免多個來源同時打出去
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.speedup = speedup
+        self.error_backoff = error_backoff
+        self.jitter = jitter
+        self.current = self._clamp(base)
+
+    def _clamp(self, value: float) -> float:
+        return max(self.min_interval, min(self.max_interval, value))
+
+    def update(self, outcome: Optional[str]) -> float:
+        if outcome == CHANGED:
+            self.current = self._clamp(self.current * self.speedup)
+        elif outcome == UNCHANGED:
+            self.current = self._clamp(self.current * self.backoff)
+        else:
+            self.current = self._clamp(self.current * self.error_backoff)
+        return self.current
+
+    def next_delay(self) -> float:
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class _PollState:
+    def __init__(self, name: str, poll: Callable[[], Awaitable[Optional[str]]], interval: PollInterval):
+        self.name = name
+        self.poll = poll
+        self.interval = interval
+        self.polls = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_change: Optional[float] = None
+
+
+class PollScheduler:
+    """
+    每個來源各自一個輪詢迴圈，依自己的 PollInterval 決定下次何時 poll；
+    所有來源共用一個 semaphore，同時進行的 poll 不超過 max_concurrency。
+
+        scheduler = PollScheduler(max_concurrency=5)
+        scheduler.add("source_a", source_a.monitor)
+        await scheduler.run()
+    """
+
+    def __init__(self,
+                 max_concurrency: int = 5,
+                 interval_factory: Callable[[], PollInterval] = PollInterval,
+                 startup_spread: float = 0.5):
+        """
+        :param interval_factory: add() 沒指定 interval 時用來建立預設的 PollInterval
+        :param startup_spread: 啟動時第一次 poll 在 0 ~ startup_spread 秒內錯開；
+                               只是避免同時打出去，不能拖慢啟動後第一次偵測到變化的時間
+        """
+        self.max_concurrency = max_concurrency
+        self.interval_factory = interval_factory
+        self.startup_spread = startup_spread
+        self._states: List[_PollState] = []
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def add(self, name: str, poll: Callable[[], Awaitable[Optional[str]]], interval: Optional[PollInterval] = None) -> None:
+        """
+        :param poll: 回傳 CHANGED / UNCHANGED / ERROR 的 async 函式；拋出例外視為 ERROR
+        """
+        self._states.append(_PollState(name, poll, interval or self.interval_factory()))
+
+    async def _run_one(self, state: _PollState) -> None:
+        # 第一次 poll 幾乎立刻進行，只小幅錯開；同時進行的數量本來就受 semaphore 限制
+        await asyncio.sleep(random.uniform(0, min(self.startup_spread, state.interval.current)))
+        while True:
+            async with self._sem:
+                try:
+                    outcome = await state.poll()
+                except Exception as e:
+                    print(f"❌ [{state.name}] poll 失敗：{e!r}")
+                    outcome = ERROR
+            state.polls += 1
+            if outcome == CHANGED:
+                state.changes += 1
+                state.last_change = time.time()
+            elif outcome != UNCHANGED:
+                state.errors += 1
+            state.interval.update(outcome)
+            await asyncio.sleep(state.interval.next_delay())
+
+    async def run(self) -> None:
+        """一直跑到被取消；單一來源的迴圈不會因為 poll 出錯而結束"""
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(self._run_one(state) for state in self._states))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            state.name: {
+                "interval": round(state.interval.current, 2),
+                "polls": state.polls,
+                "changes": state.changes,
+                "errors": state.errors,
+                "last_change": state.last_change,
+            }
+            for state in self._states
+        }
+
+
+if __name__ == "__main__":
+    class FakeSource:
+        """每 change_every 秒內容變一次"""
+
+        def __init__(self, change_every: float):
+            self.change_every = change_every
+            self.version = -1
+            self.start = time.monotonic()
+
+        async def poll(self) -> str:
+            version = int((time.monotonic() - self.start) / self.change_every)
+            changed, self.version = version != self.version, version
+            return CHANGED if changed else UNCHANGED
+
+    async def demo():
+        scheduler = PollScheduler(max_concurrency=2,
+                                  interval_factory=lambda: PollInterval(base=0.5, min_interval=0.1, max_interval=3.0))
+        scheduler.add("hot", FakeSource(0.3).poll)
+        scheduler.add("cold", FakeSource(100).poll)
+        try:
+            await asyncio.wait_for(scheduler.run(), timeout=8)
+        except asyncio.TimeoutError:
+            pass
+        for name, stats in scheduler.stats().items():
+            print(f"📊 {name}: {stats}")
+
+    asyncio.run(demo())
@@ -0,0 +1,306 @@
+"""
+比較兩次 profile 結果（baseline vs candidate），找出顯著的延遲 / 吞吐量退步。
+
+支援的輸入：
+  - profiler2 寫出的文字 log（"... [Class.method] 耗時: 0.123456 秒"）
+  - metrics.MetricsRegistry.dump_to_file(..., fmt="json") 匯出的 JSON（含原始樣本）
+
+用法：
+  python profile_compare.py baseline.log candidate.log --threshold 0.10 --alpha 0.05
+
+有任何方法退步超過門檻且統計顯著時，exit code 為 1。
+"""
+import argparse
+import json
+import math
+import random
+import re
+import statistics
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+LOG_LINE = re.compile(
+    r"^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) .*?\[(?P<method>[^\]]+)\] 耗時: (?P<duration>[0-9.eE+-]+) 秒"
+)
+ERROR_LINE = re.compile(r"^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) .*?\[(?P<method>[^\]]+)\] ❌ 發生例外")
+
+BOOTSTRAP_ROUNDS = 1000
+MAX_BOOTSTRAP_SAMPLES = 5000  # 樣本太多時先抽樣，避免純 Python bootstrap 太慢
+
+
+class MethodProfile:
+    def __init__(self, method: str):
+        self.method = method
+        self.durations: List[float] = []
+        self.calls = 0
+        self.errors = 0
+
+    def add(self, duration: float) -> None:
+        self.durations.append(duration)
+        self.calls += 1
+
+
+class ProfileRun:
+    def __init__(self, path: str):
+        self.path = path
+        self.methods: Dict[str, MethodProfile] = {}
+        self.window: Optional[float] = None  # 量測時間窗（秒），用來算吞吐量
+
+    def method(self, name: str) -> MethodProfile:
+        if name not in self.methods:
+            self.methods[name] = MethodProfile(name)
+        return self.methods[name]
+
+
+def _parse_ts(ts: str) -> float:
+    return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S,%f").timestamp()
+
+
+def load_log(path: str) -> ProfileRun:
+    run = ProfileRun(path)
+    first: Optional[float] = None
+    last: Optional[float] = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = LOG_LINE.match(line)
+            if match:
+                run.method(match["method"]).add(float(match["duration"]))
+            else:
+                match = ERROR_LINE.match(line)
+                if not match:
+                    continue
+                profile = run.method(match["method"])
+                profile.calls += 1
+                profile.errors += 1
+            ts = _parse_ts(match["ts"])
+            first = ts if first is None else first
+            last = ts
+    if first is not None and last is not None and last > first:
+        run.window = last - first
+    return run
+
+
+def load_metrics_json(path: str) -> ProfileRun:
+    run = ProfileRun(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    run.window = data.get("dumped_at", 0) - data.get("started_at", 0) or None
+
+    for name, metric in data.get("metrics", {}).items():
+        for series in metric["series"]:
+            method = series["labels"].get("method")
+            if method is None:
+                continue
+            if name.endswith("call_duration_seconds") and metric["type"] == "histogram":
+                profile = run.method(method)
+                profile.durations.extend(series["samples"])
+                profile.calls = max(profile.calls, series["count"])
+            elif name.endswith("exceptions") and metric["type"] == "counter":
+                run.method(method).errors += int(series["value"])
+    return run
+
+
+def load_run(path: str) -> ProfileRun:
+    if path.endswith(".json"):
+        return load_metrics_json(path)
+    return load_log(path)
+
+
+def _stat(samples: List[float], metric: str) -> float:
+    if metric == "mean":
+        return statistics.fmean(samples)
+    if metric == "p95":
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(math.ceil(0.95 * len(ordered))) - 1)]
+    return statistics.median(samples)
+
+
+def mann_whitney_p(a: List[float], b: List[float]) -> float:
+    """雙尾 Mann-Whitney U 檢定（常態近似，含 ties 修正）"""
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        avg_rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = avg_rank
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+
+    r1 = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    mean_u = n1 * n2 / 2
+    var_u = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))) if n > 1 else 0.0
+    if var_u <= 0:
+        return 1.0
+    z = (abs(u1 - mean_u) - 0.5) / math.sqrt(var_u)
+    return max(0.0, min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2))))
+
+
+def bootstrap_relative_change(base: List[float],
+                              cand: List[float],
+                              metric: str,
+                              confidence: float,
+                              rng: random.Random) -> Tuple[float, float]:
+    """以 bootstrap 估計 (cand - base) / base 的信賴區間"""
+    if len(base) > MAX_BOOTSTRAP_SAMPLES:
+        base = rng.sample(base, MAX_BOOTSTRAP_SAMPLES)
+    if len(cand) > MAX_BOOTSTRAP_SAMPLES:
+        cand = rng.sample(cand, MAX_BOOTSTRAP_SAMPLES)
+
+    changes = []
+    for _ in range(BOOTSTRAP_ROUNDS):
+        b = _stat(rng.choices(base, k=len(base)), metric)
+        c = _stat(rng.choices(cand, k=len(cand)), metric)
+        if b > 0:
+            changes.append((c - b) / b)
+    if not changes:
+        return float("nan"), float("nan")
+    changes.sort()
+    tail = (1 - confidence) / 2
+    lo = changes[int(tail * (len(changes) - 1))]
+    hi = changes[int((1 - tail) * (len(changes) - 1))]
+    return lo, hi
+
+
+def rate_change_p(count_a: int, window_a: float, count_b: int, window_b: float) -> float:
+    """兩個 Poisson 速率比較（條件二項檢定的常態近似）"""
+    total = count_a + count_b
+    if total == 0:
+        return 1.0
+    p0 = window_b / (window_a + window_b)
+    var = total * p0 * (1 - p0)
+    if var <= 0:
+        return 1.0
+    z = (count_b - total * p0) / math.sqrt(var)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+class Comparison:
+    def __init__(self, method: str):
+        self.method = method
+        self.base_n = self.cand_n = 0
+        self.base_value = self.cand_value = float("nan")
+        self.change = self.ci_low = self.ci_high = float("nan")
+        self.p_value = 1.0
+        self.base_rate: Optional[float] = None
+        self.cand_rate: Optional[float] = None
+        self.rate_change: Optional[float] = None
+        self.rate_p: Optional[float] = None
+        self.latency_regression = False
+        self.throughput_regression = False
+
+    @property
+    def regression(self) -> bool:
+        return self.latency_regression or self.throughput_regression
+
+
+def compare_runs(base: ProfileRun,
+                 cand: ProfileRun,
+                 metric: str = "median",
+                 threshold: float = 0.10,
+                 alpha: float = 0.05,
+                 min_samples: int = 5,
+                 seed: int = 0,
+                 check_throughput: bool = True) -> List[Comparison]:
+    rng = random.Random(seed)
+    confidence = 1 - alpha
+    results = []
+
+    for method in sorted(set(base.methods) & set(cand.methods)):
+        b, c = base.methods[method], cand.methods[method]
+        comp = Comparison(method)
+        comp.base_n, comp.cand_n = len(b.durations), len(c.durations)
+
+        if comp.base_n >= min_samples and comp.cand_n >= min_samples:
+            comp.base_value = _stat(b.durations, metric)
+            comp.cand_value = _stat(c.durations, metric)
+            if comp.base_value > 0:
+                comp.change = (comp.cand_value - comp.base_value) / comp.base_value
+            comp.p_value = mann_whitney_p(b.durations, c.durations)
+            comp.ci_low, comp.ci_high = bootstrap_relative_change(b.durations, c.durations, metric, confidence, rng)
+            comp.latency_regression = (
+                comp.p_value < alpha and comp.ci_low > 0 and comp.change > threshold
+            )
+
+        if base.window and cand.window and b.calls and c.calls:
+            comp.base_rate = b.calls / base.window
+            comp.cand_rate = c.calls / cand.window
+            comp.rate_change = (comp.cand_rate - comp.base_rate) / comp.base_rate
+            comp.rate_p = rate_change_p(b.calls, base.window, c.calls, cand.window)
+            comp.throughput_regression = (
+                check_throughput and comp.rate_p < alpha and comp.rate_change < -threshold
+            )
+
+        results.append(comp)
+    return results
+
+
+def _fmt_pct(value: Optional[float]) -> str:
+    if value is None or math.isnan(value):
+        return "-"
+    return f"{value * 100:+.1f}%"
+
+
+def format_report(results: List[Comparison], base: ProfileRun, cand: ProfileRun, metric: str, alpha: float) -> str:
+    lines = [
+        f"baseline : {base.path}",
+        f"candidate: {cand.path}",
+        f"{'method':<40} {'n(b/c)':>11} {metric + '(b)':>12} {metric + '(c)':>12} {'change':>8} "
+        f"{f'{int((1 - alpha) * 100)}% CI':>19} {'p':>7} {'rate':>8}  status",
+    ]
+    for comp in results:
+        ci = f"[{_fmt_pct(comp.ci_low)}, {_fmt_pct(comp.ci_high)}]"
+        status = "❌ REGRESSION" if comp.regression else ("✅ faster" if comp.p_value < alpha and comp.ci_high < 0 else "")
+        lines.append(
+            f"{comp.method:<40} {f'{comp.base_n}/{comp.cand_n}':>11} "
+            f"{comp.base_value * 1000:>10.3f}ms {comp.cand_value * 1000:>10.3f}ms "
+            f"{_fmt_pct(comp.change):>8} {ci:>19} {comp.p_value:>7.4f} {_fmt_pct(comp.rate_change):>8}  {status}"
+        )
+
+    only_base = sorted(set(base.methods) - set(cand.methods))
+    only_cand = sorted(set(cand.methods) - set(base.methods))
+    if only_base:
+        lines.append(f"只在 baseline 出現: {', '.join(only_base)}")
+    if only_cand:
+        lines.append(f"只在 candidate 出現: {', '.join(only_cand)}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="比較兩次 profile，偵測效能退步")
+    parser.add_argument("baseline", help="baseline 的 profile log 或 metrics JSON")
+    parser.add_argument("candidate", help="candidate 的 profile log 或 metrics JSON")
+    parser.add_argument("--metric", choices=["median", "mean", "p95"], default="median")
+    parser.add_argument("--threshold", type=float, default=0.10, help="相對變化超過多少算退步（0.10 = 10%%）")
+    parser.add_argument("--alpha", type=float, default=0.05, help="顯著水準")
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0, help="bootstrap 亂數種子，固定以便結果可重現")
+    parser.add_argument("--no-throughput", action="store_true", help="兩次 run 的負載不同時，不以吞吐量判定退步")
+    args = parser.parse_args(argv)
+
+    base = load_run(args.baseline)
+    cand = load_run(args.candidate)
+    results = compare_runs(base, cand, args.metric, args.threshold, args.alpha, args.min_samples, args.seed,
+                           check_throughput=not args.no_throughput)
+    print(format_report(results, base, cand, args.metric, args.alpha))
+
+    regressions = [c.method for c in results if c.regression]
+    if regressions:
+        print(f"\n⚠️ 偵測到 {len(regressions)} 個退步: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,82 +1,132 @@
 import time
 import traceback
+from collections import deque
 from functools import wraps
 import logging
 import inspect
 
-def profile_time_to_file(log_list, logger):
+def profile_time_to_file(log_list, logger, registry=None, tracer=None, mem_profiler=None):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
+            # span 以 contextvars 串起父子關係，巢狀呼叫與 await / gather 都能正確掛在呼叫者底下
+            span_ctx = tracer.start_span(fn.__qualname__) if tracer is not None else None
+            mem_ctx = mem_profiler.start_call() if mem_profiler is not None else None
+            error = None
             start = time.perf_counter()
             try:
-                result = fn(*args, **kwargs)
-                duration = time.perf_counter() - start
-                log_list.append({
-                    "method": fn.__qualname__,
-                    "duration": duration,
-                    "args": args,
-                    "kwargs": kwargs,
-                    "exception": None,
-                })
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    duration = time.perf_counter() - start
+                    # 配置量只算方法本身，不含下面的記錄與 logging
+                    if mem_ctx is not None:
+                        mem_profiler.finish_call(fn.__qualname__, mem_ctx)
+                if log_list is not None:
+                    log_list.append({
+                        "method": fn.__qualname__,
+                        "duration": duration,
+                        "args": args,
+                        "kwargs": kwargs,
+                        "exception": None,
+                    })
+                if registry is not None:
+                    registry.observe_call(fn.__qualname__, duration)
                 logger.info(f"[{fn.__qualname__}] 耗時: {duration:.6f} 秒")
                 return result
             except Exception as e:
-                duration = time.perf_counter() - start
                 tb = traceback.format_exc()
-                log_list.append({
-                    "method": fn.__qualname__,
-                    "duration": duration,
-                    "args": args,
-                    "kwargs": kwargs,
-                    "exception": str(e),
-                    "traceback": tb,
-                })
+                if log_list is not None:
+                    log_list.append({
+                        "method": fn.__qualname__,
+                        "duration": duration,
+                        "args": args,
+                        "kwargs": kwargs,
+                        "exception": str(e),
+                        "traceback": tb,
+                    })
+                if registry is not None:
+                    registry.observe_call(fn.__qualname__, duration, e)
                 logger.error(f"[{fn.__qualname__}] ❌ 發生例外: {e}\n{tb}")
+                error = e
                 raise  # 繼續丟出例外讓外部處理
+            finally:
+                if span_ctx is not None:
+                    tracer.finish_span(*span_ctx, error)
         return wrapper
     return decorator
 
 
-def async_profile_time_to_file(log_list, logger):
+def async_profile_time_to_file(log_list, logger, registry=None, tracer=None, mem_profiler=None):
     def decorator(fn):
         @wraps(fn)
         async def wrapper(*args, **kwargs):
+            span_ctx = tracer.start_span(fn.__qualname__) if tracer is not None else None
+            mem_ctx = mem_profiler.start_call() if mem_profiler is not None else None
+            error = None
             start = time.perf_counter()
             try:
-                result = await fn(*args, **kwargs)
-                duration = time.perf_counter() - start
-                log_list.append({
-                    "method": fn.__qualname__,
-                    "duration": duration,
-                    "args": args,
-                    "kwargs": kwargs,
-                    "exception": None,
-                })
+                try:
+                    result = await fn(*args, **kwargs)
+                finally:
+                    duration = time.perf_counter() - start
+                    # 配置量只算方法本身，不含下面的記錄與 logging
+                    if mem_ctx is not None:
+                        mem_profiler.finish_call(fn.__qualname__, mem_ctx)
+                if log_list is not None:
+                    log_list.append({
+                        "method": fn.__qualname__,
+                        "duration": duration,
+                        "args": args,
+                        "kwargs": kwargs,
+                        "exception": None,
+                    })
+                if registry is not None:
+                    registry.observe_call(fn.__qualname__, duration)
                 logger.info(f"[{fn.__qualname__}] 耗時: {duration:.6f} 秒 (async)")
                 return result
             except Exception as e:
-                duration = time.perf_counter() - start
                 tb = traceback.format_exc()
-                log_list.append({
-                    "method": fn.__qualname__,
-                    "duration": duration,
-                    "args": args,
-                    "kwargs": kwargs,
-                    "exception": str(e),
-                    "traceback": tb,
-                })
+                if log_list is not None:
+                    log_list.append({
+                        "method": fn.__qualname__,
+                        "duration": duration,
+                        "args": args,
+                        "kwargs": kwargs,
+                        "exception": str(e),
+                        "traceback": tb,
+                    })
+                if registry is not None:
+                    registry.observe_call(fn.__qualname__, duration, e)
                 logger.error(f"[{fn.__qualname__}] ❌ 發生例外: {e}\n{tb}")
+                error = e
                 raise
+            finally:
+                if span_ctx is not None:
+                    tracer.finish_span(*span_ctx, error)
         return wrapper
     return decorator
 
 
-def profile_selected_methods_mixed(name_patterns=None, log_file="method_profile.log"):
+def profile_selected_methods_mixed(name_patterns=None, log_file="method_profile.log", registry=None, tracer=None, mem_profiler=None,
+                                   max_logs=None):
+    """
+    max_logs: cls._profiled_logs 保留的筆數（每筆含呼叫參數）；None 不限，0 不保留，
+              長時間執行的物件（例如一直輪詢的 BaseSource）要設上限或 0，否則記憶體會一直長
+    registry: 可選的 metrics.MetricsRegistry，提供時每次呼叫會同時累計到
+    Prometheus/OpenMetrics 指標（次數、耗時直方圖與 p50/p95/p99、例外次數）
+    tracer: 可選的 tracing.Tracer，記錄父子 span 以輸出 flamegraph / Chrome trace
+    mem_profiler: 可選的 memprofile.AllocationProfiler，以 tracemalloc 記錄每次呼叫的淨配置與峰值
+    """
     name_patterns = name_patterns or []
 
     def decorator(cls):
-        cls._profiled_logs = []
+        if max_logs is None:
+            cls._profiled_logs = []
+        elif max_logs > 0:
+            cls._profiled_logs = deque(maxlen=max_logs)
+        else:
+            cls._profiled_logs = None
 
         logger = logging.getLogger(f"profile.{cls.__name__}")
         handler = logging.FileHandler(log_file)
@@ -93,45 +143,59 @@ def profile_selected_methods_mixed(name_patterns=None, log_file="method_profile.
                 continue
 
             if inspect.iscoroutinefunction(attr):
-                wrapped = async_profile_time_to_file(cls._profiled_logs, logger)(attr)
+                wrapped = async_profile_time_to_file(cls._profiled_logs, logger, registry, tracer, mem_profiler)(attr)
             else:
-                wrapped = profile_time_to_file(cls._profiled_logs, logger)(attr)
+                wrapped = profile_time_to_file(cls._profiled_logs, logger, registry, tracer, mem_profiler)(attr)
 
             setattr(cls, attr_name, wrapped)
 
         return cls
     return decorator
 
-import asyncio
-import time
+if __name__ == "__main__":
+    import asyncio
+    import time
+    from metrics import MetricsRegistry
+    from tracing import Tracer
+    from memprofile import AllocationProfiler
 
-@profile_selected_methods_mixed(name_patterns=["run", "fail"], log_file="profile_with_error.log")
-class Test:
-    def run_ok(self):
-        time.sleep(0.1)
-        return "OK"
+    registry = MetricsRegistry()
+    tracer = Tracer()
+    mem_profiler = AllocationProfiler(trace_sites=True)
 
-    def fail_sync(self):
-        raise ValueError("同步錯誤")
+    @profile_selected_methods_mixed(name_patterns=["run", "fail"], log_file="profile_with_error.log", registry=registry, tracer=tracer, mem_profiler=mem_profiler)
+    class Test:
+        def run_ok(self):
+            time.sleep(0.1)
+            return "OK" * 100_000
 
-    async def fail_async(self):
-        raise RuntimeError("非同步錯誤")
+        def fail_sync(self):
+            raise ValueError("同步錯誤")
 
-t = Test()
-try:
-    t.run_ok()
-    t.fail_sync()
-except Exception:
-    pass
+        async def fail_async(self):
+            raise RuntimeError("非同步錯誤")
 
-async def test_async_fail():
+    t = Test()
     try:
-        await t.fail_async()
+        t.run_ok()
+        t.fail_sync()
     except Exception:
         pass
 
-asyncio.run(test_async_fail())
+    async def test_async_fail():
+        try:
+            await t.fail_async()
+        except Exception:
+            pass
+
+    asyncio.run(test_async_fail())
+
+    print("\n執行記錄（含錯誤）：")
+    # for log in Test._profiled_logs:
+    #     print(log)
 
-print("\n執行記錄（含錯誤）：")
-# for log in Test._profiled_logs:
-#     print(log)
+    registry.dump_to_file("profile_metrics.prom")
+    tracer.write_collapsed("profile_stacks.folded")
+    tracer.write_chrome_trace("profile_trace.json")
+    print(mem_profiler.report())
+    print(registry.render())
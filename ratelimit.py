@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple, Union
+
+import redis
+import redis.asyncio as aioredis
+
+from fetchengine import host_of
+from redis_async import AsyncRedisClient
+from redisclient import RedisClient
+
+# 原子 token bucket：以 Redis server 時間補充 token，所有 process 共用同一個桶
+# KEYS[1] = bucket hash；ARGV[1] = 每秒補充量, ARGV[2] = 桶容量, ARGV[3] = 要取的 token 數
+# 回傳 0 表示取得；否則回傳需等待的毫秒數
+TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = math.ceil((requested - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) * 2 + 1000)
+return wait
+"""
+
+
+class _BucketConfig:
+    def __init__(self,
+                 rate: float,
+                 capacity: Optional[float] = None,
+                 host_rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 prefix: str = "ratelimit"):
+        """
+        :param rate: 每個 host 每秒可發出的請求數
+        :param capacity: 桶容量（允許的瞬間爆量），預設等於 rate
+        :param host_rates: 個別 host 的 (rate, capacity) 覆寫
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.host_rates = host_rates or {}
+        self.prefix = prefix
+
+    def key_and_args(self, host: str, tokens: float):
+        rate, capacity = self.host_rates.get(host, (self.rate, self.capacity))
+        if tokens > capacity:
+            # 桶永遠裝不下這麼多 token，Lua 會一直回傳等待時間，acquire 會無限重試
+            raise ValueError(f"{host} 一次要取 {tokens} 個 token，超過桶容量 {capacity}")
+        return [f"{self.prefix}:{host}"], [rate, capacity, tokens]
+
+
+class RedisTokenBucket(_BucketConfig):
+    """多個 crawler process 共用的 per-host 限速器（同步版，給 httptest 這類 requests 程式用）"""
+
+    def __init__(self, client: Union[RedisClient, redis.Redis], rate: float, capacity: Optional[float] = None,
+                 host_rates: Optional[Dict[str, Tuple[float, float]]] = None, prefix: str = "ratelimit"):
+        """
+        :param client: RedisClient（取用底層連線）或 redis.Redis
+        """
+        super().__init__(rate, capacity, host_rates, prefix)
+        if isinstance(client, RedisClient):
+            client = client.get_raw_client()
+        self._script = client.register_script(TOKEN_BUCKET)
+
+    def try_acquire(self, host: str, tokens: float = 1) -> float:
+        """回傳 0 表示已取得；否則回傳建議等待秒數。tokens 超過桶容量時拋 ValueError"""
+        keys, args = self.key_and_args(host, tokens)
+        return self._script(keys=keys, args=args) / 1000
+
+    def acquire(self, host: str, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(host, tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def acquire_for_url(self, url: str, timeout: Optional[float] = None) -> bool:
+        return self.acquire(host_of(url), timeout=timeout)
+
+
+class AsyncRedisTokenBucket(_BucketConfig):
+    """asyncio 版本，給 fetchengine.FetchEngine 在每次請求前 await"""
+
+    def __init__(self, client: Union[AsyncRedisClient, aioredis.Redis], rate: float, capacity: Optional[float] = None,
+                 host_rates: Optional[Dict[str, Tuple[float, float]]] = None, prefix: str = "ratelimit"):
+        """
+        :param client: AsyncRedisClient（取用底層連線）或 redis.asyncio.Redis
+        """
+        super().__init__(rate, capacity, host_rates, prefix)
+        if isinstance(client, AsyncRedisClient):
+            client = client.get_raw_client()
+        self._script = client.register_script(TOKEN_BUCKET)
+
+    async def try_acquire(self, host: str, tokens: float = 1) -> float:
+        keys, args = self.key_and_args(host, tokens)
+        return await self._script(keys=keys, args=args) / 1000
+
+    async def acquire(self, host: str, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            wait = await self.try_acquire(host, tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None and loop.time() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    async def acquire_for_url(self, url: str, timeout: Optional[float] = None) -> bool:
+        return await self.acquire(host_of(url), timeout=timeout)
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, AsyncIterator, Any
+
+import redis
+import redis.asyncio as aioredis
+
+from redis_codec import RedisCodec
+from redis_scripts import LOCK_ACQUIRE, LOCK_RELEASE, LOCK_EXTEND, lock_keys
+
+logger = logging.getLogger("RedisDistributedLock")
+
+
+class AsyncRedisClient:
+    """redisclient.RedisClient 的 asyncio 版本，給 aiohttp / httpx 的 fetcher 用，不會卡住 event loop"""
+
+    def __init__(self,
+                 host: str = 'localhost',
+                 port: int = 6379,
+                 db: int = 0,
+                 password: Optional[str] = None,
+                 decode_responses: bool = True,
+                 max_connections: Optional[int] = None,
+                 client: Optional[aioredis.Redis] = None,
+                 codec: Optional[RedisCodec] = None):
+        if codec is not None:
+            decode_responses = False
+        if client is None:
+            pool = aioredis.ConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                password=password,
+                decode_responses=decode_responses,
+                max_connections=max_connections,
+            )
+            client = aioredis.Redis(connection_pool=pool)
+        self.client = client
+        self.codec = codec
+
+    def _encode(self, value: Any) -> Any:
+        return self.codec.encode(value) if self.codec is not None else value
+
+    def _decode(self, data: Any) -> Any:
+        return self.codec.decode(data) if self.codec is not None else data
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        return await self.client.set(key, self._encode(value), ex=ex)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._decode(await self.client.get(key))
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        return [self._decode(value) for value in await self.client.mget(keys)]
+
+    async def mset(self, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        if not mapping:
+            return True
+        mapping = {key: self._encode(value) for key, value in mapping.items()}
+        if ex is None:
+            return await self.client.mset(mapping)
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+            return all(await pipe.execute())
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[aioredis.client.Pipeline]:
+        """離開 async with 區塊時自動 execute 尚未送出的指令；發生例外則整批丟棄"""
+        pipe = self.client.pipeline(transaction=transaction)
+        try:
+            yield pipe
+            if len(pipe):
+                await pipe.execute()
+        finally:
+            await pipe.reset()
+
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    def get_raw_client(self) -> aioredis.Redis:
+        return self.client
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncRedisDistributedLock:
+    """redisclient.RedisDistributedLock 的 asyncio 版本：fencing token、BLPOP 喚醒、背景續約"""
+
+    def __init__(self,
+                 client: aioredis.Redis,
+                 lock_key: str,
+                 timeout: int = 10,
+                 blocking_timeout: float = 5,
+                 auto_renew: bool = True):
+        self.client = client
+        self.lock_key = lock_key
+        self.keys = lock_keys(lock_key)
+        self.timeout = timeout
+        self.blocking_timeout = blocking_timeout
+        self.auto_renew = auto_renew
+        self.token: Optional[str] = None
+        self.fencing_token: Optional[int] = None
+        self.lost = False
+        self._acquire_script = client.register_script(LOCK_ACQUIRE)
+        self._release_script = client.register_script(LOCK_RELEASE)
+        self._extend_script = client.register_script(LOCK_EXTEND)
+        self._watchdog: Optional[asyncio.Task] = None
+
+    @property
+    def _lease_ms(self) -> int:
+        return int(self.timeout * 1000)
+
+    async def acquire(self, blocking: bool = True, blocking_timeout: Optional[float] = None) -> Optional[int]:
+        """成功回傳 fencing token，逾時回傳 None"""
+        if blocking_timeout is None:
+            blocking_timeout = self.blocking_timeout
+        loop = asyncio.get_running_loop()
+        token = uuid.uuid4().hex
+        deadline = loop.time() + blocking_timeout
+
+        while True:
+            ok, value = await self._acquire_script(keys=self.keys, args=[token, self._lease_ms])
+            if ok:
+                self.token = token
+                self.fencing_token = int(value)
+                self.lost = False
+                if self.auto_renew:
+                    self._watchdog = asyncio.create_task(self._renew_loop())
+                return self.fencing_token
+
+            remaining = deadline - loop.time()
+            if not blocking or remaining <= 0:
+                return None
+            lease_left = value / 1000 if value > 0 else 0.01
+            await self.client.blpop([self.keys[2]], timeout=max(min(remaining, lease_left), 0.01))
+
+    async def release(self) -> bool:
+        if self.token is None:
+            return False
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        released = await self._release_script(keys=self.keys, args=[self.token, self._lease_ms])
+        self.token = None
+        return bool(released)
+
+    async def extend(self) -> bool:
+        if self.token is None:
+            return False
+        return bool(await self._extend_script(keys=self.keys, args=[self.token, self._lease_ms]))
+
+    async def locked(self) -> bool:
+        if self.token is None:
+            return False
+        return await self.client.get(self.lock_key) in (self.token, self.token.encode())
+
+    async def _renew_loop(self) -> None:
+        interval = self.timeout / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.extend():
+                    self.lost = True
+                    logger.warning(f"⚠️ 鎖 {self.lock_key} 續約失敗，已被其他持有者取得")
+                    return
+            except redis.RedisError as e:
+                logger.warning(f"⚠️ 鎖 {self.lock_key} 續約錯誤: {e}")
+
+    async def __aenter__(self):
+        if await self.acquire() is None:
+            raise TimeoutError("無法取得 Redis 鎖")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+
+if __name__ == "__main__":
+    async def main():
+        async with AsyncRedisClient(host="localhost", port=6379) as redis_client:
+            client = redis_client.get_raw_client()
+            try:
+                await redis_client.set("hello", "world", ex=30)
+                print("hello =", await redis_client.get("hello"))
+
+                # 等鎖的期間，其他 coroutine（例如 HTTP 請求）照常執行
+                async def critical():
+                    async with AsyncRedisDistributedLock(client, "my_lock_key") as lock:
+                        print(f"取得鎖（fencing token={lock.fencing_token}），開始關鍵操作")
+                        await asyncio.sleep(3)
+                        print("操作完成，釋放鎖")
+
+                async def other_io():
+                    for i in range(3):
+                        await asyncio.sleep(1)
+                        print(f"其他 I/O 進行中 {i + 1}")
+
+                await asyncio.gather(critical(), other_io())
+            except TimeoutError:
+                print("⚠️ 無法取得鎖，跳過這輪任務")
+            except redis.RedisError as e:
+                print(f"⚠️ Redis 發生錯誤: {e}")
+
+    asyncio.run(main())
@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple, Any
+
+import redis
+
+logger = logging.getLogger("RedisClientCache")
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+_MISSING = object()
+
+
+def _to_str(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class ClientSideCache:
+    """
+    放在 RedisClient.get 前面的本機快取：LRU + TTL，靠 Redis 主動通知失效保持一致。
+
+    mode="tracking": 讀取走一條開了 CLIENT TRACKING ... REDIRECT 的專用連線，
+                     被讀過的 key 只要被改動，Redis 就會在 __redis__:invalidate 頻道通知。
+    mode="keyspace": 訂閱 __keyspace@<db>__:*（需要 notify-keyspace-events 含 K 與 A），
+                     任何 key 事件都會讓本機副本失效；流量較大，給不支援 tracking 的舊版 Redis 用。
+
+    通知連線斷掉期間無法保證一致，此時會清空快取並直接讀 Redis，直到重新訂閱成功。
+    redis-py 的 PubSub 也可能自己重連並重新訂閱（不會拋例外）：新連線的 CLIENT ID 不同，
+    所以在那條連線上註冊 connect callback，重新指定 TRACKING REDIRECT 並清空快取。
+    cache miss 都走同一條讀取連線，彼此會排隊；適合讀多寫少、熱 key 集中的情境。
+    """
+
+    def __init__(self,
+                 client: redis.Redis,
+                 max_size: int = 10000,
+                 ttl: float = 60.0,
+                 mode: str = "tracking",
+                 configure_notifications: bool = False):
+        if mode not in ("tracking", "keyspace"):
+            raise ValueError(f"不支援的 mode: {mode}")
+        self.client = client
+        self.max_size = max_size
+        self.ttl = ttl
+        self.mode = mode
+        self.db = client.connection_pool.connection_kwargs.get("db", 0)
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._healthy = threading.Event()
+        self._closed = False
+
+        self._reader_lock = threading.Lock()
+        self._reader: Optional[redis.Redis] = None
+        self._listener_id: Optional[int] = None
+        self._pubsub: Optional[redis.client.PubSub] = None
+
+        if mode == "tracking":
+            pool = client.connection_pool
+            reader_pool = redis.ConnectionPool(
+                connection_class=pool.connection_class,
+                max_connections=1,
+                **pool.connection_kwargs,
+            )
+            self._reader = redis.Redis(connection_pool=reader_pool, single_connection_client=True)
+            # 斷線重連後 tracking 狀態會消失，要重新開
+            self._reader.connection.register_connect_callback(self._on_reader_connect)
+        elif configure_notifications:
+            client.config_set("notify-keyspace-events", "KA")
+
+        self._subscribe()
+        self._thread = threading.Thread(target=self._listen, name="redis-cache-invalidation", daemon=True)
+        self._thread.start()
+
+    # ---- 失效通知 ----
+
+    def _subscribe(self) -> None:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        if self.mode == "tracking":
+            # 訂閱前先在同一條連線上問出 client id，給 REDIRECT 用
+            pubsub.execute_command("CLIENT", "ID")
+            self._listener_id = int(pubsub.parse_response(block=True))
+            self._watch_listener(pubsub)
+            pubsub.subscribe(INVALIDATE_CHANNEL)
+            with self._reader_lock:
+                self._enable_tracking(self._reader.connection)
+        else:
+            pubsub.psubscribe(f"__keyspace@{self.db}__:*")
+            self._watch_listener(pubsub)
+        self._pubsub = pubsub
+        self._healthy.set()
+
+    def _watch_listener(self, pubsub: "redis.client.PubSub") -> None:
+        # 要排在 PubSub.on_connect（重新 SUBSCRIBE）之前：連線進入訂閱狀態後就不能再下 CLIENT ID
+        connection = pubsub.connection
+        connection.deregister_connect_callback(pubsub.on_connect)
+        connection.register_connect_callback(self._on_listener_connect)
+        connection.register_connect_callback(pubsub.on_connect)
+
+    def _on_listener_connect(self, connection) -> None:
+        """PubSub 自動重連時呼叫：斷線期間的通知已經遺失，換新的 client id 重新 REDIRECT 並清空快取"""
+        if self.mode == "tracking":
+            connection.send_command("CLIENT", "ID")
+            self._listener_id = int(connection.read_response())
+            with self._reader_lock:
+                self._enable_tracking(self._reader.connection)
+        # 先改好 REDIRECT 再清空：清空之前讀進來的值都可能錯過了通知
+        self.clear()
+        logger.warning(f"⚠️ 失效通知連線已自動重連（client id={self._listener_id}），已清空快取")
+
+    def _enable_tracking(self, connection) -> None:
+        connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", self._listener_id)
+        connection.read_response()
+
+    def _on_reader_connect(self, connection) -> None:
+        self.clear()
+        if self._listener_id is not None:
+            self._enable_tracking(connection)
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        if message["type"] not in ("message", "pmessage"):
+            return
+        if self.mode == "tracking":
+            keys = message["data"]
+            if keys is None:  # FLUSHALL / FLUSHDB
+                self.clear()
+            else:
+                for key in keys:
+                    self.invalidate(_to_str(key))
+        else:
+            channel = _to_str(message["channel"])
+            self.invalidate(channel.split(":", 1)[1])
+
+    def _listen(self) -> None:
+        while not self._closed:
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+                if message:
+                    self._handle_message(message)
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                if self._closed:
+                    return
+                logger.warning(f"⚠️ 失效通知連線中斷，暫停快取: {e}")
+                self._healthy.clear()
+                self.clear()
+                self._resubscribe()
+
+    def _resubscribe(self) -> None:
+        delay = 0.5
+        while not self._closed:
+            try:
+                self._pubsub.close()
+                self._subscribe()
+                logger.info("✅ 失效通知已重新訂閱，恢復快取")
+                return
+            except redis.RedisError as e:
+                logger.warning(f"⚠️ 重新訂閱失敗（{delay:.1f}s 後重試）: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+
+    # ---- 快取操作 ----
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._entries.pop(key, None)
+            if key in self._inflight:
+                self._dirty.add(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty.update(self._inflight)
+
+    def _lookup(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+            return _MISSING
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            # 讀取期間收到失效通知的話，讀到的值可能已過時，不寫入快取
+            if key not in self._dirty and self._healthy.is_set():
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            self._release(key)
+
+    def _release(self, key: str) -> None:
+        count = self._inflight.get(key, 0) - 1
+        if count <= 0:
+            self._inflight.pop(key, None)
+            self._dirty.discard(key)
+        else:
+            self._inflight[key] = count
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self._healthy.is_set():
+            return self.client.get(key)
+
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        try:
+            if self._reader is not None:
+                with self._reader_lock:
+                    value = self._reader.get(key)
+            else:
+                value = self.client.get(key)
+        except BaseException:
+            with self._lock:
+                self._release(key)
+            raise
+        self._store(key, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        self._thread.join(timeout=2)
+        if self._pubsub is not None:
+            self._pubsub.close()
+        if self._reader is not None:
+            self._reader.close()
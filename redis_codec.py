@@ -0,0 +1,127 @@
+import json
+import zlib
+from typing import Any, Optional
+
+# 選用套件：沒裝就不能選用對應的格式
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 編碼後格式：MAGIC + serializer id + compression id + payload
+# 0xFE 不會出現在合法 UTF-8 的開頭，沒有 MAGIC 的值視為舊的純字串
+MAGIC = 0xFE
+
+SER_RAW = 0      # bytes 原樣保存
+SER_STR = 1      # utf-8 字串
+SER_JSON = 2
+SER_MSGPACK = 3
+
+COMP_NONE = 0
+COMP_ZLIB = 1
+COMP_LZ4 = 2
+COMP_ZSTD = 3
+
+_SERIALIZERS = {"json": SER_JSON, "msgpack": SER_MSGPACK}
+_COMPRESSIONS = {"none": COMP_NONE, "zlib": COMP_ZLIB, "lz4": COMP_LZ4, "zstd": COMP_ZSTD}
+
+
+class RedisCodec:
+    """
+    RedisClient 的值編碼層：序列化（msgpack / JSON）+ 超過門檻才壓縮（zlib / lz4 / zstd）。
+
+    str 與 bytes 不經序列化直接存，HTML 頁面這類大字串只做壓縮；
+    dict / list 等物件走 serializer。壓縮後沒有變小就存未壓縮版本。
+    """
+
+    def __init__(self,
+                 serializer: str = "msgpack",
+                 compression: str = "zstd",
+                 threshold: int = 1024,
+                 level: Optional[int] = None):
+        if serializer not in _SERIALIZERS:
+            raise ValueError(f"不支援的 serializer: {serializer}")
+        if compression not in _COMPRESSIONS:
+            raise ValueError(f"不支援的 compression: {compression}")
+        if serializer == "msgpack" and msgpack is None:
+            raise ImportError("serializer='msgpack' 需要安裝 msgpack")
+        if compression == "lz4" and lz4_frame is None:
+            raise ImportError("compression='lz4' 需要安裝 lz4")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("compression='zstd' 需要安裝 zstandard")
+
+        self.serializer = _SERIALIZERS[serializer]
+        self.compression = _COMPRESSIONS[compression]
+        self.threshold = threshold
+        self.level = level
+        if self.compression == COMP_ZSTD:
+            self._zstd_c = zstandard.ZstdCompressor(level=level if level is not None else 3)
+        self._zstd_d = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def _serialize(self, value: Any):
+        if isinstance(value, bytes):
+            return SER_RAW, value
+        if isinstance(value, str):
+            return SER_STR, value.encode("utf-8")
+        if self.serializer == SER_MSGPACK:
+            return SER_MSGPACK, msgpack.packb(value, use_bin_type=True)
+        return SER_JSON, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == COMP_ZLIB:
+            return zlib.compress(payload, self.level if self.level is not None else 6)
+        if self.compression == COMP_LZ4:
+            return lz4_frame.compress(payload)
+        return self._zstd_c.compress(payload)
+
+    def encode(self, value: Any) -> bytes:
+        ser, payload = self._serialize(value)
+        comp = COMP_NONE
+        if self.compression != COMP_NONE and len(payload) >= self.threshold:
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                comp, payload = self.compression, compressed
+        return bytes((MAGIC, ser, comp)) + payload
+
+    def decode(self, data: Optional[bytes]) -> Any:
+        if data is None:
+            return None
+        if isinstance(data, str):
+            return data
+        if len(data) < 3 or data[0] != MAGIC:
+            # 沒經過 codec 寫入的舊資料
+            return data.decode("utf-8", errors="replace")
+
+        ser, comp, payload = data[1], data[2], data[3:]
+        if ser not in (SER_RAW, SER_STR, SER_JSON, SER_MSGPACK) or comp not in _COMPRESSIONS.values():
+            raise ValueError(f"無法辨識的編碼標頭 serializer={ser} compression={comp}")
+        if comp == COMP_ZLIB:
+            payload = zlib.decompress(payload)
+        elif comp == COMP_LZ4:
+            if lz4_frame is None:
+                raise ImportError("解壓縮 lz4 資料需要安裝 lz4")
+            payload = lz4_frame.decompress(payload)
+        elif comp == COMP_ZSTD:
+            if self._zstd_d is None:
+                raise ImportError("解壓縮 zstd 資料需要安裝 zstandard")
+            payload = self._zstd_d.decompress(payload)
+
+        if ser == SER_RAW:
+            return payload
+        if ser == SER_STR:
+            return payload.decode("utf-8")
+        if ser == SER_MSGPACK:
+            if msgpack is None:
+                raise ImportError("解碼 msgpack 資料需要安裝 msgpack")
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload)
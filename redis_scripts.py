@@ -0,0 +1,38 @@
+# 分散式鎖共用的 Lua 腳本（同步版 redisclient.RedisDistributedLock 與 redis_async 共用）
+#
+# KEYS[1] = 鎖本身      value = 持有者的隨機 token
+# KEYS[2] = fencing 計數器，每次成功取得鎖 INCR，保證單調遞增
+# KEYS[3] = 喚醒用 list，釋放時 push 一筆，等待者用 BLPOP 被叫醒（一次只叫醒一個）
+
+# ARGV[1] = token, ARGV[2] = lease (ms)
+# 成功回傳 {1, fencing_token}；失敗回傳 {0, 鎖剩餘毫秒數}
+LOCK_ACQUIRE = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return {1, redis.call('incr', KEYS[2])}
+end
+return {0, redis.call('pttl', KEYS[1])}
+"""
+
+# ARGV[1] = token, ARGV[2] = 喚醒訊號保留時間 (ms)
+LOCK_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+    redis.call('del', KEYS[3])
+    redis.call('rpush', KEYS[3], '1')
+    redis.call('pexpire', KEYS[3], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# ARGV[1] = token, ARGV[2] = 新的 lease (ms)
+LOCK_EXTEND = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def lock_keys(lock_key: str):
+    return [lock_key, f"{lock_key}:fence", f"{lock_key}:signal"]
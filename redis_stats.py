@@ -0,0 +1,169 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import redis
+
+from metrics import MetricsRegistry
+
+# pool 等待通常在 µs 等級，bucket 往下延伸
+POOL_WAIT_BUCKETS = (0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class RedisStats:
+    """
+    RedisClient 的指令延遲與連線池統計，底層用 metrics.MetricsRegistry，
+    snapshot() 給程式讀取，registry.render() / serve() 可直接接 Prometheus。
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry(namespace="redis", call_metrics=False)
+        self.command_duration = self.registry.histogram("command_duration_seconds", "Redis command latency in seconds")
+        self.command_errors = self.registry.counter("command_errors", "Redis command errors")
+        self.pool_wait = self.registry.histogram("pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+                                                 POOL_WAIT_BUCKETS)
+        self.pool_errors = self.registry.counter("pool_checkout_errors", "Failed connection checkouts")
+        self.connections = self.registry.gauge("pool_connections", "Pooled connections by state")
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.created = 0
+        self.max_in_use = 0
+
+    def record_command(self, command: str, duration: float, error: Optional[BaseException] = None) -> None:
+        self.command_duration.observe(duration, {"command": command})
+        if error is not None:
+            self.command_errors.inc({"command": command, "error": type(error).__name__})
+
+    def record_checkout(self, wait: float, error: Optional[BaseException] = None) -> None:
+        self.pool_wait.observe(wait)
+        with self._lock:
+            if error is not None:
+                self.pool_errors.inc({"error": type(error).__name__})
+            else:
+                self.in_use += 1
+                self.max_in_use = max(self.max_in_use, self.in_use)
+            self._update_gauges()
+
+    def record_release(self) -> None:
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+            self._update_gauges()
+
+    def record_created(self) -> None:
+        with self._lock:
+            self.created += 1
+            self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        self.connections.set(self.in_use, {"state": "in_use"})
+        self.connections.set(max(self.created - self.in_use, 0), {"state": "idle"})
+
+    def snapshot(self) -> Dict[str, Any]:
+        commands = {}
+        for series in self.command_duration.snapshot():
+            command = series["labels"]["command"]
+            commands[command] = {
+                "count": series["count"],
+                "total_seconds": series["sum"],
+                "p50": series["quantiles"]["0.5"],
+                "p95": series["quantiles"]["0.95"],
+                "p99": series["quantiles"]["0.99"],
+                "errors": 0,
+            }
+        for series in self.command_errors.snapshot():
+            command = series["labels"]["command"]
+            commands.setdefault(command, {"count": 0, "errors": 0})
+            commands[command]["errors"] += int(series["value"])
+
+        wait = self.pool_wait.snapshot()
+        wait_series = wait[0] if wait else {"count": 0, "sum": 0.0, "quantiles": {}}
+        with self._lock:
+            pool = {
+                "in_use": self.in_use,
+                "idle": max(self.created - self.in_use, 0),
+                "created": self.created,
+                "max_in_use": self.max_in_use,
+                "checkouts": wait_series["count"],
+                "checkout_wait_total_seconds": wait_series["sum"],
+                "checkout_wait_p99": wait_series["quantiles"].get("0.99"),
+                "checkout_errors": int(sum(s["value"] for s in self.pool_errors.snapshot())),
+            }
+        return {"commands": commands, "pool": pool}
+
+
+class _InstrumentedPoolMixin:
+    stats: RedisStats
+
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except Exception as e:
+            self.stats.record_checkout(time.perf_counter() - start, e)
+            raise
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def release(self, connection):
+        try:
+            super().release(connection)
+        finally:
+            self.stats.record_release()
+
+    def make_connection(self):
+        connection = super().make_connection()
+        self.stats.record_created()
+        return connection
+
+
+class InstrumentedConnectionPool(_InstrumentedPoolMixin, redis.ConnectionPool):
+    def __init__(self, stats: RedisStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+
+class InstrumentedBlockingConnectionPool(_InstrumentedPoolMixin, redis.BlockingConnectionPool):
+    """有 max_connections 上限、用完時排隊等待的 pool；等待時間會算進 checkout wait"""
+
+    def __init__(self, stats: RedisStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    stats: RedisStats
+
+    def execute(self, raise_on_error: bool = True):
+        command = "MULTI" if self.transaction else "PIPELINE"
+        start = time.perf_counter()
+        try:
+            result = super().execute(raise_on_error)
+        except Exception as e:
+            self.stats.record_command(command, time.perf_counter() - start, e)
+            raise
+        self.stats.record_command(command, time.perf_counter() - start)
+        return result
+
+
+class InstrumentedRedis(redis.Redis):
+    """每個指令記錄延遲與錯誤；pipeline 以整批 PIPELINE / MULTI 計一次"""
+
+    def __init__(self, *args, stats: RedisStats, **kwargs):
+        self.stats = stats
+        super().__init__(*args, **kwargs)
+
+    def execute_command(self, *args, **options):
+        command = str(args[0]).split(" ", 1)[0].upper() if args else "UNKNOWN"
+        start = time.perf_counter()
+        try:
+            result = super().execute_command(*args, **options)
+        except Exception as e:
+            self.stats.record_command(command, time.perf_counter() - start, e)
+            raise
+        self.stats.record_command(command, time.perf_counter() - start)
+        return result
+
+    def pipeline(self, transaction: bool = True, shard_hint: Any = None):
+        pipe = InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.stats = self.stats
+        return pipe
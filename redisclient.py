@@ -0,0 +1,365 @@
+import logging
+import redis
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, Iterator, Tuple
+
+from redis_cache import ClientSideCache
+from redis_codec import RedisCodec
+from redis_stats import RedisStats, InstrumentedRedis, InstrumentedConnectionPool, InstrumentedBlockingConnectionPool
+from redis_scripts import LOCK_ACQUIRE, LOCK_RELEASE, LOCK_EXTEND, lock_keys
+
+logger = logging.getLogger("RedisDistributedLock")
+
+
+class RedisAutoBatcher:
+    """
+    把短時間內（max_delay 秒）或累積到 max_batch 筆的單一指令合併成一次 pipeline 送出，
+    每個呼叫者拿到自己的結果。適合多 thread 大量寫入小 key 的情境。
+    """
+
+    def __init__(self, client: redis.Redis, max_batch: int = 100, max_delay: float = 0.002):
+        self.client = client
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[Tuple[str, tuple, dict, Future]] = []
+        self._first_enqueued_at = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="redis-auto-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, command: str, *args, **kwargs) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RedisAutoBatcher 已關閉")
+            if not self._pending:
+                self._first_enqueued_at = time.monotonic()
+            self._pending.append((command, args, kwargs, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return future
+
+    def get(self, key: str) -> Optional[str]:
+        return self.submit("get", key).result()
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+        return self.submit("set", key, value, ex=ex).result()
+
+    def _take_batch(self) -> List[Tuple[str, tuple, dict, Future]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            # 等到批次滿或視窗到期
+            while not self._closed and len(self._pending) < self.max_batch:
+                remaining = self._first_enqueued_at + self.max_delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if self._pending:
+                self._first_enqueued_at = time.monotonic()
+            return batch
+
+    def _execute(self, batch: List[Tuple[str, tuple, dict, Future]]) -> None:
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for command, args, kwargs, _ in batch:
+                    getattr(pipe, command)(*args, **kwargs)
+                results = pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+
+        for (*_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._execute(batch)
+            elif self._closed:
+                return
+
+    def close(self) -> None:
+        """送出剩餘指令後停止背景 thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+
+class RedisClient:
+    def __init__(self,
+                 host: str = 'localhost',
+                 port: int = 6379,
+                 db: int = 0,
+                 password: Optional[str] = None,
+                 decode_responses: bool = True,
+                 client: Optional[redis.Redis] = None,
+                 auto_batch: bool = False,
+                 batch_size: int = 100,
+                 batch_delay: float = 0.002,
+                 client_cache: bool = False,
+                 cache_size: int = 10000,
+                 cache_ttl: float = 60.0,
+                 cache_mode: str = "tracking",
+                 codec: Optional[RedisCodec] = None,
+                 max_connections: Optional[int] = None,
+                 pool_timeout: float = 5.0,
+                 instrument: bool = False):
+        """
+        :param client: 直接注入既有的 client（例如 fakeredis.FakeRedis()），測試用
+        :param auto_batch: 開啟後 set/get 會由 RedisAutoBatcher 合併成 pipeline 送出
+        :param client_cache: 開啟後 get 先查本機 LRU/TTL 快取，靠 Redis 失效通知保持一致
+        :param cache_mode: "tracking"（CLIENT TRACKING，Redis 6+）或 "keyspace"（keyspace notifications）
+        :param codec: 提供時以 binary-safe 模式連線，set/get 自動序列化 + 壓縮 Python 物件
+        :param max_connections: 設定時改用 BlockingConnectionPool，用完的呼叫最多排隊 pool_timeout 秒
+        :param instrument: 記錄每個指令的延遲、pool checkout 等待、連線數與錯誤，用 stats_snapshot() 讀取
+        """
+        if codec is not None:
+            decode_responses = False
+        self.stats: Optional[RedisStats] = RedisStats() if instrument else None
+        if client is None:
+            pool_kwargs = dict(
+                host=host,
+                port=port,
+                db=db,
+                password=password,
+                decode_responses=decode_responses
+            )
+            if max_connections is not None:
+                pool_kwargs.update(max_connections=max_connections, timeout=pool_timeout)
+
+            if self.stats is not None:
+                pool_class = InstrumentedBlockingConnectionPool if max_connections is not None else InstrumentedConnectionPool
+                pool = pool_class(self.stats, **pool_kwargs)
+                client = InstrumentedRedis(connection_pool=pool, stats=self.stats)
+            else:
+                pool_class = redis.BlockingConnectionPool if max_connections is not None else redis.ConnectionPool
+                pool = pool_class(**pool_kwargs)
+                client = redis.Redis(connection_pool=pool)
+        self.client = client
+        self.batcher = RedisAutoBatcher(self.client, batch_size, batch_delay) if auto_batch else None
+        self.cache = ClientSideCache(self.client, cache_size, cache_ttl, cache_mode) if client_cache else None
+        self.codec = codec
+
+    def _encode(self, value: Any) -> Any:
+        return self.codec.encode(value) if self.codec is not None else value
+
+    def _decode(self, data: Any) -> Any:
+        return self.codec.decode(data) if self.codec is not None else data
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        value = self._encode(value)
+        if self.batcher is not None:
+            result = self.batcher.set(key, value, ex=ex)
+        else:
+            result = self.client.set(key, value, ex=ex)
+        if self.cache is not None:
+            # 自己寫入的 key 立刻失效，不必等 Redis 的通知
+            self.cache.invalidate(key)
+        return result
+
+    def get(self, key: str) -> Optional[Any]:
+        if self.cache is not None:
+            return self._decode(self.cache.get(key))
+        if self.batcher is not None:
+            return self._decode(self.batcher.get(key))
+        return self._decode(self.client.get(key))
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        return [self._decode(value) for value in self.client.mget(keys)]
+
+    def mset(self, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        if not mapping:
+            return True
+        mapping = {key: self._encode(value) for key, value in mapping.items()}
+        if self.cache is not None:
+            for key in mapping:
+                self.cache.invalidate(key)
+        if ex is None:
+            return self.client.mset(mapping)
+        # MSET 不支援 TTL，改用 pipeline 一次送出多個 SET EX
+        with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ex)
+            return all(pipe.execute())
+
+    @contextmanager
+    def pipeline(self, transaction: bool = False) -> Iterator[redis.client.Pipeline]:
+        """離開 with 區塊時自動 execute 尚未送出的指令；發生例外則整批丟棄"""
+        pipe = self.client.pipeline(transaction=transaction)
+        try:
+            yield pipe
+            if len(pipe):
+                pipe.execute()
+        finally:
+            pipe.reset()
+
+    def ping(self) -> bool:
+        return self.client.ping()
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        """指令延遲（p50/p95/p99、錯誤數）與連線池（in-use / idle / checkout 等待）的快照"""
+        if self.stats is None:
+            return {}
+        return self.stats.snapshot()
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+        if self.batcher is not None:
+            self.batcher.close()
+        self.client.close()
+
+    def get_raw_client(self) -> redis.Redis:
+        return self.client
+
+
+class RedisDistributedLock:
+    """
+    低競爭的分散式鎖：
+      - 取得鎖時回傳單調遞增的 fencing token，下游寫入可帶著它拒絕過期持有者
+      - 等待者用 BLPOP 等釋放訊號，不做 sleep-and-poll；持有者若掛掉，最晚在 lease 到期時醒來重試
+      - auto_renew 時背景 watchdog 每 timeout/3 秒續約，長時間的關鍵區段不會中途失效
+    """
+
+    def __init__(self,
+                 client: redis.Redis,
+                 lock_key: str,
+                 timeout: int = 10,
+                 blocking_timeout: float = 5,
+                 auto_renew: bool = True):
+        self.client = client
+        self.lock_key = lock_key
+        self.keys = lock_keys(lock_key)
+        self.timeout = timeout
+        self.blocking_timeout = blocking_timeout
+        self.auto_renew = auto_renew
+        self.token: Optional[str] = None
+        self.fencing_token: Optional[int] = None
+        self.lost = False  # watchdog 續約失敗（鎖已被別人拿走）時設為 True
+        self._acquire_script = client.register_script(LOCK_ACQUIRE)
+        self._release_script = client.register_script(LOCK_RELEASE)
+        self._extend_script = client.register_script(LOCK_EXTEND)
+        self._stop_renew = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @property
+    def _lease_ms(self) -> int:
+        return int(self.timeout * 1000)
+
+    def acquire(self, blocking: bool = True, blocking_timeout: Optional[float] = None) -> Optional[int]:
+        """成功回傳 fencing token，逾時回傳 None"""
+        if blocking_timeout is None:
+            blocking_timeout = self.blocking_timeout
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + blocking_timeout
+
+        while True:
+            ok, value = self._acquire_script(keys=self.keys, args=[token, self._lease_ms])
+            if ok:
+                self.token = token
+                self.fencing_token = int(value)
+                self.lost = False
+                if self.auto_renew:
+                    self._start_watchdog()
+                return self.fencing_token
+
+            remaining = deadline - time.monotonic()
+            if not blocking or remaining <= 0:
+                return None
+            # 最多等到鎖的 lease 到期；pttl < 0 表示鎖剛好消失，馬上重試
+            lease_left = value / 1000 if value > 0 else 0.01
+            self.client.blpop([self.keys[2]], timeout=max(min(remaining, lease_left), 0.01))
+
+    def release(self) -> bool:
+        if self.token is None:
+            return False
+        self._stop_watchdog()
+        released = self._release_script(keys=self.keys, args=[self.token, self._lease_ms])
+        self.token = None
+        return bool(released)
+
+    def extend(self) -> bool:
+        if self.token is None:
+            return False
+        return bool(self._extend_script(keys=self.keys, args=[self.token, self._lease_ms]))
+
+    def locked(self) -> bool:
+        if self.token is None:
+            return False
+        return self.client.get(self.lock_key) in (self.token, self.token.encode())
+
+    def _start_watchdog(self) -> None:
+        self._stop_renew.clear()
+        self._watchdog = threading.Thread(target=self._renew_loop, name=f"lock-watchdog-{self.lock_key}", daemon=True)
+        self._watchdog.start()
+
+    def _stop_watchdog(self) -> None:
+        self._stop_renew.set()
+        if self._watchdog is not None and self._watchdog is not threading.current_thread():
+            self._watchdog.join()
+        self._watchdog = None
+
+    def _renew_loop(self) -> None:
+        interval = self.timeout / 3
+        while not self._stop_renew.wait(interval):
+            try:
+                if not self.extend():
+                    self.lost = True
+                    logger.warning(f"⚠️ 鎖 {self.lock_key} 續約失敗，已被其他持有者取得")
+                    return
+            except redis.RedisError as e:
+                logger.warning(f"⚠️ 鎖 {self.lock_key} 續約錯誤: {e}")
+
+    def __enter__(self):
+        if self.acquire() is None:
+            raise TimeoutError("無法取得 Redis 鎖")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+if __name__ == "__main__":
+    redis_client = RedisClient(host="localhost", port=6379)
+    client = redis_client.get_raw_client()
+
+    try:
+        # 用 Redis 做些事
+        redis_client.set("hello", "world", ex=30)
+        print("hello =", redis_client.get("hello"))
+
+        # 批次讀寫：一次 round trip
+        redis_client.mset({f"page:{i}": f"<html>{i}</html>" for i in range(100)}, ex=60)
+        print("pages =", len(redis_client.mget([f"page:{i}" for i in range(100)])))
+
+        # 存 Python 物件：msgpack + zstd，大於 1KB 才壓縮
+        codec_client = RedisClient(host="localhost", port=6379, codec=RedisCodec("msgpack", "zstd"))
+        codec_client.set("payload", {"id": 1, "html": "<div>hi</div>" * 500}, ex=30)
+        print("payload keys =", list(codec_client.get("payload")))
+
+        # 使用分布式鎖做一件只能一人做的事
+        with RedisDistributedLock(client, "my_lock_key") as lock:
+            print(f"取得鎖（fencing token={lock.fencing_token}），開始關鍵操作")
+            time.sleep(3)
+            print("操作完成，釋放鎖")
+
+    except TimeoutError as e:
+        print("⚠️ 無法取得鎖，跳過這輪任務")
+    except redis.RedisError as e:
+        print(f"⚠️ Redis 發生錯誤: {e}")
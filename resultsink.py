@@ -0,0 +1,334 @@
+import asyncio
+import gzip
+import inspect
+import io
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+# 選用套件：沒裝就不能選 compression="zstd"
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_SENTINEL = object()
+
+
+class ResultSink:
+    """
+    fetcher 的結果出口。fetch_all / run_retry_queue 每抓到一筆就 await write()，
+    sink 處理不及時 write() 會卡住，worker 就不會再去抓下一個 ID（背壓），
+    記憶體用量只跟 worker 數與 sink 緩衝有關，不跟 ID 總數成長。
+
+    deferred_ack 為 True 的 sink，write() 回傳時結果還沒真正保存（例如只放進寫檔 queue），
+    等保存好（fsync）才呼叫 on_durable(ids)；run_retry_queue 靠它決定何時在 WAL 記成 done。
+    """
+
+    count: int = 0
+    deferred_ack: bool = False
+    on_durable: Optional[Callable[[List[int]], None]] = None
+
+    async def write(self, id_: int, data: str) -> None:
+        raise NotImplementedError
+
+    async def flush(self) -> None:
+        """等目前為止 write() 過的結果都保存好（deferred_ack 的 sink 也已經呼叫過 on_durable）"""
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def _durable(self, ids: List[int]) -> None:
+        if self.on_durable is not None:
+            self.on_durable(ids)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class MemorySink(ResultSink):
+    """舊行為：全部放在 dict 裡，ID 數量小時用"""
+
+    def __init__(self, initial: Optional[Dict[int, str]] = None):
+        self.results: Dict[int, str] = dict(initial or {})
+        self.count = 0
+
+    async def write(self, id_: int, data: str) -> None:
+        self.results[id_] = data
+        self.count += 1
+
+
+class CallbackSink(ResultSink):
+    """每筆結果交給 callback（可以是 async 或一般函式），callback 跑完才算寫入完成"""
+
+    def __init__(self, callback: Callable[[int, str], Union[None, Awaitable[None]]]):
+        self.callback = callback
+        self.count = 0
+
+    async def write(self, id_: int, data: str) -> None:
+        result = self.callback(id_, data)
+        if inspect.isawaitable(result):
+            await result
+        self.count += 1
+
+
+class QueueSink(ResultSink):
+    """
+    結果放進有上限的 asyncio.Queue，由另一個 task 消費：
+
+        sink = QueueSink(maxsize=100)
+        async for id_, data in sink: ...
+
+    queue 滿了 write() 就會等待。close() 之後迭代結束。
+    """
+
+    def __init__(self, maxsize: int = 100):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.count = 0
+
+    async def write(self, id_: int, data: str) -> None:
+        await self.queue.put((id_, data))
+        self.count += 1
+
+    async def close(self) -> None:
+        await self.queue.put(_SENTINEL)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Tuple[int, str]:
+        item = await self.queue.get()
+        if item is _SENTINEL:
+            raise StopAsyncIteration
+        return item
+
+
+class JsonlShardSink(ResultSink):
+    """
+    寫成分片的 JSONL 檔：{prefix}-00000.jsonl(.gz / .zst)，每片 shard_size 筆，
+    每行 {"id": ..., "data": ...}。
+
+    write() 只把結果放進有上限的 queue（max_pending），背景 writer task 批次取出後
+    丟到 thread 寫檔、壓縮，不會卡住 event loop；磁碟跟不上時 queue 滿了 write() 就會等。
+    每批寫完 fsync 後才呼叫 on_durable，flush() 等 queue 裡的結果全部落地。
+    """
+
+    deferred_ack = True
+
+    def __init__(self,
+                 directory: str,
+                 prefix: str = "results",
+                 shard_size: int = 10000,
+                 compression: str = "none",
+                 max_pending: int = 1000,
+                 batch_size: int = 200,
+                 fsync: bool = True):
+        if compression not in ("none", "gzip", "zstd"):
+            raise ValueError(f"不支援的 compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("compression='zstd' 需要安裝 zstandard")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.compression = compression
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.count = 0
+        self.shards: List[str] = []
+
+        self._queue: asyncio.Queue = asyncio.Queue(max_pending)
+        self._writer: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self._fh: Any = None
+        self._raw: Any = None
+        self._in_shard = 0
+
+    def _shard_path(self, index: int) -> str:
+        suffix = {"none": ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}[self.compression]
+        return os.path.join(self.directory, f"{self.prefix}-{index:05d}{suffix}")
+
+    def _open_shard(self) -> None:
+        path = self._shard_path(len(self.shards))
+        if self.compression == "gzip":
+            self._fh = gzip.open(path, "wt", encoding="utf-8")
+        elif self.compression == "zstd":
+            self._raw = open(path, "wb")
+            self._fh = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._fh = open(path, "w", encoding="utf-8")
+        self.shards.append(path)
+        self._in_shard = 0
+
+    def _close_shard(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        if self._raw is not None:
+            self._raw.close()
+        self._fh = self._raw = None
+
+    def _sync(self) -> None:
+        """壓縮串流 flush 到檔案，並 fsync"""
+        self._fh.flush()
+        raw = self._raw if self._raw is not None else self._fh
+        raw.flush()
+        if self.fsync:
+            os.fsync(raw.fileno())
+
+    def _write_lines(self, batch: List[Tuple[int, str]]) -> None:
+        """在 thread 裡執行：寫入一批，必要時換下一個分片；回傳前整批都已 fsync"""
+        for id_, data in batch:
+            if self._fh is None or self._in_shard >= self.shard_size:
+                if self._fh is not None:
+                    self._sync()
+                self._close_shard()
+                self._open_shard()
+            line = json.dumps({"id": id_, "data": data}, ensure_ascii=False) + "\n"
+            self._fh.write(line.encode("utf-8") if self.compression == "zstd" else line)
+            self._in_shard += 1
+        self._sync()
+
+    async def _run_writer(self) -> None:
+        done = False
+        waiters: List[asyncio.Future] = []  # flush() 放進 queue 的 future，前面的結果寫完才 set
+        try:
+            while not done:
+                batch = []
+                item = await self._queue.get()
+                while True:
+                    if item is _SENTINEL:
+                        done = True
+                        break
+                    if isinstance(item, asyncio.Future):
+                        waiters.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size or self._queue.empty():
+                        break
+                    item = self._queue.get_nowait()
+                if batch:
+                    await asyncio.to_thread(self._write_lines, batch)
+                    self._durable([id_ for id_, _ in batch])
+                for waiter in waiters:
+                    waiter.set_result(None)
+                waiters.clear()
+        except Exception as e:
+            # 寫檔失敗：記下錯誤讓 write() 拋出，並持續清空 queue，避免卡在 put() 的 worker 永遠等下去
+            self._error = e
+            for waiter in waiters:
+                waiter.set_result(None)
+            while not done:
+                item = await self._queue.get()
+                if isinstance(item, asyncio.Future):
+                    item.set_result(None)
+                done = item is _SENTINEL
+        finally:
+            await asyncio.to_thread(self._close_shard)
+
+    async def write(self, id_: int, data: str) -> None:
+        if self._error is not None:
+            raise self._error
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run_writer())
+        await self._queue.put((id_, data))
+        self.count += 1
+
+    async def flush(self) -> None:
+        if self._writer is None:
+            return
+        if not self._writer.done():
+            waiter = asyncio.get_running_loop().create_future()
+            await self._queue.put(waiter)
+            await waiter
+        if self._error is not None:
+            raise self._error
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        await self._queue.put(_SENTINEL)
+        await self._writer
+        if self._error is not None:
+            raise self._error
+
+
+def read_jsonl_shards(paths: Iterable[str]) -> Iterable[Tuple[int, str]]:
+    """依序讀回 JsonlShardSink 的分片（依副檔名判斷壓縮）"""
+    for path in paths:
+        if path.endswith(".gz"):
+            fh = gzip.open(path, "rt", encoding="utf-8")
+        elif path.endswith(".zst"):
+            if zstandard is None:
+                raise ImportError("讀取 .zst 分片需要安裝 zstandard")
+            fh = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+        else:
+            fh = open(path, encoding="utf-8")
+        with fh:
+            for line in fh:
+                if line.strip():
+                    rec = json.loads(line)
+                    yield rec["id"], rec["data"]
+
+
+async def stream_fetch(
+    ids: Iterable[int],
+    fetch: Callable[[int], Awaitable[Tuple[int, Optional[str]]]],
+    sink: ResultSink,
+    workers: int,
+    timeout: Optional[float] = None
+) -> List[int]:
+    """
+    固定 workers 個 task 從 ids 依序取 ID → fetch → await sink.write()。
+    同時存在的請求與結果最多 workers 筆，ids 可以是 generator。回傳失敗的 ID。
+
+    :param timeout: 單一 ID（含重試）的時間上限
+    """
+    failed: List[int] = []
+    id_iter = iter(ids)
+
+    async def worker():
+        for id_ in id_iter:
+            try:
+                _, data = await asyncio.wait_for(fetch(id_), timeout)
+            except asyncio.TimeoutError:
+                print(f"[Timeout] ID {id_} 超時")
+                data = None
+            except Exception as e:
+                print(f"[Error] ID {id_} 發生錯誤：{e}")
+                data = None
+            if data is None:
+                failed.append(id_)
+            else:
+                await sink.write(id_, data)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # 例如 sink.write 失敗：其他 worker 不能繼續抓、繼續寫，全部取消後把例外往外拋
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return failed
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    async def fake_fetch(id_: int) -> Tuple[int, Optional[str]]:
+        await asyncio.sleep(0.001)
+        return id_, None if id_ % 97 == 0 else f"<html>{id_}</html>"
+
+    async def demo():
+        out_dir = tempfile.mkdtemp()
+        async with JsonlShardSink(out_dir, shard_size=2000, compression="gzip") as sink:
+            failed = await stream_fetch(range(10000), fake_fetch, sink, workers=50)
+        print(f"✅ 寫入 {sink.count} 筆，失敗 {len(failed)} 筆，分片: {sink.shards}")
+        print(f"📦 讀回 {sum(1 for _ in read_jsonl_shards(sink.shards))} 筆")
+
+    asyncio.run(demo())
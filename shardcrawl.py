@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import queue as queue_mod
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fetchengine import FetchEngine, FetchPolicy, make_transport
+from resultsink import JsonlShardSink, ResultSink
+
+# 選用套件：有裝就讓每個 worker 的 event loop 跑在 uvloop 上
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+PROGRESS_INTERVAL = 0.5  # worker 回報進度的間隔（秒）
+
+
+class _ProgressSink(ResultSink):
+    """包住實際的 sink，定期把成功數 / bytes 回報給 parent"""
+
+    def __init__(self, inner: ResultSink, worker: int, events: "mp.Queue"):
+        self.inner = inner
+        self.worker = worker
+        self.events = events
+        self.count = 0
+        self.bytes = 0
+        self.failed = 0
+        self._last_report = 0.0
+
+    async def write(self, id_: int, data: str) -> None:
+        await self.inner.write(id_, data)
+        self.count += 1
+        self.bytes += len(data)
+        self.report()
+
+    def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self.events.put(("progress", self.worker, self.count, self.failed, self.bytes))
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+class _PipeSink(ResultSink):
+    """pipe 模式：結果成批送回 parent；events queue 有上限，parent 來不及收時 put 會等（背壓）"""
+
+    def __init__(self, worker: int, events: "mp.Queue", batch_size: int = 100):
+        self.worker = worker
+        self.events = events
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch: List = []
+
+    async def write(self, id_: int, data: str) -> None:
+        self._batch.append((id_, data))
+        self.count += 1
+        if len(self._batch) >= self.batch_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self._batch:
+            batch, self._batch = self._batch, []
+            await asyncio.to_thread(self.events.put, ("results", self.worker, batch))
+
+    async def close(self) -> None:
+        await self._flush()
+
+
+async def _crawl_shard(worker: int, ids: List[int], base_url: str, options: Dict[str, Any], events: "mp.Queue") -> None:
+    if options["output"] == "pipe":
+        inner: ResultSink = _PipeSink(worker, events)
+    else:
+        inner = JsonlShardSink(options["out_dir"], prefix=f"worker{worker:02d}",
+                               shard_size=options["shard_size"], compression=options["compression"])
+    sink = _ProgressSink(inner, worker, events)
+
+    engine = FetchEngine(make_transport(options["transport"], proxy=options["proxy"]),
+                         options["policy"], concurrency=options["concurrency"])
+    async with engine:
+        try:
+            _, failed = await engine.fetch_many(ids, lambda id_: f"{base_url}{id_}", sink)
+        finally:
+            await sink.close()
+    sink.failed = len(failed)
+    sink.report(force=True)
+    shards = inner.shards if isinstance(inner, JsonlShardSink) else []
+    events.put(("done", worker, failed, shards))
+
+
+def _worker_main(worker: int, ids: List[int], base_url: str, options: Dict[str, Any], events: "mp.Queue") -> None:
+    """子 process 進入點：自己的 event loop（有 uvloop 就用），跑完送 done，例外送 error"""
+    try:
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        asyncio.run(_crawl_shard(worker, ids, base_url, options, events))
+    except BaseException as e:
+        events.put(("error", worker, repr(e)))
+        raise
+
+
+class CrawlReport:
+    def __init__(self, total: int, processes: int):
+        self.total = total
+        self.processes = processes
+        self.succeeded = 0
+        self.failed_ids: List[int] = []
+        self.bytes = 0
+        self.shards: List[str] = []
+        self.errors: Dict[int, str] = {}
+        self.results: Optional[Dict[int, str]] = None
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return (self.succeeded + len(self.failed_ids)) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (f"✅ 成功 {self.succeeded}/{self.total}，失敗 {len(self.failed_ids)}，"
+                f"{self.bytes / 1e6:.1f} MB，耗時 {self.elapsed:.2f} 秒，"
+                f"{self.throughput:.1f} req/s（{self.processes} processes）")
+
+
+def crawl_sharded(
+    ids: List[int],
+    base_url: str = "https://twitter.com/get/",
+    processes: Optional[int] = None,
+    output: str = "files",
+    out_dir: str = "crawl_output",
+    on_result: Optional[Callable[[int, str], None]] = None,
+    transport: str = "httpx",
+    concurrency: int = 10,
+    policy: Optional[FetchPolicy] = None,
+    proxy: Optional[str] = None,
+    shard_size: int = 10000,
+    compression: str = "none",
+    report_interval: float = 2.0
+) -> CrawlReport:
+    """
+    把 ids 平均分給 N 個 process（ids[i::N]），每個 process 各跑一個 event loop 與 FetchEngine。
+
+    :param processes: process 數，預設為 CPU 核心數
+    :param output: "files" 每個 worker 寫自己的 JSONL 分片到 out_dir；
+                   "pipe" 結果經 queue 送回 parent，交給 on_result（不給則收進 report.results）
+    :param concurrency: 每個 process 的併發數
+    :param report_interval: parent 印出整體進度與吞吐量的間隔（秒）
+    """
+    if output not in ("files", "pipe"):
+        raise ValueError(f"不支援的 output: {output}")
+    processes = max(1, min(processes or os.cpu_count() or 1, len(ids) or 1))
+    report = CrawlReport(len(ids), processes)
+    if output == "pipe" and on_result is None:
+        report.results = {}
+        on_result = report.results.__setitem__
+
+    options = {
+        "output": output,
+        "out_dir": out_dir,
+        "shard_size": shard_size,
+        "compression": compression,
+        "transport": transport,
+        "proxy": proxy,
+        "concurrency": concurrency,
+        "policy": policy or FetchPolicy(),
+    }
+
+    ctx = mp.get_context("spawn")
+    events = ctx.Queue(maxsize=processes * 64)
+    workers = [ctx.Process(target=_worker_main, args=(i, ids[i::processes], base_url, options, events), daemon=True)
+               for i in range(processes)]
+    start = time.perf_counter()
+    for p in workers:
+        p.start()
+
+    progress: Dict[int, tuple] = {}
+    pending = set(range(processes))
+    last_report = start
+    while pending:
+        try:
+            event = events.get(timeout=0.5)
+        except queue_mod.Empty:
+            for i in list(pending):
+                if not workers[i].is_alive():
+                    report.errors.setdefault(i, f"process 結束（exit code {workers[i].exitcode}）但沒有回報結果")
+                    pending.discard(i)
+            event = None
+
+        if event is not None:
+            kind, worker = event[0], event[1]
+            if kind == "progress":
+                progress[worker] = event[2:]
+            elif kind == "results":
+                for id_, data in event[2]:
+                    on_result(id_, data)
+            elif kind == "done":
+                report.failed_ids.extend(event[2])
+                report.shards.extend(event[3])
+                pending.discard(worker)
+            elif kind == "error":
+                report.errors[worker] = event[2]
+                pending.discard(worker)
+
+        now = time.perf_counter()
+        if now - last_report >= report_interval:
+            last_report = now
+            done = sum(p[0] + p[1] for p in progress.values())
+            mb = sum(p[2] for p in progress.values()) / 1e6
+            print(f"📊 {done}/{report.total}（{done / max(report.total, 1):.0%}），"
+                  f"{done / (now - start):.1f} req/s，{mb:.1f} MB，進行中 worker {len(pending)}")
+
+    for p in workers:
+        p.join()
+    report.elapsed = time.perf_counter() - start
+    report.succeeded = sum(p[0] for p in progress.values())
+    report.bytes = sum(p[2] for p in progress.values())
+    for worker, error in report.errors.items():
+        print(f"❌ worker {worker} 失敗：{error}")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="多 process 分片抓取")
+    parser.add_argument("--start", type=int, required=True, help="起始 ID（含）")
+    parser.add_argument("--end", type=int, required=True, help="結束 ID（不含）")
+    parser.add_argument("--base-url", default="https://twitter.com/get/")
+    parser.add_argument("--processes", type=int, default=None, help="預設為 CPU 核心數")
+    parser.add_argument("--concurrency", type=int, default=10, help="每個 process 的併發數")
+    parser.add_argument("--transport", default="httpx", choices=["httpx", "aiohttp", "requests"])
+    parser.add_argument("--output", default="files", choices=["files", "pipe"])
+    parser.add_argument("--out-dir", default="crawl_output")
+    parser.add_argument("--compression", default="none", choices=["none", "gzip", "zstd"])
+    parser.add_argument("--proxy", default=None)
+    args = parser.parse_args(argv)
+
+    report = crawl_sharded(list(range(args.start, args.end)), args.base_url,
+                           processes=args.processes, output=args.output, out_dir=args.out_dir,
+                           transport=args.transport, concurrency=args.concurrency,
+                           proxy=args.proxy, compression=args.compression)
+    print(report.summary())
+    if report.shards:
+        print(f"📁 分片: {len(report.shards)} 個檔案於 {args.out_dir}")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import os
+import sys
+
+import pytest
+
+# 專案是平鋪的模組，沒有打包；讓測試從任何目錄執行都找得到
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fetchengine  # noqa: E402
+from fetchengine import FetchResponse, Transport  # noqa: E402
+
+
+class FakeTransport(Transport):
+    """
+    不連網路的 transport：URL 最後一段當 ID，回 status_for(id)，內容是 body-{id}。
+    delays 依呼叫順序給每個請求一個延遲；同時記錄呼叫次數與同時進行中的請求數。
+    """
+
+    name = "fake"
+
+    def __init__(self, proxy=None, status_for=None, delays=(), delay=0.0, **kwargs):
+        self.status_for = status_for or (lambda id_: 200)
+        self.delays = list(delays)
+        self.delay = delay
+        self.kwargs = kwargs
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get(self, url, headers, timeout):
+        delay = self.delays[self.calls] if self.calls < len(self.delays) else self.delay
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        id_ = url.rsplit("/", 1)[-1]
+        return FetchResponse(self.status_for(int(id_)), {}, f"body-{id_}")
+
+
+@pytest.fixture
+def fake_transport(monkeypatch):
+    """
+    把 FakeTransport 註冊成 transport="fake"；回傳的函式可以換掉參數，例如
+    fake_transport(status_for=lambda id_: 404 if id_ % 13 == 0 else 200)
+    """
+    def register(**options):
+        monkeypatch.setitem(fetchengine.TRANSPORTS, "fake", functools.partial(FakeTransport, **options))
+
+    register(delay=0.001)
+    return register
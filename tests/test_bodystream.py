@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from bodystream import BodyOptions, BodyTooLarge, SpooledBody, consume_body, consume_body_sync
+
+PAYLOAD = json.dumps({"items": ["x" * 100] * 200}).encode()  # 約 20KB
+
+
+def _chunks(data, size=1024):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+async def _achunks(data, size=1024):
+    for chunk in _chunks(data, size):
+        yield chunk
+
+
+def _consume(mode, options, data=PAYLOAD):
+    if mode == "async":
+        return asyncio.run(consume_body(_achunks(data), "utf-8", None, options))
+    return consume_body_sync(iter(_chunks(data)), "utf-8", None, options)
+
+
+@pytest.fixture(params=["async", "sync"])
+def mode(request):
+    return request.param
+
+
+def test_keep_files_with_parser_removes_spool(tmp_path, mode):
+    options = BodyOptions(spool_threshold=4096, spool_dir=str(tmp_path), keep_files=True, parser=json.loads)
+    parsed = _consume(mode, options)
+    assert len(parsed["items"]) == 200
+    assert os.listdir(tmp_path) == []
+
+
+def test_keep_files_without_parser_returns_spooled_body(tmp_path, mode):
+    options = BodyOptions(spool_threshold=4096, spool_dir=str(tmp_path), keep_files=True)
+    body = _consume(mode, options)
+    assert isinstance(body, SpooledBody)
+    assert body.size == len(PAYLOAD)
+    assert body.read_text() == PAYLOAD.decode()
+    assert os.listdir(tmp_path) == [os.path.basename(body.path)]
+
+
+def test_spool_removed_after_decode(tmp_path, mode):
+    options = BodyOptions(spool_threshold=4096, spool_dir=str(tmp_path))
+    assert _consume(mode, options) == PAYLOAD.decode()
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_removed_when_parser_fails(tmp_path, mode):
+    def broken(text):
+        raise ValueError("bad payload")
+
+    options = BodyOptions(spool_threshold=4096, spool_dir=str(tmp_path), keep_files=True, parser=broken)
+    with pytest.raises(ValueError):
+        _consume(mode, options)
+    assert os.listdir(tmp_path) == []
+
+
+def test_too_large_aborts_and_cleans_up(tmp_path, mode):
+    options = BodyOptions(max_bytes=8192, spool_threshold=2048, spool_dir=str(tmp_path))
+    with pytest.raises(BodyTooLarge):
+        _consume(mode, options)
+    assert os.listdir(tmp_path) == []
+
+
+def test_content_length_rejected_before_reading():
+    with pytest.raises(BodyTooLarge):
+        consume_body_sync(iter(()), "utf-8", "999999", BodyOptions(max_bytes=10))
@@ -0,0 +1,117 @@
+import asyncio
+import socket
+
+import pytest
+
+import connpool
+from connpool import DNSCache, HostPoolManager
+
+
+def _fake_getaddrinfo(calls, table):
+    async def getaddrinfo(self, host, port, **kwargs):
+        calls.append(host)
+        await asyncio.sleep(0.01)
+        if host not in table:
+            raise socket.gaierror(f"unknown host {host}")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (ip, port)) for ip in table[host]]
+
+    return getaddrinfo
+
+
+def test_dns_cache_dedups_concurrent_lookups_and_expires(monkeypatch):
+    calls = []
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo",
+                        _fake_getaddrinfo(calls, {"a.com": ["10.0.0.1", "10.0.0.1", "10.0.0.2"]}))
+    cache = DNSCache(ttl=0.05)
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.resolve("a.com", 443) for _ in range(5)))
+        cached = await cache.resolve("a.com", 443)
+        await asyncio.sleep(0.06)
+        expired = await cache.resolve("a.com", 443)
+        with pytest.raises(socket.gaierror):
+            await cache.resolve("missing.com", 443)
+        return first, cached, expired
+
+    first, cached, expired = asyncio.run(scenario())
+    assert all(addresses == ["10.0.0.1", "10.0.0.2"] for addresses in first)
+    assert cached == expired == ["10.0.0.1", "10.0.0.2"]
+    assert calls == ["a.com", "a.com", "missing.com"]
+    stats = cache.stats.snapshot()["a.com"]
+    assert (stats["dns_hits"], stats["dns_misses"]) == (5, 2)
+
+
+def test_size_for_and_requests_mounts():
+    requests = pytest.importorskip("requests")
+    manager = HostPoolManager(default_size=6, host_sizes={"slow.com": 2}, http2=False)
+    assert manager.size_for("slow.com") == 2 and manager.size_for("other.com") == 6
+
+    session = requests.Session()
+    manager.mount_requests(session)
+    assert session.get_adapter("https://slow.com/x")._pool_maxsize == 2
+    assert session.get_adapter("http://other.com/x")._pool_maxsize == 6
+
+
+def test_stats_snapshot_reuse_ratio():
+    stats = connpool.ConnectionStats()
+    host = stats.host("a.com")
+    host.requests, host.new_connections, host.http2_requests = 10, 2, 5
+    snapshot = stats.snapshot()["a.com"]
+    assert snapshot["reuse_ratio"] == 0.8 and snapshot["http2_ratio"] == 0.5
+    assert "重用率 80.0%" in stats.report()
+
+
+class _RecordingPool:
+    """取代 httpx.AsyncHTTPTransport：記錄收到的請求，回報新建一條連線"""
+
+    created = []
+
+    def __init__(self, http2=False, limits=None):
+        self.limits = limits
+        self.requests = []
+        self.connected = False
+        _RecordingPool.created.append(self)
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        if not self.connected:
+            self.connected = True
+            await request.extensions["trace"]("connection.connect_tcp.complete", {})
+        return connpool.httpx.Response(200, text="ok", extensions={"http_version": b"HTTP/1.1"})
+
+    async def aclose(self):
+        pass
+
+
+def test_httpx_routes_per_host_and_connects_by_ip_with_sni(monkeypatch):
+    pytest.importorskip("httpx")
+    _RecordingPool.created = []
+    monkeypatch.setattr(connpool.httpx, "AsyncHTTPTransport", _RecordingPool)
+    calls = []
+    monkeypatch.setattr(asyncio.BaseEventLoop, "getaddrinfo",
+                        _fake_getaddrinfo(calls, {"api.example.com": ["203.0.113.7"], "cdn.example.com": ["203.0.113.8"]}))
+    manager = HostPoolManager(default_size=4, host_sizes={"cdn.example.com": 2}, http2=False)
+
+    async def scenario():
+        async with manager.httpx_client() as client:
+            for url in ["https://api.example.com/a", "https://api.example.com/b", "https://cdn.example.com/c",
+                        "http://127.0.0.1:8080/d"]:
+                assert (await client.get(url)).text == "ok"
+
+    asyncio.run(scenario())
+    api, cdn, local = _RecordingPool.created
+    assert api.limits.max_connections == 4 and cdn.limits.max_connections == 2
+
+    sent = api.requests[0]
+    assert sent.url.host == "203.0.113.7"
+    assert sent.headers["Host"] == "api.example.com"
+    assert sent.extensions["sni_hostname"] == "api.example.com"
+    assert cdn.requests[0].url.host == "203.0.113.8"
+    assert local.requests[0].url.host == "127.0.0.1"  # 已經是 IP 就不查 DNS
+    assert "sni_hostname" not in local.requests[0].extensions
+    assert calls == ["api.example.com", "cdn.example.com"]
+
+    stats = manager.stats.snapshot()
+    assert stats["api.example.com"]["requests"] == 2
+    assert stats["api.example.com"]["reuse_ratio"] == 0.5
+    assert stats["api.example.com"]["dns_hits"] == 1
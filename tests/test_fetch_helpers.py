@@ -0,0 +1,59 @@
+import asyncio
+import inspect
+
+import pytest
+
+import httpasynctest
+import httpxtest
+
+
+@pytest.mark.parametrize("module", [httpasynctest, httpxtest])
+def test_fetch_all_wrappers_share_fetch_ids(module, fake_transport):
+    fake_transport(status_for=lambda id_: 404 if id_ % 13 == 0 else 200)
+    results, failed = asyncio.run(module.fetch_all(range(1, 30), "http://upstream/get/", transport="fake"))
+    assert failed == [13, 26]
+    assert results[1] == "body-1" and len(results) == 27
+
+
+def test_fetch_all_default_transports():
+    assert inspect.signature(httpasynctest.fetch_all).parameters["transport"].default == "aiohttp"
+    assert inspect.signature(httpxtest.fetch_all).parameters["transport"].default == "httpx"
+
+
+def test_httpx_fetch_one_shim_uses_callers_client():
+    httpx = pytest.importorskip("httpx")
+
+    def handler(request):
+        if request.url.path.endswith("/2"):
+            return httpx.Response(404)
+        return httpx.Response(200, text=f"ok {request.url.path}")
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            sem = asyncio.Semaphore(2)
+            got = await asyncio.gather(*(httpxtest.fetch_one(sem, client, id_, "http://upstream/get/") for id_ in (1, 2)))
+            assert not client.is_closed  # client 由呼叫端關閉
+            return got
+
+    assert asyncio.run(scenario()) == [(1, "ok /get/1"), (2, None)]
+
+
+def test_aiohttp_fetch_one_shim_uses_callers_session():
+    aiohttp = pytest.importorskip("aiohttp")
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    async def handle(request):
+        return web.Response(text=f"ok {request.match_info['id']}")
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/get/{id}", handle)
+        async with TestServer(app) as server:
+            async with aiohttp.ClientSession() as session:
+                sem = asyncio.Semaphore(1)
+                got = await httpasynctest.fetch_one(sem, session, 5, str(server.make_url("/get/")))
+                assert not session.closed
+                return got
+
+    assert asyncio.run(scenario()) == (5, "ok 5")
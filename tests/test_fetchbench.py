@@ -0,0 +1,66 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from fetchbench import UpstreamProfile, _percentile, format_report
+
+
+def _samples(latency, n=2000, **options):
+    profile = UpstreamProfile(latency=latency, **options)
+    rng = random.Random(0)
+    return [profile.sample_latency(rng) for _ in range(n)]
+
+
+def test_sample_latency_distributions():
+    assert set(_samples("fixed:0.2", n=10)) == {0.2}
+
+    uniform = _samples("uniform:0.1:0.3")
+    assert 0.1 <= min(uniform) and max(uniform) <= 0.3
+
+    lognormal = _samples("lognormal:0.05:0.5")
+    assert statistics.median(lognormal) == pytest.approx(0.05, rel=0.1)
+
+    pareto = _samples("pareto:0.01:2")
+    assert min(pareto) >= 0.01
+    assert statistics.median(pareto) == pytest.approx(0.01 * math.sqrt(2), rel=0.1)
+
+
+def test_sample_latency_is_capped_and_seeded():
+    assert max(_samples("pareto:1:0.5", max_latency=3.0)) == 3.0
+    assert _samples("lognormal:0.05:0.5", n=50) == _samples("lognormal:0.05:0.5", n=50)
+
+
+def test_invalid_latency_rejected_at_construction():
+    with pytest.raises(ValueError):
+        UpstreamProfile(latency="gamma:1:2")
+
+
+def test_in_burst():
+    profile = UpstreamProfile(burst_every=10, burst_duration=1)
+    assert [profile.in_burst(t) for t in (0, 0.5, 1.0, 5, 10.2, 11.5)] == [True, True, False, False, True, False]
+    assert not UpstreamProfile().in_burst(0)  # burst_every=0 不爆量
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    random.Random(0).shuffle(values)
+    assert _percentile(values, 0.50) == 50
+    assert _percentile(values, 0.99) == 99
+    assert _percentile(values, 1.0) == 100
+    assert _percentile(values, 0.0) == 1
+    assert _percentile([7.0], 0.99) == 7.0
+    assert _percentile([], 0.5) is None
+
+
+def test_format_report():
+    reports = {
+        "httpxtest": {"req_per_sec": 123.45, "succeeded": 10, "p50": 0.05, "p99": None, "retries": 2,
+                      "peak_rss_mb": 50.0},
+        "httptest": {"error": "超過 600s 未完成"},
+    }
+    lines = format_report(reports, 10).splitlines()
+    assert "123.5" in lines[1] and "10/10" in lines[1]
+    assert "0.050        -" in lines[1]  # 缺的 p99 仍佔滿欄寬
+    assert lines[2].startswith("httptest") and "❌ 超過 600s 未完成" in lines[2]
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+from conftest import FakeTransport
+from fetchengine import FetchEngine, FetchPolicy
+
+
+def _fetch(policy):
+    transport = FakeTransport(status_for=lambda id_: 429)
+    engine = FetchEngine(transport, policy)
+
+    async def scenario():
+        start = time.monotonic()
+        body = await asyncio.wait_for(engine.fetch("http://upstream/1"), 5)
+        return body, time.monotonic() - start
+
+    body, elapsed = asyncio.run(scenario())
+    return body, elapsed, transport.calls
+
+
+def test_rate_limited_gives_up_without_sleeping_retry_after():
+    # run_retry_queue 用 max_rate_limited=0：第一個 429 就交回 scheduler，不先睡 Retry-After
+    body, elapsed, calls = _fetch(FetchPolicy(max_attempts=1, max_rate_limited=0, default_retry_after=300))
+    assert body is None and calls == 1
+    assert elapsed < 1.0
+
+
+def test_rate_limit_wait_respects_deadline():
+    body, elapsed, calls = _fetch(FetchPolicy(max_rate_limited=5, default_retry_after=60, total_timeout=1.0))
+    assert body is None and calls == 1
+    assert elapsed < 1.0
+
+
+def test_rate_limit_waits_then_gives_up_after_limit():
+    body, elapsed, calls = _fetch(FetchPolicy(max_rate_limited=2, default_retry_after=0.05, total_timeout=None))
+    assert body is None and calls == 3
+    assert elapsed < 1.0
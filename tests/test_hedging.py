@@ -0,0 +1,55 @@
+import asyncio
+
+from conftest import FakeTransport
+from fetchengine import FetchEngine, FetchPolicy
+
+
+def _hedging_engine(transport, concurrency=10, p95=0.02):
+    engine = FetchEngine(transport, FetchPolicy(hedge=True, hedge_min_samples=5, hedge_max_ratio=1.0),
+                         concurrency=concurrency)
+    for _ in range(20):
+        engine.latency.observe("upstream", p95)
+    engine.requests_sent = 20
+    return engine
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    transport = FakeTransport(delays=[1.0, 0.0])
+    engine = _hedging_engine(transport)
+
+    async def scenario():
+        return await asyncio.wait_for(engine.fetch("http://upstream/1"), 0.5)
+
+    assert asyncio.run(scenario()) == "body-1"
+    assert transport.calls == 2
+    assert engine.hedges_sent == 1 and engine.hedge_wins == 1
+
+
+def test_time_waiting_for_a_slot_does_not_trigger_hedge():
+    # concurrency=1、p95 200ms：每個請求送出後都不超過 p95，第三個排隊 300ms 但不該因此 hedge
+    transport = FakeTransport(delays=[0.15, 0.15, 0.005])
+    engine = _hedging_engine(transport, concurrency=1, p95=0.2)
+
+    async def scenario():
+        return await asyncio.gather(*(engine.fetch(f"http://upstream/{i}") for i in range(3)))
+
+    asyncio.run(scenario())
+    assert transport.calls == 3
+    assert engine.hedges_sent == 0
+    assert transport.max_in_flight == 1
+
+
+def test_no_hedge_for_non_cancellable_transport():
+    transport = FakeTransport(delays=[0.1, 0.0])
+    transport.cancellable = False  # 例如 RequestsTransport：取消不會停掉 thread 裡的請求
+    engine = _hedging_engine(transport)
+
+    assert asyncio.run(engine.fetch("http://upstream/1")) == "body-1"
+    assert engine.hedges_sent == 0 and transport.calls == 1
+
+
+def test_requests_transport_is_not_cancellable():
+    import fetchengine
+
+    assert fetchengine.RequestsTransport.cancellable is False
+    assert fetchengine.HttpxTransport.cancellable and fetchengine.AiohttpTransport.cancellable
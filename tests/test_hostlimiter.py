@@ -0,0 +1,99 @@
+import asyncio
+import math
+import random
+
+from hostlimiter import AdaptiveHostLimiter, HostConcurrencyController
+
+
+async def _feed(controller, latencies, ok=True):
+    for latency in latencies:
+        await controller.acquire()
+        await controller.release(latency, ok)
+
+
+def test_lognormal_latency_without_errors_does_not_collapse():
+    # 健康但長尾的 host：延遲中位數 100ms、sigma=1 的 lognormal，沒有錯誤
+    rng = random.Random(1)
+    controller = HostConcurrencyController("a.com", initial_limit=10, max_limit=50)
+    latencies = [rng.lognormvariate(math.log(0.1), 1.0) for _ in range(2000)]
+    asyncio.run(_feed(controller, latencies))
+    assert controller.current_limit >= 40
+
+
+def test_latency_jump_decreases_limit():
+    controller = HostConcurrencyController("a.com", initial_limit=20, window=10)
+
+    async def scenario():
+        await _feed(controller, [0.1] * 50)
+        before = controller.limit
+        await _feed(controller, [0.5] * 10)
+        return before
+
+    before = asyncio.run(scenario())
+    assert controller.limit == before * 0.5
+
+
+def test_errors_decrease_limit():
+    controller = HostConcurrencyController("a.com", initial_limit=20, window=10, error_threshold=0.1)
+
+    async def scenario():
+        await _feed(controller, [0.1] * 8)
+        await _feed(controller, [0.1] * 2, ok=False)
+
+    asyncio.run(scenario())
+    assert controller.limit == 10
+
+
+def test_baseline_follows_permanent_slowdown():
+    controller = HostConcurrencyController("a.com", initial_limit=20, max_limit=100, window=10)
+
+    async def scenario():
+        await _feed(controller, [0.1] * 100)
+        await _feed(controller, [0.4] * 10)
+        dropped = controller.limit
+        await _feed(controller, [0.4] * 400)  # host 整體變慢但很穩定
+        return dropped
+
+    dropped = asyncio.run(scenario())
+    assert 0.1 < controller.baseline_latency <= 0.4
+    assert controller.limit > dropped
+
+
+def test_fixed_latency_target():
+    controller = HostConcurrencyController("a.com", initial_limit=20, window=10, latency_target=0.2)
+    asyncio.run(_feed(controller, [0.3] * 10))
+    assert controller.limit == 10
+
+
+def test_pause_blocks_acquire_and_halves_limit():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        controller = HostConcurrencyController("a.com", initial_limit=8)
+        await controller.pause(0.1)
+        start = loop.time()
+        await controller.acquire()
+        return controller, loop.time() - start
+
+    controller, waited = asyncio.run(scenario())
+    assert controller.limit == 4
+    assert waited >= 0.09
+
+
+def test_cancelled_slot_is_not_a_sample():
+    async def scenario():
+        limiter = AdaptiveHostLimiter(window=1)
+        controller = limiter.for_host("a.com")
+
+        async def hang():
+            async with limiter.slot("http://a.com/1"):
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(hang())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight == 0
+    assert controller.limit == 10  # window=1，但被取消的請求沒有觸發調整
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+from fetchengine import FetchEngine, FetchPolicy, FetchResponse, Transport
+from httpcache import CacheEntry, DiskCacheStore, HTTPCache, MemoryCacheStore, RedisCacheStore
+
+
+class RevalidatingTransport(Transport):
+    """模擬會做條件式請求的伺服器：If-None-Match 對上目前的 ETag 就回 304"""
+
+    name = "revalidating"
+
+    def __init__(self, proxy=None, **kwargs):
+        self.version = 0
+        self.requests = []
+
+    def body(self) -> str:
+        return json.dumps({"version": self.version})
+
+    def etag(self) -> str:
+        return f'"{hashlib.md5(self.body().encode()).hexdigest()}"'
+
+    async def get(self, url, headers, timeout):
+        self.requests.append(dict(headers))
+        if headers.get("If-None-Match") == self.etag():
+            return FetchResponse(304, {"ETag": self.etag()}, "")
+        return FetchResponse(200, {"ETag": self.etag(), "Last-Modified": "Mon, 19 Oct 2026 00:00:00 GMT"}, self.body())
+
+
+def _engine(transport, cache):
+    return FetchEngine(transport, FetchPolicy(max_attempts=1), cache=cache)
+
+
+def test_engine_revalidates_and_reuses_cached_body():
+    transport = RevalidatingTransport()
+    cache = HTTPCache(MemoryCacheStore())
+
+    async def scenario():
+        engine = _engine(transport, cache)
+        first = await engine.fetch("http://upstream/a")
+        second = await engine.fetch("http://upstream/a")
+        transport.version += 1
+        third = await engine.fetch("http://upstream/a")
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == second == json.dumps({"version": 0})
+    assert third == json.dumps({"version": 1})
+    assert "If-None-Match" not in transport.requests[0]
+    assert transport.requests[1]["If-None-Match"] == transport.requests[2]["If-None-Match"]
+    assert transport.requests[1]["If-Modified-Since"] == "Mon, 19 Oct 2026 00:00:00 GMT"
+    assert cache.stats()["not_modified"] == 1
+    assert cache.stats()["stored"] == 2
+
+
+def test_engine_skips_conditional_headers_without_cached_body():
+    # store_body=False 只存驗證碼（給 BaseSource 判斷有沒有變），engine 拿不到內容就不能送條件式請求
+    transport = RevalidatingTransport()
+    cache = HTTPCache(MemoryCacheStore(), store_body=False)
+
+    async def scenario():
+        engine = _engine(transport, cache)
+        await engine.fetch("http://upstream/a")
+        return await engine.fetch("http://upstream/a")
+
+    assert asyncio.run(scenario()) == json.dumps({"version": 0})
+    assert all("If-None-Match" not in headers for headers in transport.requests)
+
+
+def test_store_respects_no_store_and_missing_validators():
+    async def scenario():
+        cache = HTTPCache(MemoryCacheStore())
+        assert await cache.store("u", {"ETag": '"1"'}, "body")
+        assert await cache.conditional_headers("u") == {"If-None-Match": '"1"'}
+        assert not await cache.store("u", {"ETag": '"2"', "Cache-Control": "private, no-store"}, "body")
+        assert await cache.lookup("u") is None
+        assert not await cache.store("v", {}, "body")
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["misses"] == 3 and stats["stored"] == 1
+
+
+def test_memory_store_evicts_least_recently_used():
+    async def scenario():
+        store = MemoryCacheStore(max_entries=2)
+        await store.set("a", CacheEntry("1"))
+        await store.set("b", CacheEntry("2"))
+        await store.get("a")
+        await store.set("c", CacheEntry("3"))
+        return [await store.get(url) is not None for url in "abc"]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+
+
+def test_disk_store_round_trip_and_corrupt_file(tmp_path):
+    async def scenario():
+        store = DiskCacheStore(str(tmp_path))
+        await store.set("http://x/1", CacheEntry('"e"', "lm", "內容", stored_at=1.0))
+        entry = await store.get("http://x/1")
+        with open(store._path("http://x/1"), "w") as f:
+            f.write("{broken")
+        corrupt = await store.get("http://x/1")
+        await store.delete("http://x/1")
+        await store.delete("http://x/1")
+        return entry, corrupt, await store.get("http://x/1")
+
+    entry, corrupt, deleted = asyncio.run(scenario())
+    assert entry.to_dict() == {"etag": '"e"', "last_modified": "lm", "body": "內容", "stored_at": 1.0}
+    assert corrupt is None and deleted is None
+
+
+def test_redis_store_round_trip_with_ttl():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        store = RedisCacheStore(client, ttl=60)
+        await store.set("http://x/1", CacheEntry('"e"', None, "body"))
+        entry = await store.get("http://x/1")
+        ttl = await client.ttl(store._key("http://x/1"))
+        await store.delete("http://x/1")
+        return entry, ttl, await store.get("http://x/1")
+
+    entry, ttl, deleted = asyncio.run(scenario())
+    assert entry.etag == '"e"' and entry.body == "body"
+    assert 0 < ttl <= 60
+    assert deleted is None
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+import httptest
+from httptest import HostPoliteness, fetch_twitter_data
+
+
+def test_max_rate_is_documented_cap():
+    assert HostPoliteness().max_rate == pytest.approx(1 / 0.35)
+    assert HostPoliteness(0, 0).max_rate == float("inf")
+
+
+def test_wait_spaces_same_host_across_threads():
+    politeness = HostPoliteness(0.05, 0.05)
+    starts = []
+    lock = threading.Lock()
+
+    def hit(url):
+        politeness.wait(url)
+        with lock:
+            starts.append((url, time.monotonic()))
+
+    threads = [threading.Thread(target=hit, args=(url,)) for url in ["http://a/1"] * 4 + ["http://b/1"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    a_times = sorted(t for url, t in starts if url.startswith("http://a"))
+    gaps = [later - earlier for earlier, later in zip(a_times, a_times[1:])]
+    assert all(gap >= 0.045 for gap in gaps)
+    b_time = next(t for url, t in starts if url.startswith("http://b"))
+    assert b_time - min(a_times) < 0.04  # 不同 host 不用排隊
+
+
+def test_per_host_gap_does_not_shrink_with_workers(monkeypatch):
+    starts = []
+    lock = threading.Lock()
+
+    def fake_fetch(session, url, headers=None):
+        with lock:
+            starts.append(time.monotonic())
+        time.sleep(0.1)  # 回應比間隔慢：多個執行緒只是讓下一個時段不必等回應
+        return url
+
+    monkeypatch.setattr(httptest, "fetch_with_rate_limit_handling", fake_fetch)
+    results, failed = fetch_twitter_data(list(range(6)), base_url="http://a/", workers=8,
+                                         min_delay=0.03, max_delay=0.03)
+    assert failed == [] and list(results) == list(range(6))
+    starts.sort()
+    assert all(later - earlier >= 0.025 for earlier, later in zip(starts, starts[1:]))
+    assert starts[-1] - starts[0] < 0.5  # 逐筆模式要 6 × (0.1 + 0.03) 秒
@@ -0,0 +1,33 @@
+import tracemalloc
+
+from memprofile import AllocationProfiler
+
+
+def allocate():
+    return [bytearray(1024) for _ in range(100)]
+
+
+def run(profiler, method="allocate"):
+    state = profiler.start_call()
+    data = allocate()
+    profiler.finish_call(method, state)
+    return data
+
+
+def test_sites_off_by_default():
+    profiler = AllocationProfiler()
+    data = run(profiler)
+    stats = profiler.snapshot()["allocate"]
+    assert stats["calls"] == 1
+    assert stats["net_total"] >= 100 * 1024
+    assert stats["top_sites"] == []
+    assert not tracemalloc.is_tracing()
+    del data
+
+
+def test_sites_opt_in():
+    profiler = AllocationProfiler(trace_sites=True)
+    data = run(profiler)
+    sites = profiler.top_allocation_sites("allocate")
+    assert sites and "test_memprofile.py" in sites[0][0]
+    del data
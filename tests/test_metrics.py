@@ -0,0 +1,97 @@
+import json
+import urllib.request
+
+import pytest
+
+from metrics import OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+
+
+def _registry():
+    registry = MetricsRegistry(namespace="app", call_metrics=False)
+    requests = registry.counter("requests", "Handled requests")
+    requests.inc({"path": 'a"b\\c\nd'})
+    requests.inc({"path": "/x"}, 2)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        latency.observe(value, {"host": "a.com"})
+    registry.gauge("in_flight", "In-flight").set(3)
+    return registry
+
+
+BODY = """\
+app_requests_total{path="/x"} 2
+app_requests_total{path="a\\"b\\\\c\\nd"} 1
+# HELP app_latency_seconds Latency
+# TYPE app_latency_seconds histogram
+app_latency_seconds_bucket{host="a.com",le="0.1"} 1
+app_latency_seconds_bucket{host="a.com",le="1"} 2
+app_latency_seconds_bucket{host="a.com",le="+Inf"} 3
+app_latency_seconds_sum{host="a.com"} 2.55
+app_latency_seconds_count{host="a.com"} 3
+# HELP app_latency_seconds_quantile Latency (recent 1024 samples)
+# TYPE app_latency_seconds_quantile gauge
+app_latency_seconds_quantile{host="a.com",quantile="0.5"} 0.5
+app_latency_seconds_quantile{host="a.com",quantile="0.95"} 1.8499999999999999
+app_latency_seconds_quantile{host="a.com",quantile="0.99"} 1.97
+# HELP app_in_flight In-flight
+# TYPE app_in_flight gauge
+app_in_flight 3
+"""
+
+PROMETHEUS = "# HELP app_requests_total Handled requests\n# TYPE app_requests_total counter\n" + BODY
+# OpenMetrics 的 counter family 不含 _total，結尾要有 # EOF
+OPENMETRICS = "# HELP app_requests Handled requests\n# TYPE app_requests counter\n" + BODY + "# EOF\n"
+
+
+def test_prometheus_text():
+    assert _registry().render() == PROMETHEUS
+
+
+def test_openmetrics_text():
+    assert _registry().render(openmetrics=True) == OPENMETRICS
+
+
+def test_profiler_call_metrics():
+    registry = MetricsRegistry()
+    registry.observe_call("Fetcher.fetch", 0.002)
+    registry.observe_call("Fetcher.fetch", 0.2, exception=TimeoutError())
+    text = registry.render()
+    assert 'profiled_calls_total{method="Fetcher.fetch"} 2' in text
+    assert 'profiled_exceptions_total{exception="TimeoutError",method="Fetcher.fetch"} 1' in text
+    assert 'profiled_call_duration_seconds_bucket{method="Fetcher.fetch",le="0.0025"} 1' in text
+    assert 'profiled_call_duration_seconds_count{method="Fetcher.fetch"} 2' in text
+    with pytest.raises(RuntimeError):
+        MetricsRegistry(call_metrics=False).observe_call("x", 1.0)
+
+
+def test_register_same_name_twice():
+    registry = MetricsRegistry(call_metrics=False)
+    assert registry.counter("c", "doc") is registry.counter("c", "doc")
+    with pytest.raises(ValueError):
+        registry.gauge("c", "doc")
+
+
+def test_json_dump_keeps_samples(tmp_path):
+    path = tmp_path / "metrics.json"
+    _registry().dump_to_file(str(path), fmt="json")
+    data = json.loads(path.read_text(encoding="utf-8"))
+    [series] = data["metrics"]["app_latency_seconds"]["series"]
+    assert series["samples"] == [0.05, 0.5, 2.0]
+    assert series["buckets"] == {"0.1": 1, "1.0": 1}
+    assert data["metrics"]["app_requests"]["type"] == "counter"
+
+
+def test_http_endpoint_negotiates_format():
+    server = _registry().serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as resp:
+            assert resp.headers["Content-Type"] == PROMETHEUS_CONTENT_TYPE
+            assert resp.read().decode() == PROMETHEUS
+        request = urllib.request.Request(url, headers={"Accept": "application/openmetrics-text; version=1.0.0"})
+        with urllib.request.urlopen(request) as resp:
+            assert resp.headers["Content-Type"] == OPENMETRICS_CONTENT_TYPE
+            assert resp.read().decode() == OPENMETRICS
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import time
+
+from outbox import Outbox
+
+
+def _read_jsonl(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_close_waits_for_in_flight_batch_instead_of_cancelling(tmp_path):
+    state_dir = str(tmp_path)
+    received = []
+
+    async def scenario():
+        in_flight = asyncio.Event()
+
+        async def slow_send(batch):
+            in_flight.set()
+            await asyncio.sleep(0.2)
+            received.extend(item["id"] for item in batch)
+
+        outbox = Outbox(slow_send, state_dir, max_batch=5, flush_interval=0.01, fsync=False)
+        await outbox.start()
+        for i in range(5):
+            await outbox.put({"id": i})
+        await in_flight.wait()
+        await outbox.close(drain_timeout=2)
+        return outbox
+
+    outbox = asyncio.run(scenario())
+    assert received == [0, 1, 2, 3, 4]
+    assert outbox.stats()["pending"] == 0
+
+    # 重啟後不會再送一次
+    async def restart():
+        again = []
+
+        async def send(batch):
+            again.extend(batch)
+
+        async with Outbox(send, state_dir, flush_interval=0.01, fsync=False):
+            await asyncio.sleep(0.05)
+        return again
+
+    assert asyncio.run(restart()) == []
+
+
+def test_close_interrupts_backoff_and_keeps_items(tmp_path):
+    state_dir = str(tmp_path)
+
+    async def down(batch):
+        raise ConnectionError("接收端離線")
+
+    async def scenario():
+        outbox = Outbox(down, state_dir, max_batch=2, flush_interval=0.01, backoff_base=30, fsync=False)
+        await outbox.start()
+        for i in range(3):
+            await outbox.put({"id": i})
+        await asyncio.sleep(0.05)  # 第一次失敗，進入 15~30 秒的退避
+        start = time.monotonic()
+        await outbox.close(drain_timeout=0.5)
+        return time.monotonic() - start, outbox
+
+    elapsed, outbox = asyncio.run(scenario())
+    assert elapsed < 1.0
+    assert outbox.stats()["pending"] == 3
+    pending = [rec["item"]["id"] for rec in _read_jsonl(os.path.join(state_dir, "outbox.jsonl")) if "item" in rec]
+    assert pending == [0, 1, 2]
+
+
+def test_hung_send_is_cancelled_after_drain_timeout(tmp_path):
+    async def hang(batch):
+        await asyncio.sleep(60)
+
+    async def scenario():
+        outbox = Outbox(hang, str(tmp_path), max_batch=1, flush_interval=0.01, fsync=False)
+        await outbox.start()
+        await outbox.put({"id": 1})
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        await outbox.close(drain_timeout=0.2)
+        return time.monotonic() - start, outbox
+
+    elapsed, outbox = asyncio.run(scenario())
+    assert elapsed < 1.0
+    assert outbox.stats()["pending"] == 1
+
+
+def test_rejected_batch_goes_to_dead_letter(tmp_path):
+    state_dir = str(tmp_path)
+    received = []
+
+    async def picky(batch):
+        if any(item["id"] == 1 for item in batch):
+            raise ValueError("422 schema mismatch")
+        received.extend(item["id"] for item in batch)
+
+    async def scenario():
+        async with Outbox(picky, state_dir, max_batch=2, flush_interval=0.01, backoff_base=0.001,
+                          max_attempts=3, fsync=False) as outbox:
+            for i in range(6):
+                await outbox.put({"id": i})
+            await asyncio.sleep(0.3)
+        return outbox
+
+    outbox = asyncio.run(scenario())
+    assert received == [2, 3, 4, 5]
+    assert outbox.stats()["dead_lettered"] == 2
+    dead = _read_jsonl(os.path.join(state_dir, "outbox.dead.jsonl"))
+    assert [rec["item"]["id"] for rec in dead] == [0, 1]
+    assert "422" in dead[0]["error"]
+
+    # dead-letter 的 item 在 journal 已經 ack，重啟後不會再送
+    async def restart():
+        outbox = Outbox(picky, state_dir, fsync=False)
+        await outbox.start()
+        pending = outbox.stats()["pending"]
+        await outbox.close()
+        return pending
+
+    assert asyncio.run(restart()) == 0
+
+
+def test_restart_resends_unacked_items_in_order(tmp_path):
+    state_dir = str(tmp_path)
+
+    async def down(batch):
+        raise ConnectionError("離線")
+
+    async def first_run():
+        outbox = Outbox(down, state_dir, max_batch=10, flush_interval=10, fsync=False)
+        await outbox.start()
+        for i in range(4):
+            await outbox.put({"id": i})
+        await outbox.close(drain_timeout=0)
+
+    received = []
+
+    async def send(batch):
+        received.extend(item["id"] for item in batch)
+
+    async def second_run():
+        async with Outbox(send, state_dir, max_batch=10, flush_interval=0.01, fsync=False) as outbox:
+            await outbox.put({"id": 4})
+            await asyncio.sleep(0.1)
+
+    asyncio.run(first_run())
+    asyncio.run(second_run())
+    assert received == [0, 1, 2, 3, 4]
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+
+from persistentRetryQueue import PersistentRetryQueue, QueueWAL
+
+
+def _wal_lines(state_dir):
+    path = os.path.join(state_dir, "wal.jsonl")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_replay_restores_progress(tmp_path):
+    state_dir = str(tmp_path)
+    queue = PersistentRetryQueue([1, 2, 3, 4], retry_limit=2, state_dir=state_dir)
+    queue.mark_success(1, "one")
+    queue.mark_failure(2)
+    queue.mark_failure(3)
+    queue.mark_failure(3)
+    queue.checkpoint()  # 模擬當機：沒有 close()
+
+    resumed = PersistentRetryQueue([1, 2, 3, 4, 5], retry_limit=2, state_dir=state_dir, resume=True)
+    assert resumed.done == {1}
+    assert resumed.failed == [3]
+    assert resumed.queue == {2: 1, 4: 0, 5: 0}
+    assert resumed.previous_results() == {1: "one"}
+
+
+def test_replay_stops_at_torn_last_line(tmp_path):
+    state_dir = str(tmp_path)
+    queue = PersistentRetryQueue([1, 2], state_dir=state_dir)
+    queue.mark_success(1)
+    queue.checkpoint()
+    with open(os.path.join(state_dir, "wal.jsonl"), "a") as f:
+        f.write('{"id": 2, "s": "do')  # 寫到一半當機
+
+    resumed = PersistentRetryQueue([1, 2], state_dir=state_dir, resume=True)
+    assert resumed.done == {1}
+    assert resumed.queue == {2: 0}
+
+
+def test_compaction_writes_snapshot_and_truncates_wal(tmp_path):
+    state_dir = str(tmp_path)
+    queue = PersistentRetryQueue(list(range(10)), state_dir=state_dir)
+    queue.wal.compact_every = 4
+    queue.wal.flush_batch = 1
+    for id_ in range(6):
+        queue.mark_success(id_)
+
+    assert os.path.exists(os.path.join(state_dir, "snapshot.json"))
+    assert len(_wal_lines(state_dir)) < 6
+    queue.checkpoint()
+
+    resumed = PersistentRetryQueue(list(range(10)), state_dir=state_dir, resume=True)
+    assert resumed.done == set(range(6))
+    assert sorted(resumed.queue) == [6, 7, 8, 9]
+
+
+def test_background_compaction_keeps_records_appended_meanwhile(tmp_path):
+    state_dir = str(tmp_path)
+
+    async def scenario():
+        queue = PersistentRetryQueue(list(range(10)), state_dir=state_dir)
+        queue.wal.auto_flush = False
+        queue.wal.compact_every = 1
+        queue.mark_success(0)
+        await queue.checkpoint_async()  # 一般 flush，累積到 compact_every
+        queue.mark_success(1)
+        compaction = asyncio.ensure_future(queue.checkpoint_async())
+        await asyncio.sleep(0)  # compaction 已取走 buffer、在 thread 裡寫 snapshot
+        queue.mark_failure(2)
+        await compaction
+        await queue.checkpoint_async()
+
+    asyncio.run(scenario())
+    resumed = PersistentRetryQueue(list(range(10)), state_dir=state_dir, resume=True)
+    assert resumed.done == {0, 1}
+    assert resumed.queue[2] == 1
+
+
+def test_flush_periodically_flushes_without_new_appends(tmp_path):
+    state_dir = str(tmp_path)
+
+    async def scenario():
+        queue = PersistentRetryQueue([1, 2], state_dir=state_dir)
+        queue.wal.flush_interval = 0.05
+        stop = asyncio.Event()
+        flusher = asyncio.create_task(queue.flush_periodically(stop))
+        await asyncio.sleep(0)
+        queue.mark_success(1)  # 背景 flush 期間 append 不會自己落地
+        assert _wal_lines(state_dir) == []
+        await asyncio.sleep(0.2)
+        lines = _wal_lines(state_dir)
+        stop.set()
+        await flusher
+        return queue, lines
+
+    queue, lines = asyncio.run(scenario())
+    assert lines == [{"id": 1, "s": "done"}]
+    assert queue.wal.auto_flush
+
+
+def test_resume_is_opt_in(tmp_path):
+    state_dir = str(tmp_path)
+    queue = PersistentRetryQueue([1, 2], retry_limit=1, state_dir=state_dir)
+    queue.mark_success(1)
+    queue.mark_failure(2)
+    queue.checkpoint()
+
+    fresh = PersistentRetryQueue([1, 2], retry_limit=1, state_dir=state_dir)
+    assert fresh.queue == {1: 0, 2: 0}
+    assert fresh.done == set() and fresh.failed == []
+    assert not os.path.exists(os.path.join(state_dir, "results.jsonl"))
+
+
+def test_close_clears_state_after_complete_run(tmp_path):
+    state_dir = str(tmp_path)
+    queue = PersistentRetryQueue([1, 2], retry_limit=1, state_dir=state_dir)
+    queue.mark_success(1, "one")
+    queue.mark_failure(2)
+    queue.close()
+    assert os.listdir(state_dir) == []
+
+    # 之前放棄的 ID 下一次（即使 resume）會重新排進 queue
+    again = PersistentRetryQueue([1, 2], retry_limit=1, state_dir=state_dir, resume=True)
+    assert again.queue == {1: 0, 2: 0}
+
+
+def test_close_keeps_state_when_ids_pending(tmp_path):
+    state_dir = str(tmp_path)
+    queue = PersistentRetryQueue([1, 2], state_dir=state_dir)
+    queue.mark_success(1)
+    queue.close()
+    assert _wal_lines(state_dir) == []  # 已經 compaction 進 snapshot
+
+    resumed = PersistentRetryQueue([1, 2], state_dir=state_dir, resume=True)
+    assert resumed.done == {1}
+    assert resumed.queue == {2: 0}
+
+
+def test_wal_results_written_before_state(tmp_path):
+    wal = QueueWAL(str(tmp_path), flush_batch=100)
+    wal.append(7, "done", data="seven")
+    wal.flush()
+    assert wal.load_results() == {7: "seven"}
+    assert wal.load()[1] == {7}
+    wal.close()
@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import pytest
+
+import pollscheduler
+from pollscheduler import CHANGED, ERROR, UNCHANGED, PollInterval, PollScheduler
+
+
+def _fast_interval():
+    return PollInterval(base=0.01, min_interval=0.01, max_interval=0.02, jitter=0)
+
+
+def _run_for(scheduler, seconds):
+    async def scenario():
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(seconds)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+
+def test_interval_update_and_clamp():
+    interval = PollInterval(base=10, min_interval=2, max_interval=30, backoff=1.5, speedup=0.5, error_backoff=2)
+    assert interval.update(UNCHANGED) == 15
+    assert interval.update(UNCHANGED) == 22.5
+    assert interval.update(UNCHANGED) == 30  # 上限
+    assert interval.update(CHANGED) == 15
+    assert interval.update(ERROR) == 30
+    assert interval.update(None) == 30  # 沒有回傳值當成失敗
+    for _ in range(5):
+        interval.update(CHANGED)
+    assert interval.current == 2  # 下限
+    assert PollInterval(base=1000, max_interval=300).current == 300
+
+
+def test_next_delay_within_jitter_bounds():
+    random.seed(1)
+    interval = PollInterval(base=10, jitter=0.1)
+    delays = [interval.next_delay() for _ in range(1000)]
+    assert 9 <= min(delays) < 9.1 and 10.9 < max(delays) <= 11
+    assert PollInterval(base=10, jitter=0).next_delay() == 10
+
+
+def test_first_poll_is_not_delayed_by_the_interval(monkeypatch):
+    spreads = []
+    monkeypatch.setattr(pollscheduler.random, "uniform", lambda low, high: spreads.append(high) or 0)
+    polled = []
+
+    async def poll():
+        polled.append(True)
+        return UNCHANGED
+
+    scheduler = PollScheduler(startup_spread=0.5)
+    scheduler.add("slow", poll, PollInterval(base=60))
+    _run_for(scheduler, 0.05)
+    assert polled and spreads[0] == 0.5
+
+
+def test_concurrency_cap():
+    in_flight = 0
+    peak = 0
+
+    async def poll():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return UNCHANGED
+
+    scheduler = PollScheduler(max_concurrency=2, startup_spread=0)
+    for i in range(6):
+        scheduler.add(f"source-{i}", poll, _fast_interval())
+    _run_for(scheduler, 0.1)
+    assert peak == 2
+    assert all(stats["polls"] > 0 for stats in scheduler.stats().values())
+
+
+def test_poll_exception_counts_as_error_and_loop_continues():
+    calls = 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError("上游離線")
+        return CHANGED if calls == 2 else UNCHANGED
+
+    scheduler = PollScheduler(startup_spread=0)
+    scheduler.add("flaky", flaky, _fast_interval())
+    _run_for(scheduler, 0.1)
+    stats = scheduler.stats()["flaky"]
+    assert stats["errors"] == 1
+    assert stats["changes"] == 1
+    assert stats["polls"] == calls >= 3
+    assert stats["last_change"] is not None
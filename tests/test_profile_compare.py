@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from metrics import MetricsRegistry
+from profile_compare import (
+    bootstrap_relative_change,
+    compare_runs,
+    load_log,
+    load_run,
+    mann_whitney_p,
+    rate_change_p,
+)
+
+
+def _lognormal(rng, n, median):
+    return [median * rng.lognormvariate(0, 0.2) for _ in range(n)]
+
+
+def test_mann_whitney_identical_and_shifted_samples():
+    rng = random.Random(0)
+    sample = _lognormal(rng, 200, 0.1)
+    assert mann_whitney_p(sample, list(sample)) == pytest.approx(1.0, abs=0.01)
+    assert mann_whitney_p(sample, _lognormal(rng, 200, 0.1)) > 0.05
+    assert mann_whitney_p(sample, _lognormal(rng, 200, 0.13)) < 0.001
+    assert mann_whitney_p([], sample) == 1.0
+    assert mann_whitney_p([1.0] * 10, [1.0] * 10) == 1.0  # 全部同值（ties）
+
+
+def test_bootstrap_interval_covers_true_change():
+    rng = random.Random(1)
+    base = _lognormal(rng, 300, 0.1)
+    slower = [v * 1.2 for v in _lognormal(rng, 300, 0.1)]
+    lo, hi = bootstrap_relative_change(base, slower, "median", 0.95, random.Random(0))
+    assert 0 < lo < 0.2 < hi
+    lo, hi = bootstrap_relative_change(base, list(base), "median", 0.95, random.Random(0))
+    assert lo <= 0 <= hi
+    # 固定 seed 結果可重現
+    assert bootstrap_relative_change(base, slower, "p95", 0.9, random.Random(5)) == \
+        bootstrap_relative_change(base, slower, "p95", 0.9, random.Random(5))
+
+
+def test_rate_change_p():
+    assert rate_change_p(1000, 100, 1000, 100) == pytest.approx(1.0)
+    assert rate_change_p(1000, 100, 700, 100) < 0.001
+    assert rate_change_p(100, 100, 50, 50) == pytest.approx(1.0)  # 時間窗不同但速率相同
+    assert rate_change_p(0, 10, 0, 10) == 1.0
+
+
+PROFILER2_LOG = """\
+2026-10-19 08:00:00,000 [Fetcher.fetch] 耗時: 0.100000 秒
+2026-10-19 08:00:01,000 [Fetcher.fetch] 耗時: 0.120000 秒 (async)
+2026-10-19 08:00:02,000 [Fetcher.fetch] ❌ 發生例外: boom
+Traceback (most recent call last):
+  File "x.py", line 1, in fetch
+2026-10-19 08:00:10,000 [Parser.parse] 耗時: 0.002000 秒
+"""
+
+DATA_MONITOR_LOG = """\
+2026-10-19 08:00:00,000 [INFO] [SourceA.monitor] 耗時: 0.500000 秒 (async)
+2026-10-19 08:00:05,500 [ERROR] [SourceA.monitor] ❌ 發生例外: timeout
+2026-10-19 08:00:20,000 [INFO] [SourceA.monitor] 耗時: 0.250000 秒 (async)
+"""
+
+
+def test_load_profiler2_log(tmp_path):
+    path = tmp_path / "profiler2.log"
+    path.write_text(PROFILER2_LOG, encoding="utf-8")
+    run = load_log(str(path))
+    fetch = run.methods["Fetcher.fetch"]
+    assert fetch.durations == [0.1, 0.12]
+    assert (fetch.calls, fetch.errors) == (3, 1)
+    assert run.methods["Parser.parse"].durations == [0.002]
+    assert run.window == pytest.approx(10.0)
+
+
+def test_load_data_monitor_log(tmp_path):
+    path = tmp_path / "data_monitor.log"
+    path.write_text(DATA_MONITOR_LOG, encoding="utf-8")
+    run = load_run(str(path))
+    assert list(run.methods) == ["SourceA.monitor"]  # 不會把 [INFO] 當成方法名稱
+    monitor = run.methods["SourceA.monitor"]
+    assert monitor.durations == [0.5, 0.25]
+    assert (monitor.calls, monitor.errors) == (3, 1)
+    assert run.window == pytest.approx(20.0)
+
+
+def _registry_run(tmp_path, name, durations, window=60.0):
+    registry = MetricsRegistry()
+    for duration in durations:
+        registry.observe_call("Fetcher.fetch", duration)
+    registry.observe_call("Fetcher.fetch", 0.1, exception=ValueError("x"))
+    registry.started_at -= window
+    path = tmp_path / f"{name}.json"
+    registry.dump_to_file(str(path), fmt="json")
+    return load_run(str(path))
+
+
+def test_compare_runs_flags_latency_regression_from_metrics_json(tmp_path):
+    rng = random.Random(2)
+    base = _registry_run(tmp_path, "base", _lognormal(rng, 200, 0.1))
+    same = _registry_run(tmp_path, "same", _lognormal(rng, 200, 0.1))
+    slow = _registry_run(tmp_path, "slow", _lognormal(rng, 200, 0.15))
+    assert base.methods["Fetcher.fetch"].errors == 1
+
+    [unchanged] = compare_runs(base, same, check_throughput=False)
+    assert not unchanged.regression
+
+    [regressed] = compare_runs(base, slow, check_throughput=False)
+    assert regressed.latency_regression
+    assert regressed.p_value < 0.05 and regressed.ci_low > 0
+    assert regressed.change == pytest.approx(0.5, abs=0.15)
+
+
+def test_compare_runs_flags_throughput_regression(tmp_path):
+    base = tmp_path / "base.log"
+    cand = tmp_path / "cand.log"
+    line = "2026-10-19 08:{:02d}:{:02d},000 [Fetcher.fetch] 耗時: 0.100000 秒\n"
+    base.write_text("".join(line.format(i // 60, i % 60) for i in range(0, 600)), encoding="utf-8")
+    cand.write_text("".join(line.format(i // 60, i % 60) for i in range(0, 600, 2)), encoding="utf-8")
+    [comp] = compare_runs(load_log(str(base)), load_log(str(cand)))
+    assert comp.throughput_regression and not comp.latency_regression
+    assert comp.rate_change == pytest.approx(-0.5, abs=0.01)
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+
+import pytest
+
+from profiler2 import profile_selected_methods_mixed
+
+
+@pytest.fixture(autouse=True)
+def close_profile_handlers():
+    yield
+    logger = logging.getLogger("profile.Worker")
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+
+def make_class(tmp_path, **options):
+    @profile_selected_methods_mixed(name_patterns=["work"], log_file=str(tmp_path / "profile.log"), **options)
+    class Worker:
+        def work(self, n):
+            return n * 2
+
+        async def work_async(self, n):
+            return n + 1
+
+    return Worker
+
+
+def test_unbounded_by_default(tmp_path):
+    worker = make_class(tmp_path)()
+    for i in range(5):
+        worker.work(i)
+    assert len(type(worker)._profiled_logs) == 5
+
+
+def test_max_logs_keeps_latest(tmp_path):
+    cls = make_class(tmp_path, max_logs=3)
+    worker = cls()
+    for i in range(10):
+        assert worker.work(i) == i * 2
+    assert [entry["args"][1] for entry in cls._profiled_logs] == [7, 8, 9]
+
+
+def test_max_logs_zero_disables_list(tmp_path):
+    cls = make_class(tmp_path, max_logs=0)
+    worker = cls()
+    assert worker.work(1) == 2
+    assert asyncio.run(worker.work_async(1)) == 2
+    assert cls._profiled_logs is None
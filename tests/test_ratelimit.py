@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from ratelimit import AsyncRedisTokenBucket, RedisTokenBucket, host_of
+from redis_async import AsyncRedisClient
+from redisclient import RedisClient
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def test_burst_up_to_capacity_then_wait(client):
+    bucket = RedisTokenBucket(client, rate=2, capacity=3)
+    assert [bucket.try_acquire("a.com") for _ in range(3)] == [0, 0, 0]
+    wait = bucket.try_acquire("a.com")
+    assert 0 < wait <= 0.5  # 2 token/s，最多等半秒補一個
+
+
+def test_hosts_have_separate_buckets(client):
+    bucket = RedisTokenBucket(client, rate=1, capacity=1)
+    assert bucket.try_acquire("a.com") == 0
+    assert bucket.try_acquire("a.com") > 0
+    assert bucket.try_acquire("b.com") == 0
+
+
+def test_host_rate_override(client):
+    bucket = RedisTokenBucket(client, rate=1, capacity=1, host_rates={"fast.com": (100, 5)})
+    assert all(bucket.try_acquire("fast.com") == 0 for _ in range(5))
+    assert bucket.try_acquire("slow.com") == 0
+    assert bucket.try_acquire("slow.com") > 0
+
+
+def test_buckets_shared_between_instances(client):
+    # 兩個 process 各自建立 limiter，但共用同一個 Redis 桶
+    first = RedisTokenBucket(client, rate=1, capacity=2)
+    second = RedisTokenBucket(client, rate=1, capacity=2)
+    assert first.try_acquire("a.com") == 0
+    assert second.try_acquire("a.com") == 0
+    assert first.try_acquire("a.com") > 0
+
+
+def test_acquire_waits_for_refill(client):
+    bucket = RedisTokenBucket(client, rate=10, capacity=1)
+    bucket.acquire("a.com")
+    start = time.monotonic()
+    assert bucket.acquire("a.com")
+    assert time.monotonic() - start >= 0.05
+
+
+def test_acquire_timeout(client):
+    bucket = RedisTokenBucket(client, rate=0.5, capacity=1)
+    assert bucket.acquire_for_url("https://a.com/x")
+    assert not bucket.acquire("a.com", timeout=0.1)
+
+
+def test_tokens_over_capacity_rejected(client):
+    bucket = RedisTokenBucket(client, rate=1, capacity=2, host_rates={"big.com": (1, 5)})
+    with pytest.raises(ValueError):
+        bucket.acquire("a.com", tokens=3)  # 沒有 timeout 時原本會永遠等下去
+    assert bucket.acquire("big.com", tokens=3)
+
+
+def test_accepts_repo_redis_client(client):
+    wrapper = RedisClient(client=client)
+    bucket = RedisTokenBucket(wrapper, rate=1, capacity=1)
+    assert bucket.try_acquire("a.com") == 0
+    assert bucket.try_acquire("a.com") > 0
+
+
+def test_host_of():
+    assert host_of("https://a.com:8080/path?q=1") == "a.com:8080"
+    assert host_of("a.com") == "a.com"
+
+
+def test_async_bucket():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis()
+        bucket = AsyncRedisTokenBucket(client, rate=2, capacity=2)
+        immediate = [await bucket.try_acquire("a.com") for _ in range(2)]
+        limited = await bucket.try_acquire("a.com")
+        timed_out = await bucket.acquire("a.com", timeout=0.01)
+        await client.aclose()
+        return immediate, limited, timed_out
+
+    immediate, limited, timed_out = asyncio.run(scenario())
+    assert immediate == [0, 0]
+    assert limited > 0
+    assert timed_out is False
+
+
+def test_async_bucket_accepts_repo_client_and_rejects_oversized_request():
+    async def scenario():
+        wrapper = AsyncRedisClient(client=fakeredis.FakeAsyncRedis())
+        bucket = AsyncRedisTokenBucket(wrapper, rate=1, capacity=1)
+        acquired = await bucket.acquire("a.com")
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(bucket.acquire("a.com", tokens=2), 1)
+        await wrapper.close()
+        return acquired
+
+    assert asyncio.run(scenario()) is True
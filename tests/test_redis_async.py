@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from redis_async import AsyncRedisClient
+from redis_codec import RedisCodec
+
+
+def _run(scenario, **client_options):
+    async def main():
+        async with AsyncRedisClient(client=fakeredis.FakeAsyncRedis(decode_responses=True), **client_options) as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+def test_set_get_and_missing_key():
+    async def scenario(client):
+        assert await client.set("a", "1", ex=30)
+        return await client.get("a"), await client.get("missing"), await client.client.ttl("a")
+
+    value, missing, ttl = _run(scenario)
+    assert (value, missing) == ("1", None)
+    assert 0 < ttl <= 30
+
+
+def test_mget_mset():
+    async def scenario(client):
+        assert await client.mset({"a": "1", "b": "2"})
+        assert await client.mset({}) is True
+        assert await client.mget([]) == []
+        return await client.mget(["a", "missing", "b"])
+
+    assert _run(scenario) == ["1", None, "2"]
+
+
+def test_mset_with_ttl_sets_expiry_on_every_key():
+    async def scenario(client):
+        assert await client.mset({"a": "1", "b": "2"}, ex=60)
+        return [await client.client.ttl(key) for key in ("a", "b")], await client.mget(["a", "b"])
+
+    ttls, values = _run(scenario)
+    assert all(0 < ttl <= 60 for ttl in ttls)
+    assert values == ["1", "2"]
+
+
+def test_pipeline_executes_on_exit_and_discards_on_error():
+    async def scenario(client):
+        async with client.pipeline() as pipe:
+            pipe.set("kept", "1")
+            pipe.incr("counter")
+        with pytest.raises(RuntimeError):
+            async with client.pipeline() as pipe:
+                pipe.set("dropped", "1")
+                raise RuntimeError("中途失敗")
+        return await client.mget(["kept", "counter", "dropped"])
+
+    assert _run(scenario) == ["1", "1", None]
+
+
+def test_codec_round_trip_with_binary_client():
+    async def main():
+        codec = RedisCodec("json", "zlib", threshold=64)
+        async with AsyncRedisClient(client=fakeredis.FakeAsyncRedis(), codec=codec) as client:
+            value = {"id": 1, "html": "<p>" * 100}
+            await client.set("page", value)
+            await client.mset({"small": [1, 2], "text": "純文字"})
+            raw = await client.client.get("page")
+            return await client.get("page"), await client.mget(["small", "text", "missing"]), raw
+
+    page, many, raw = asyncio.run(main())
+    assert page == {"id": 1, "html": "<p>" * 100}
+    assert many == [[1, 2], "純文字", None]
+    assert isinstance(raw, bytes) and len(raw) < 300  # 超過門檻已壓縮
+
+
+def test_ping_and_close():
+    async def main():
+        raw = fakeredis.FakeAsyncRedis()
+        client = AsyncRedisClient(client=raw)
+        assert client.get_raw_client() is raw
+        assert await client.ping()
+        await client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from redis_cache import ClientSideCache
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def cache():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    client.config_set("notify-keyspace-events", "KA")
+    cache = ClientSideCache(client, mode="keyspace")
+    yield cache
+    cache.close()
+
+
+def test_hit_after_miss_and_invalidation_on_write(cache):
+    cache.client.set("k", "1")
+    assert cache.get("k") == "1"
+    # 第一次 SET 的通知可能晚於寫入快取到達，等它處理完再比對
+    wait_for(lambda: cache.get("k") == "1" and cache.stats()["hits"] > 0)
+    assert cache.stats()["hits"] >= 1
+
+    cache.client.set("k", "2")
+    assert wait_for(lambda: cache.get("k") == "2")
+
+
+def test_listener_callback_runs_before_resubscribe(cache):
+    callbacks = [ref() for ref in cache._pubsub.connection._connect_callbacks]
+    assert callbacks.index(cache._on_listener_connect) < callbacks.index(cache._pubsub.on_connect)
+
+
+class SpyCache(ClientSideCache):
+    def __init__(self, *args, **kwargs):
+        self.reconnects = 0
+        super().__init__(*args, **kwargs)
+
+    def _on_listener_connect(self, connection):
+        self.reconnects += 1
+        super()._on_listener_connect(connection)
+
+
+def test_silent_pubsub_reconnect_clears_cache():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    client.config_set("notify-keyspace-events", "KA")
+    cache = SpyCache(client, mode="keyspace")
+    try:
+        client.set("k", "1")
+        assert wait_for(lambda: cache.get("k") == "1" and cache.stats()["size"] == 1)
+
+        # 模擬網路中斷：PubSub 下一次讀取時自己重連並重新訂閱，不會拋例外給 _listen
+        cache._pubsub.connection.disconnect()
+
+        assert wait_for(lambda: cache.reconnects == 1)
+        assert cache._healthy.is_set()
+        assert cache.stats()["size"] == 0
+
+        # 重新訂閱後通知照常送達
+        cache.get("k")
+        client.set("k", "3")
+        assert wait_for(lambda: cache.get("k") == "3")
+    finally:
+        cache.close()
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.commands = []
+
+    def send_command(self, *args):
+        self.commands.append(args)
+
+    def read_response(self):
+        return b"OK"
+
+
+class RecordingReader:
+    def __init__(self):
+        self.connection = RecordingConnection()
+
+    def close(self):
+        pass
+
+
+def test_reconnect_redirects_tracking_to_new_client_id(cache):
+    # fakeredis 沒有 CLIENT TRACKING：換成記錄指令的 reader，只驗證重連後用新的 client id 重新 REDIRECT
+    cache.mode = "tracking"
+    cache._reader = RecordingReader()
+    cache._listener_id = -1
+    cache._entries["stale"] = ("old", time.monotonic() + 60)
+
+    listener = cache.client.connection_pool.get_connection()
+    try:
+        cache._on_listener_connect(listener)
+    finally:
+        cache.client.connection_pool.release(listener)
+
+    new_id = cache._listener_id
+    assert new_id > 0
+    assert cache._reader.connection.commands == [("CLIENT", "TRACKING", "ON", "REDIRECT", new_id)]
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import redis_codec
+from redis_codec import COMP_NONE, COMP_ZLIB, MAGIC, SER_JSON, SER_STR, RedisCodec
+
+VALUES = [
+    "短字串",
+    b"\x00\x01raw bytes",
+    {"id": 1, "tags": ["a", "b"], "nested": {"ok": True, "score": 1.5}},
+    [1, 2, 3],
+    None,
+]
+
+
+def _codecs():
+    codecs = [RedisCodec("json", "zlib"), RedisCodec("json", "none")]
+    if redis_codec.msgpack is not None and redis_codec.zstandard is not None:
+        codecs.append(RedisCodec())
+    if redis_codec.lz4_frame is not None:
+        codecs.append(RedisCodec("json", "lz4"))
+    return codecs
+
+
+@pytest.mark.parametrize("codec", _codecs(), ids=lambda c: f"ser{c.serializer}-comp{c.compression}")
+@pytest.mark.parametrize("value", VALUES + ["<html>" + "x" * 5000 + "</html>", {"rows": ["y" * 100] * 100}])
+def test_round_trip(codec, value):
+    assert codec.decode(codec.encode(value)) == value
+
+
+def test_small_value_is_not_compressed():
+    encoded = RedisCodec("json", "zlib", threshold=1024).encode("hello")
+    assert encoded == bytes((MAGIC, SER_STR, COMP_NONE)) + b"hello"
+
+
+def test_large_value_is_compressed():
+    html = "<html>" + "x" * 5000 + "</html>"
+    encoded = RedisCodec("json", "zlib").encode(html)
+    assert encoded[:3] == bytes((MAGIC, SER_STR, COMP_ZLIB))
+    assert len(encoded) < len(html) // 10
+
+
+def test_incompressible_value_stored_uncompressed():
+    payload = os.urandom(4096)  # 亂數壓不小
+    encoded = RedisCodec("json", "zlib").encode(payload)
+    assert encoded[2] == COMP_NONE
+    assert RedisCodec("json", "zlib").decode(encoded) == payload
+
+
+def test_no_compression_path():
+    codec = RedisCodec("json", "none", threshold=0)
+    encoded = codec.encode({"a": "b" * 5000})
+    assert encoded[:3] == bytes((MAGIC, SER_JSON, COMP_NONE))
+    assert codec.decode(encoded) == {"a": "b" * 5000}
+    # 沒開壓縮的 codec 仍讀得懂別人用 zlib 寫的值
+    assert codec.decode(RedisCodec("json", "zlib").encode("z" * 5000)) == "z" * 5000
+
+
+def test_legacy_values_pass_through():
+    codec = RedisCodec("json", "zlib")
+    assert codec.decode(None) is None
+    assert codec.decode("already decoded") == "already decoded"
+    assert codec.decode("舊資料".encode("utf-8")) == "舊資料"
+    assert codec.decode(b"ab") == "ab"  # 比標頭還短
+
+
+def test_foreign_header_rejected():
+    codec = RedisCodec("json", "zlib")
+    with pytest.raises(ValueError):
+        codec.decode(bytes((MAGIC, 9, COMP_NONE)) + b"{}")
+    with pytest.raises(ValueError):
+        codec.decode(bytes((MAGIC, SER_JSON, 7)) + b"{}")
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        RedisCodec("pickle", "zlib")
+    with pytest.raises(ValueError):
+        RedisCodec("json", "brotli")
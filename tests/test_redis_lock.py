@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis 需要 lupa 才能跑 Lua 腳本
+
+from redis_async import AsyncRedisDistributedLock
+from redisclient import RedisDistributedLock
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_fencing_tokens_increase(client):
+    tokens = []
+    for _ in range(3):
+        lock = RedisDistributedLock(client, "job", auto_renew=False)
+        tokens.append(lock.acquire())
+        assert lock.release()
+    assert tokens == sorted(tokens) and len(set(tokens)) == 3
+
+
+def test_second_holder_is_excluded(client):
+    first = RedisDistributedLock(client, "job", auto_renew=False)
+    second = RedisDistributedLock(client, "job", auto_renew=False)
+    assert first.acquire() is not None
+    assert second.acquire(blocking=False) is None
+    assert second.acquire(blocking_timeout=0.1) is None
+    assert first.locked()
+    first.release()
+    assert second.acquire(blocking=False) is not None
+    second.release()
+
+
+def test_release_only_by_owner(client):
+    first = RedisDistributedLock(client, "job", timeout=1, auto_renew=False)
+    first.acquire()
+    client.delete("job")  # lease 到期
+    second = RedisDistributedLock(client, "job", auto_renew=False)
+    second.acquire()
+    assert not first.release()  # 不能刪掉別人的鎖
+    assert second.locked()
+    second.release()
+
+
+def test_waiter_wakes_on_release(client):
+    holder = RedisDistributedLock(client, "job", timeout=30, auto_renew=False)
+    holder.acquire()
+    acquired_after = []
+
+    def waiter():
+        start = time.monotonic()
+        lock = RedisDistributedLock(client, "job", auto_renew=False)
+        if lock.acquire(blocking_timeout=5) is not None:
+            acquired_after.append(time.monotonic() - start)
+            lock.release()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.2)
+    holder.release()
+    thread.join(timeout=5)
+    # 由 BLPOP 的釋放訊號叫醒，不必等 30 秒的 lease
+    assert acquired_after and acquired_after[0] < 2
+
+
+def test_watchdog_renews_lease(client):
+    lock = RedisDistributedLock(client, "job", timeout=1)
+    lock.acquire()
+    time.sleep(1.5)
+    assert lock.locked()
+    assert not lock.lost
+    lock.release()
+
+
+def test_watchdog_reports_lost_lease(client, caplog):
+    lock = RedisDistributedLock(client, "job", timeout=1)
+    lock.acquire()
+    client.set("job", "someone-else")
+    with caplog.at_level(logging.WARNING, logger="RedisDistributedLock"):
+        deadline = time.monotonic() + 2
+        while not lock.lost and time.monotonic() < deadline:
+            time.sleep(0.05)
+    assert lock.lost
+    assert any("續約失敗" in record.getMessage() for record in caplog.records)
+    lock.release()
+
+
+def test_async_lock_excludes_and_wakes():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        holder = AsyncRedisDistributedLock(client, "job", timeout=30, auto_renew=False)
+        first = await holder.acquire()
+        other = AsyncRedisDistributedLock(client, "job", auto_renew=False)
+        assert await other.acquire(blocking=False) is None
+
+        async def release_later():
+            await asyncio.sleep(0.2)
+            await holder.release()
+
+        releaser = asyncio.create_task(release_later())
+        start = asyncio.get_running_loop().time()
+        second = await other.acquire(blocking_timeout=5)
+        elapsed = asyncio.get_running_loop().time() - start
+        await releaser
+        await other.release()
+        await client.aclose()
+        return first, second, elapsed
+
+    first, second, elapsed = asyncio.run(scenario())
+    assert second > first
+    assert elapsed < 2
+
+
+def test_async_watchdog_renews_lease():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        async with AsyncRedisDistributedLock(client, "job", timeout=1) as lock:
+            await asyncio.sleep(1.5)
+            held = await lock.locked()
+        await client.aclose()
+        return held, lock.lost
+
+    assert asyncio.run(scenario()) == (True, False)
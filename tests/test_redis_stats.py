@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("redis")
+
+from metrics import MetricsRegistry
+from redis_stats import RedisStats
+
+
+def test_registry_only_has_redis_metrics():
+    stats = RedisStats()
+    stats.record_command("GET", 0.001)
+    stats.record_command("SET", 0.002, ConnectionError("boom"))
+    stats.record_created()
+    stats.record_checkout(0.0001)
+    output = stats.registry.render()
+    assert "redis_command_duration_seconds" in output
+    assert "redis_pool_connections" in output
+    assert "redis_calls" not in output
+    assert "redis_exceptions" not in output
+    assert "call_duration_seconds" not in output
+
+
+def test_snapshot_counts_commands_and_pool():
+    stats = RedisStats()
+    stats.record_created()
+    stats.record_checkout(0.0001)
+    stats.record_command("GET", 0.001)
+    stats.record_command("GET", 0.003, TimeoutError())
+    snapshot = stats.snapshot()
+    assert snapshot["commands"]["GET"]["count"] == 2
+    assert snapshot["commands"]["GET"]["errors"] == 1
+    assert snapshot["pool"]["in_use"] == 1
+    stats.record_release()
+    assert stats.snapshot()["pool"] == {**snapshot["pool"], "in_use": 0, "idle": 1}
+
+
+def test_profiler_registry_without_call_metrics_rejects_observe_call():
+    registry = MetricsRegistry(namespace="x", call_metrics=False)
+    with pytest.raises(RuntimeError):
+        registry.observe_call("f", 0.1)
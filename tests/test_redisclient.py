@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from redisclient import RedisAutoBatcher, RedisClient
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def raw(server):
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+class CountingRedis(fakeredis.FakeRedis):
+    """記錄 pipeline 送出的次數與每批的指令數"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        def counted_execute(*args, **kwargs):
+            self.batches.append(len(pipe.command_stack))
+            return execute(*args, **kwargs)
+
+        pipe.execute = counted_execute
+        return pipe
+
+
+def test_set_get_roundtrip(raw):
+    client = RedisClient(client=raw)
+    assert client.set("k", "v")
+    assert client.get("k") == "v"
+    assert client.get("missing") is None
+
+
+def test_mget_mset(raw):
+    client = RedisClient(client=raw)
+    assert client.mset({"a": "1", "b": "2"})
+    assert client.mget(["a", "missing", "b"]) == ["1", None, "2"]
+    assert client.mget([]) == []
+    assert client.mset({}) is True
+
+
+def test_mset_with_ttl_uses_pipeline(raw):
+    client = RedisClient(client=raw)
+    assert client.mset({"a": "1", "b": "2"}, ex=60)
+    assert 0 < raw.ttl("a") <= 60
+    assert 0 < raw.ttl("b") <= 60
+
+
+def test_pipeline_executes_on_exit(raw):
+    client = RedisClient(client=raw)
+    with client.pipeline() as pipe:
+        pipe.set("x", "1")
+        pipe.incr("counter")
+        pipe.incr("counter")
+    assert raw.get("x") == "1"
+    assert raw.get("counter") == "2"
+
+
+def test_pipeline_discards_on_error(raw):
+    client = RedisClient(client=raw)
+    with pytest.raises(RuntimeError):
+        with client.pipeline() as pipe:
+            pipe.set("x", "1")
+            raise RuntimeError("boom")
+    assert raw.get("x") is None
+
+
+def test_auto_batcher_coalesces_concurrent_calls(server):
+    raw = CountingRedis(server=server, decode_responses=True)
+    batcher = RedisAutoBatcher(raw, max_batch=50, max_delay=0.05)
+    barrier = threading.Barrier(20)
+    results = {}
+
+    def worker(i):
+        barrier.wait()
+        batcher.set(f"k{i}", str(i))
+        results[i] = batcher.get(f"k{i}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {i: str(i) for i in range(20)}
+    assert sum(raw.batches) == 40
+    assert len(raw.batches) < 40  # 有合併，不是一個指令一次 round trip
+
+
+def test_auto_batcher_flushes_at_max_batch(server):
+    raw = CountingRedis(server=server, decode_responses=True)
+    batcher = RedisAutoBatcher(raw, max_batch=5, max_delay=10)
+    futures = [batcher.submit("set", f"k{i}", "v") for i in range(5)]
+    assert all(f.result(timeout=2) for f in futures)  # 不必等 10 秒的視窗
+    batcher.close()
+    assert raw.batches == [5]
+
+
+def test_auto_batcher_per_command_errors(raw):
+    batcher = RedisAutoBatcher(raw, max_batch=10, max_delay=0.01)
+    raw.set("text", "abc")
+    bad = batcher.submit("incr", "text")
+    good = batcher.submit("incr", "n")
+    assert good.result(timeout=2) == 1
+    with pytest.raises(Exception):
+        bad.result(timeout=2)
+    batcher.close()
+
+
+def test_auto_batcher_rejects_after_close(raw):
+    batcher = RedisAutoBatcher(raw)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit("get", "k")
+
+
+def test_client_auto_batch_mode(raw):
+    client = RedisClient(client=raw, auto_batch=True, batch_delay=0.001)
+    assert client.set("k", "v")
+    assert client.get("k") == "v"
+    client.close()
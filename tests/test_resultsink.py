@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import resultsink
+from persistentRetryQueue import PersistentRetryQueue, run_retry_queue
+from resultsink import JsonlShardSink, ResultSink, read_jsonl_shards
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # save_failures 寫在目前目錄
+
+
+def test_shard_sink_acks_only_after_fsync(tmp_path, monkeypatch):
+    synced = []
+    acked = []
+    monkeypatch.setattr(resultsink.os, "fsync", lambda fd: synced.append(fd))
+
+    async def scenario():
+        sink = JsonlShardSink(str(tmp_path / "out"), shard_size=3)
+        sink.on_durable = lambda ids: acked.append((list(ids), len(synced)))
+        for id_ in range(5):
+            await sink.write(id_, f"d{id_}")
+        await sink.flush()
+        flushed = sum(len(ids) for ids, _ in acked)
+        await sink.close()
+        return sink, flushed
+
+    sink, flushed = asyncio.run(scenario())
+    assert flushed == 5
+    assert all(fsyncs_before > 0 for _, fsyncs_before in acked)
+    assert sorted(id_ for id_, _ in read_jsonl_shards(sink.shards)) == list(range(5))
+    assert len(sink.shards) == 2
+
+
+def test_shard_sink_flush_raises_write_error(tmp_path, monkeypatch):
+    def broken(self, batch):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(JsonlShardSink, "_write_lines", broken)
+
+    async def scenario():
+        sink = JsonlShardSink(str(tmp_path / "out"))
+        acked = []
+        sink.on_durable = acked.extend
+        await sink.write(1, "x")
+        with pytest.raises(OSError):
+            await asyncio.wait_for(sink.flush(), 1)
+        with pytest.raises(OSError):
+            await sink.close()
+        return acked
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_run_retry_queue_marks_done_after_sink_ack(tmp_path, fake_transport):
+    state_dir = str(tmp_path / "state")
+    events = []
+
+    class RecordingSink(JsonlShardSink):
+        async def write(self, id_, data):
+            await super().write(id_, data)
+            events.append(("write", id_, id_ in queue.done))
+
+    async def scenario():
+        async with RecordingSink(str(tmp_path / "out")) as sink:
+            return await run_retry_queue(queue, "http://upstream/get/", sink=sink, transport="fake")
+
+    queue = PersistentRetryQueue(list(range(20)), state_dir=state_dir)
+    assert asyncio.run(scenario()) == {}
+    assert not any(done_at_write for _, _, done_at_write in events)
+    assert queue.done == set(range(20))
+    assert os.listdir(state_dir) == []  # 整批跑完，狀態已清掉
+
+
+def test_run_retry_queue_sink_error_stops_all_workers(tmp_path, fake_transport):
+    state_dir = str(tmp_path / "state")
+
+    class FailingSink(ResultSink):
+        async def write(self, id_, data):
+            if id_ == 3:
+                raise OSError("sink down")
+            self.count += 1
+
+    async def scenario():
+        return await asyncio.wait_for(
+            run_retry_queue(queue, "http://upstream/get/", sink=FailingSink(), transport="fake", concurrency=4), 5)
+
+    queue = PersistentRetryQueue(list(range(50)), state_dir=state_dir)
+    with pytest.raises(OSError):
+        asyncio.run(scenario())
+
+    # 進度留在 state_dir，resume 時沒寫進 sink 的 ID 會重抓
+    resumed = PersistentRetryQueue(list(range(50)), state_dir=state_dir, resume=True)
+    assert 3 in resumed.queue
+    assert resumed.done == queue.done
+
+
+def test_run_retry_queue_memory_mode_returns_results(tmp_path, fake_transport):
+    queue = PersistentRetryQueue([1, 2, 3], state_dir=str(tmp_path / "state"))
+    results = asyncio.run(run_retry_queue(queue, "http://upstream/get/", transport="fake"))
+    assert results == {1: "body-1", 2: "body-2", 3: "body-3"}
+    with open("failed_ids.json") as f:
+        assert json.load(f) == []
+
+
+def test_fetch_all_sink_error_stops_all_workers(fake_transport):
+    from fetchengine import fetch_ids
+
+    writes = []
+
+    class FailingSink(ResultSink):
+        async def write(self, id_, data):
+            writes.append(id_)
+            if id_ == 1:
+                raise OSError("sink down")
+
+    async def scenario():
+        with pytest.raises(OSError):
+            await fetch_ids(range(50), "http://upstream/get/", "fake", sink=FailingSink(), concurrency=4)
+        count = len(writes)
+        await asyncio.sleep(0.05)  # 被留下的 worker 會在這段時間繼續寫
+        return count
+
+    assert asyncio.run(scenario()) == len(writes)
+    assert len(writes) < 50
@@ -0,0 +1,76 @@
+import asyncio
+
+from persistentRetryQueue import RetryScheduler
+
+
+def test_backoff_is_exponential_with_equal_jitter():
+    scheduler = RetryScheduler([], base_delay=1.0, max_delay=8.0)
+    for retries, full in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)]:
+        for _ in range(50):
+            assert full / 2 <= scheduler.backoff(retries) <= full
+
+
+def test_ready_ids_in_order_then_none_when_all_complete():
+    async def scenario():
+        scheduler = RetryScheduler([1, 2, 3])
+        seen = []
+        while (id_ := await scheduler.next_id()) is not None:
+            seen.append(id_)
+            await scheduler.complete()
+        return seen
+
+    assert asyncio.run(scenario()) == [1, 2, 3]
+
+
+def test_retried_id_waits_for_backoff():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        scheduler = RetryScheduler([1], base_delay=0.2, max_delay=0.2)
+        assert await scheduler.next_id() == 1
+        failed_at = loop.time()
+        await scheduler.retry_later(1, retries=1)
+        assert await scheduler.next_id() == 1
+        waited = loop.time() - failed_at
+        await scheduler.complete()
+        assert await scheduler.next_id() is None
+        return waited
+
+    assert 0.09 <= asyncio.run(scenario()) < 0.5
+
+
+def test_delayed_id_does_not_block_ready_ids():
+    async def scenario():
+        scheduler = RetryScheduler([1, 2, 3], base_delay=10, max_delay=10)
+        assert await scheduler.next_id() == 1
+        await scheduler.retry_later(1, retries=1)  # 至少 5 秒後才能重試
+        order = [await asyncio.wait_for(scheduler.next_id(), 1) for _ in range(2)]
+        return order, scheduler.delayed
+
+    order, delayed = asyncio.run(scenario())
+    assert order == [2, 3]
+    assert [id_ for _, id_ in delayed] == [1]
+
+
+def test_waiting_workers_released_when_last_id_completes():
+    async def scenario():
+        scheduler = RetryScheduler([1])
+        assert await scheduler.next_id() == 1
+        waiters = [asyncio.create_task(scheduler.next_id()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert not any(task.done() for task in waiters)
+        await scheduler.complete()
+        return await asyncio.wait_for(asyncio.gather(*waiters), 1)
+
+    assert asyncio.run(scenario()) == [None, None, None]
+
+
+def test_retry_wakes_idle_worker():
+    async def scenario():
+        scheduler = RetryScheduler([1], base_delay=0.02, max_delay=0.02)
+        assert await scheduler.next_id() == 1
+        waiter = asyncio.create_task(scheduler.next_id())  # 沒有可執行的 ID，開始等待
+        await asyncio.sleep(0.01)
+        await scheduler.retry_later(1, retries=1)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()) == 1
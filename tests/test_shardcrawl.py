@@ -0,0 +1,119 @@
+import asyncio
+import queue
+
+import pytest
+
+import shardcrawl
+from fetchengine import FetchPolicy
+from resultsink import read_jsonl_shards
+
+
+class FakeProcess:
+    """不開 process：start() 時依 script 把事件放進 queue"""
+
+    def __init__(self, ctx, target, args, daemon):
+        self.ctx = ctx
+        self.worker, self.ids = args[0], args[1]
+        self.events = args[4]
+        self.exitcode = None
+        ctx.processes.append(self)
+
+    def start(self):
+        self.exitcode = self.ctx.script(self)
+
+    def is_alive(self):
+        return False
+
+    def join(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, script):
+        self.script = script
+        self.processes = []
+
+    def Queue(self, maxsize=0):
+        return queue.Queue()
+
+    def Process(self, target, args, daemon=False):
+        return FakeProcess(self, target, args, daemon)
+
+
+def _crawl(monkeypatch, script, ids, processes, **options):
+    ctx = FakeContext(script)
+    monkeypatch.setattr(shardcrawl.mp, "get_context", lambda method: ctx)
+    return shardcrawl.crawl_sharded(ids, "http://upstream/get/", processes=processes, **options), ctx
+
+
+def test_ids_are_striped_across_processes(monkeypatch):
+    def script(proc):
+        proc.events.put(("progress", proc.worker, len(proc.ids), 0, 10 * len(proc.ids)))
+        proc.events.put(("done", proc.worker, [], []))
+        return 0
+
+    report, ctx = _crawl(monkeypatch, script, list(range(10)), processes=3)
+    assert [p.ids for p in ctx.processes] == [[0, 3, 6, 9], [1, 4, 7], [2, 5, 8]]
+    assert report.succeeded == 10 and report.bytes == 100
+    # process 數不會超過 ID 數
+    report, ctx = _crawl(monkeypatch, script, [1, 2], processes=8)
+    assert len(ctx.processes) == 2 and report.processes == 2
+
+
+def test_done_error_and_silent_exit_are_aggregated(monkeypatch):
+    def script(proc):
+        if proc.worker == 0:
+            proc.events.put(("results", 0, [(0, "a"), (3, "b")]))
+            proc.events.put(("progress", 0, 2, 1, 2))
+            proc.events.put(("done", 0, [6], ["worker00-00000.jsonl"]))
+            return 0
+        if proc.worker == 1:
+            proc.events.put(("progress", 1, 1, 0, 5))
+            proc.events.put(("error", 1, "ConnectionError('boom')"))
+            return 1
+        return -9  # 被 OOM killer 砍掉：沒有任何事件
+
+    report, _ = _crawl(monkeypatch, script, list(range(9)), processes=3, output="pipe")
+    assert report.results == {0: "a", 3: "b"}
+    assert report.failed_ids == [6]
+    assert report.shards == ["worker00-00000.jsonl"]
+    assert report.succeeded == 3 and report.bytes == 7
+    assert report.errors[1] == "ConnectionError('boom')"
+    assert "exit code -9" in report.errors[2]
+
+
+def test_invalid_output_rejected():
+    with pytest.raises(ValueError):
+        shardcrawl.crawl_sharded([1], output="kafka")
+
+
+def _options(tmp_path, output):
+    return {"output": output, "out_dir": str(tmp_path), "shard_size": 3, "compression": "none",
+            "transport": "fake", "proxy": None, "concurrency": 2, "policy": FetchPolicy(max_attempts=1)}
+
+
+def _drain(events):
+    drained = []
+    while not events.empty():
+        drained.append(events.get())
+    return drained
+
+
+def test_worker_pipe_mode_sends_results_and_done(tmp_path, fake_transport):
+    fake_transport(status_for=lambda id_: 404 if id_ == 4 else 200)
+    events = queue.Queue()
+    asyncio.run(shardcrawl._crawl_shard(1, [1, 4, 7], "http://upstream/get/", _options(tmp_path, "pipe"), events))
+    drained = _drain(events)
+    results = [item for event in drained if event[0] == "results" for item in event[2]]
+    assert sorted(results) == [(1, "body-1"), (7, "body-7")]
+    assert drained[-2] == ("progress", 1, 2, 1, len("body-1") + len("body-7"))
+    assert drained[-1] == ("done", 1, [4], [])
+
+
+def test_worker_files_mode_writes_its_own_shards(tmp_path, fake_transport):
+    events = queue.Queue()
+    asyncio.run(shardcrawl._crawl_shard(2, list(range(5)), "http://upstream/get/", _options(tmp_path, "files"), events))
+    kind, worker, failed, shards = _drain(events)[-1]
+    assert (kind, worker, failed) == ("done", 2, [])
+    assert len(shards) == 2 and all("worker02" in path for path in shards)
+    assert sorted(id_ for id_, _ in read_jsonl_shards(shards)) == list(range(5))
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import tracing
+from tracing import Tracer
+
+
+class FakeClock:
+    """整數秒的假時鐘，換算成 µs 不會有浮點誤差"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tracing.time, "perf_counter", clock)
+    return clock
+
+
+def _nested(tracer, clock):
+    with tracer.span("crawl"):
+        clock.now = 2
+        with tracer.span("fetch"):
+            clock.now = 5
+        with tracer.span("parse"):
+            clock.now = 6
+            with pytest.raises(ValueError):
+                with tracer.span("decode"):
+                    clock.now = 7
+                    raise ValueError("bad")
+            clock.now = 8
+        clock.now = 10
+
+
+def test_collapsed_stacks_use_self_time(clock, tmp_path):
+    tracer = Tracer()
+    _nested(tracer, clock)
+    assert tracer.collapsed_stacks() == {
+        "crawl": 4_000_000,
+        "crawl;fetch": 3_000_000,
+        "crawl;parse": 2_000_000,
+        "crawl;parse;decode": 1_000_000,
+    }
+    path = tmp_path / "stacks.folded"
+    tracer.write_collapsed(str(path))
+    assert path.read_text(encoding="utf-8") == (
+        "crawl 4000000\n"
+        "crawl;fetch 3000000\n"
+        "crawl;parse 2000000\n"
+        "crawl;parse;decode 1000000\n"
+    )
+
+
+def test_chrome_trace_golden(clock, tmp_path):
+    tracer = Tracer()
+    _nested(tracer, clock)
+    pid = os.getpid()
+    lane = f"sync (thread {tracer.spans[0].lane[0]})"
+
+    def event(name, ts, dur, **extra):
+        return {"name": name, "cat": "profile", "ph": "X", "ts": ts, "dur": dur, "pid": pid, "tid": 1, **extra}
+
+    expected = {
+        "traceEvents": [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": lane}},
+            event("crawl", 0, 10_000_000),
+            event("fetch", 2_000_000, 3_000_000),
+            event("parse", 5_000_000, 3_000_000),
+            event("decode", 6_000_000, 1_000_000, args={"exception": "ValueError"}),
+        ],
+        "displayTimeUnit": "ms",
+    }
+    assert tracer.chrome_trace() == expected
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(path))
+    assert json.loads(path.read_text(encoding="utf-8")) == expected
+
+
+def test_gather_children_nest_under_parent_on_their_own_lanes():
+    tracer = Tracer()
+
+    async def child(name):
+        with tracer.span(name):
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        with tracer.span("main"):
+            await asyncio.gather(asyncio.create_task(child("a"), name="task-a"),
+                                 asyncio.create_task(child("b"), name="task-b"))
+
+    asyncio.run(scenario())
+    stacks = tracer.collapsed_stacks()
+    assert set(stacks) == {"main", "main;a", "main;b"}
+    assert stacks["main"] == 0  # 並行子 span 總和大於父 span，自身耗時以 0 計
+
+    trace = tracer.chrome_trace()["traceEvents"]
+    lanes = {e["args"]["name"].split(" ")[0]: e["tid"] for e in trace if e["ph"] == "M"}
+    assert {"task-a", "task-b"} <= set(lanes)
+    by_name = {e["name"]: e["tid"] for e in trace if e["ph"] == "X"}
+    assert by_name["a"] == lanes["task-a"] and by_name["b"] == lanes["task-b"]
+    assert by_name["main"] not in (by_name["a"], by_name["b"])
+
+
+def test_max_spans_drops_and_counts(clock):
+    tracer = Tracer(max_spans=2)
+    for _ in range(5):
+        with tracer.span("x"):
+            clock.now += 1
+    assert len(tracer.spans) == 2 and tracer.dropped == 3
+    tracer.clear()
+    assert tracer.spans == [] and tracer.dropped == 0
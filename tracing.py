@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# 目前所在的 span；asyncio.create_task / gather 會複製 context，所以子任務自然接在父 span 底下
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "parent", "start", "end", "lane", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], lane: Tuple[int, str]):
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.lane = lane  # (thread id, task 名稱)，給 Chrome trace 分軌
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def stack(self) -> List[str]:
+        names = []
+        span: Optional[Span] = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        return names[::-1]
+
+
+def _current_lane() -> Tuple[int, str]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    task_name = task.get_name() if task is not None else "sync"
+    return threading.get_ident(), task_name
+
+
+class Tracer:
+    def __init__(self, max_spans: int = 100_000):
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def start_span(self, name: str) -> Tuple[Span, contextvars.Token]:
+        span = Span(name, _current_span.get(), _current_lane())
+        token = _current_span.set(span)
+        return span, token
+
+    def finish_span(self, span: Span, token: contextvars.Token, error: Optional[BaseException] = None) -> None:
+        span.end = time.perf_counter()
+        if error is not None:
+            span.error = type(error).__name__
+        _current_span.reset(token)
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    @contextmanager
+    def span(self, name: str):
+        span, token = self.start_span(name)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish_span(span, token, e)
+            raise
+        else:
+            self.finish_span(span, token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+            self.dropped = 0
+
+    def collapsed_stacks(self) -> Dict[str, int]:
+        """
+        產生 flamegraph.pl / speedscope 可讀的 collapsed stack：「a;b;c 自身耗時(µs)」。
+
+        自身耗時 = span 耗時 - 子 span 耗時；gather 並行時子 span 總和可能大於父 span，此時以 0 計。
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        child_time: Dict[int, float] = defaultdict(float)
+        for span in spans:
+            if span.parent is not None:
+                child_time[id(span.parent)] += span.duration
+
+        stacks: Dict[str, int] = defaultdict(int)
+        for span in spans:
+            self_time = max(span.duration - child_time.get(id(span), 0.0), 0.0)
+            stacks[";".join(span.stack())] += int(self_time * 1_000_000)
+        return dict(stacks)
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, micros in sorted(self.collapsed_stacks().items()):
+                f.write(f"{stack} {micros}\n")
+
+    def chrome_trace(self) -> Dict[str, object]:
+        """Chrome trace-event 格式（chrome://tracing、Perfetto 可直接開）"""
+        with self._lock:
+            spans = list(self.spans)
+
+        pid = os.getpid()
+        lanes: Dict[Tuple[int, str], int] = {}
+        events: List[Dict[str, object]] = []
+        for span in sorted(spans, key=lambda s: s.start):
+            tid = lanes.get(span.lane)
+            if tid is None:
+                tid = lanes[span.lane] = len(lanes) + 1
+                events.append({
+                    "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                    "args": {"name": f"{span.lane[1]} (thread {span.lane[0]})"},
+                })
+            event = {
+                "name": span.name,
+                "cat": "profile",
+                "ph": "X",
+                "ts": (span.start - self._origin) * 1_000_000,
+                "dur": span.duration * 1_000_000,
+                "pid": pid,
+                "tid": tid,
+            }
+            if span.error:
+                event["args"] = {"exception": span.error}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)